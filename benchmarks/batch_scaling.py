@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: MIT
+"""
+Throughput of compare_many() with an increasing number of worker processes.
+
+Usage: python benchmarks/batch_scaling.py [number of pairs]
+"""
+
+import os
+import sys
+import time
+
+from htmlcompare.batch import compare_many
+from htmlcompare.compare import compare_html
+
+
+def build_page(index: int) -> str:
+    rows = ''.join(f'<tr><td class="c{i % 3}">{index}-{i}</td></tr>' for i in range(200))
+    return f'<html><body><h1>Page {index}</h1><table>{rows}</table></body></html>'
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    pairs = [(build_page(i), build_page(i)) for i in range(count)]
+
+    start = time.perf_counter()
+    for expected, actual in pairs:
+        compare_html(expected, actual)
+    baseline = count / (time.perf_counter() - start)
+    print(f'{"compare_html()":<18} {baseline:8.1f} pairs/s')
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        start = time.perf_counter()
+        results = list(compare_many(pairs, workers=workers))
+        throughput = count / (time.perf_counter() - start)
+        assert all(results)
+        label = f'{workers} worker(s)'
+        print(f'{label:<18} {throughput:8.1f} pairs/s  ({throughput / baseline:4.1f}x)')
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: MIT
+"""
+Throughput for deeply nested documents (parse, normalize, compare).
+
+Usage: python benchmarks/deep_nesting.py [nesting depth]
+"""
+
+import sys
+import time
+
+from htmlcompare.compare import Comparer, _compare_trees
+from htmlcompare.options import CompareOptions
+
+
+def build_html(depth: int, structure: str, text: str) -> str:
+    if structure == 'table':
+        return '<table><tr><td>' * depth + text + '</td></tr></table>' * depth
+    return '<div>' * depth + text + '</div>' * depth
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    print(f'nesting depth: {depth}')
+    for parser in ('html5lib', 'stdlib'):
+        comparer = Comparer(CompareOptions(parser=parser))
+        for structure in ('div', 'table'):
+            expected_html = build_html(depth, structure, 'x')
+            actual_html = build_html(depth, structure, 'y')
+            expected, parse_time = timed(comparer.parse, expected_html)
+            expected, normalize_time = timed(comparer.normalize, expected)
+            actual = comparer.normalize(comparer.parse(actual_html))
+            result, compare_time = timed(_compare_trees, expected, actual)
+            assert len(result.differences) == 1
+            label = f'{parser} ({structure})'
+            print(
+                f'{label:<18} parse {parse_time:7.3f}s  normalize {normalize_time:7.3f}s  '
+                f'compare {compare_time:7.3f}s  '
+                f'({len(expected_html) / 1024 / parse_time:8.1f} KiB/s parsing)'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: MIT
+"""
+Memory used by parsed (and normalized) documents.
+
+Usage: python benchmarks/memory_usage.py [number of table rows]
+"""
+
+import sys
+import tracemalloc
+
+from htmlcompare.cache import _count_nodes
+from htmlcompare.compare import Comparer
+from htmlcompare.flat import FlatDocument, normalize_flat
+from htmlcompare.options import CompareOptions
+
+
+def build_html(rows: int) -> str:
+    cells = ''.join(
+        f'<tr><td class="cell">{i}</td><td><b>x</b> <br> y</td><td></td></tr>\n'
+        for i in range(rows)
+    )
+    return f'<html><body><table>{cells}</table></body></html>'
+
+
+def measure(comparer: Comparer, html: str, normalize: bool):
+    tracemalloc.start()
+    doc = comparer.parse(html)
+    if normalize:
+        doc = comparer.normalize(doc)
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, _count_nodes(doc)
+
+
+def measure_flat(comparer: Comparer, html: str):
+    doc = FlatDocument.from_document(comparer.parse(html))
+    tracemalloc.start()
+    flat = normalize_flat(doc, comparer.options)
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, len(flat)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    html = build_html(rows)
+    for parser in ('html5lib', 'stdlib'):
+        comparer = Comparer(CompareOptions(parser=parser))
+        for normalize in (False, True):
+            size, nodes = measure(comparer, html, normalize)
+            label = f'{parser} ({"normalized" if normalize else "parsed"})'
+            _print_row(label, size, nodes)
+        size, nodes = measure_flat(comparer, html)
+        _print_row(f'{parser} (flat normalized)', size, nodes)
+
+
+def _print_row(label: str, size: int, nodes: int):
+    per_10k = size / nodes * 10_000 / 1024 / 1024
+    print(f'{label:<28} {nodes:>7} nodes  {size / 1024 / 1024:7.2f} MiB  '
+          f'{per_10k:6.2f} MiB per 10k nodes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: MIT
+"""
+Parse time of the "stdlib" parser backend compared to html5lib.
+
+Usage: python benchmarks/parser_speed.py [elements]
+"""
+
+import sys
+import time
+
+from htmlcompare.parser import get_parser
+
+
+def build_divs(count: int) -> str:
+    divs = ''.join(
+        f'<div class="c{i % 3}" id="d{i}"><p>text {i} <b>bold</b></p></div>'
+        for i in range(count)
+    )
+    return f'<html><body>{divs}</body></html>'
+
+
+def build_table(rows: int) -> str:
+    cells = ''.join(
+        f'<tr><td class="c{i % 3}" style="color: red">cell {i} &amp; more</td></tr>'
+        for i in range(rows)
+    )
+    return f'<!DOCTYPE html><html><body><table>{cells}</table></body></html>'
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def best_of(parser, html: str, repeat: int = 3) -> float:
+    return min(timed(parser.parse, html)[1] for _ in range(repeat))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    for name, html in (('divs', build_divs(count)), ('table', build_table(count))):
+        html5lib_time = best_of(get_parser('html5lib'), html)
+        stdlib_time = best_of(get_parser('stdlib'), html)
+        print(
+            f'{name:<6} ({len(html) / 1024:4.0f} KiB)  html5lib {html5lib_time:6.3f}s  '
+            f'stdlib {stdlib_time:6.3f}s  ({html5lib_time / stdlib_time:.1f}x)'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: MIT
+"""
+Parse time for inputs which are adversarial for self-closing tag detection.
+
+The html5lib backend used to mark self-closing tags with a regex
+(``<tag(\\s[^>]*)?\\s*/>``) before parsing. That pattern backtracks over the
+rest of the input for every "<" which is not part of a complete tag (e.g. in
+attribute values or scripts). Self-closing syntax is now taken from the
+tokenizer so these inputs are parsed in linear time. (html5lib's tokenizer
+checks for duplicate attribute names with a linear scan so a single tag with
+thousands of attributes is still quadratic with html5lib.)
+
+Usage: python benchmarks/self_closing_adversarial.py [size]
+"""
+
+import re
+import sys
+import time
+
+from htmlcompare.parser import parse_html
+
+
+# the pattern which was used for preprocessing (for reference)
+_OLD_SELF_CLOSING_TAG_RE = re.compile(r'<([a-zA-Z][a-zA-Z0-9:_-]*)(\s[^>]*)?\s*/>', re.DOTALL)
+
+INPUTS = {
+    '"<" in attribute value': lambda size: '<div title="' + '<a b ' * size + '"></div>',
+    '"<" in script': lambda size: '<script>' + 'if (x <y && ' * size + '1) {}</script>',
+    'long tag without />': lambda size: '<div ' + ''.join(f'a{i}="1" ' for i in range(size)) + '>',
+    'many self-closing': lambda size: '<br/>' * size,
+}
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    for name, build in INPUTS.items():
+        for parser in ('html5lib', 'stdlib'):
+            times = [timed(parse_html, build(n), parser) for n in (size, 2 * size)]
+            ratio = times[1] / times[0]
+            print(f'{name:<22} {parser:<9} {times[0]:7.3f}s  (2x input: {ratio:4.1f}x)')
+        old_times = [timed(_OLD_SELF_CLOSING_TAG_RE.sub, '', build(n)) for n in (size, 2 * size)]
+        print(f'{"":<22} {"old regex":<9} {old_times[0]:7.3f}s  '
+              f'(2x input: {old_times[1] / old_times[0]:4.1f}x, preprocessing only)')
+
+
+if __name__ == '__main__':
+    main()
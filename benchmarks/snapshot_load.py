@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: MIT
+"""
+Time to load a normalized document from a snapshot compared to parsing and
+normalizing the HTML again.
+
+Usage: python benchmarks/snapshot_load.py [table rows]
+"""
+
+import sys
+import tempfile
+import time
+
+from htmlcompare.compare import Comparer
+from htmlcompare.options import CompareOptions
+from htmlcompare.snapshot import SnapshotStore, dumps
+
+
+def build_html(rows: int) -> str:
+    cells = ''.join(
+        f'<tr><td class="c{i % 3}" style="color: red">cell {i} &amp; more</td></tr>'
+        for i in range(rows)
+    )
+    return f'<!DOCTYPE html><html><body><h1>Report</h1><table>{cells}</table></body></html>'
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    html = build_html(rows)
+    print(f'HTML: {len(html) / 1024:.0f} KiB')
+    for parser in ('html5lib', 'stdlib'):
+        comparer = Comparer(CompareOptions(parser=parser))
+        doc, parse_time = timed(comparer.parse_normalized, html)
+        print(f'parse + normalize ({parser:<8}) {parse_time:7.3f}s')
+
+    with tempfile.TemporaryDirectory() as directory:
+        Comparer(cache=SnapshotStore(directory)).parse_normalized(html)
+        comparer = Comparer(cache=SnapshotStore(directory))
+        loaded, load_time = timed(comparer.parse_normalized, html)
+        assert loaded == doc
+        size = len(dumps(doc))
+        print(f'load snapshot                {load_time:7.3f}s  ({size / 1024:.0f} KiB on disk)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: MIT
+"""
+Comparison throughput with an increasing number of threads sharing one
+Comparer (and the latency of a single comparison with parallel parsing).
+
+Threads only scale on free-threaded Python builds (e.g. python3.13t), with
+the GIL the throughput stays roughly the same.
+
+Usage: python benchmarks/thread_scaling.py [number of comparisons]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from htmlcompare.compare import Comparer
+
+
+def build_page(index: int, rows: int = 200) -> str:
+    cells = ''.join(f'<tr><td class="c{i % 3}">{index}-{i}</td></tr>' for i in range(rows))
+    return f'<html><body><h1>Page {index}</h1><table>{cells}</table></body></html>'
+
+
+def gil_status() -> str:
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    if is_gil_enabled is None:
+        return 'GIL enabled (not a free-threaded build)'
+    return 'GIL enabled' if is_gil_enabled() else 'GIL disabled (free-threaded)'
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    pairs = [(build_page(i), build_page(i)) for i in range(count)]
+    print(f'Python {sys.version.split()[0]}, {gil_status()}, {os.cpu_count()} CPUs')
+
+    for parallel in (False, True):
+        comparer = Comparer(parallel=parallel)
+        expected, actual = pairs[0]
+        comparer.compare(expected, actual)
+        start = time.perf_counter()
+        for _ in range(20):
+            comparer.compare(expected, actual)
+        latency = (time.perf_counter() - start) / 20
+        print(f'single comparison (parallel={parallel!s:<5}) {latency * 1000:7.1f} ms')
+
+    comparer = Comparer()
+    baseline = None
+    threads = 1
+    while threads <= 2 * (os.cpu_count() or 1):
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            start = time.perf_counter()
+            results = list(executor.map(lambda pair: comparer.compare(*pair), pairs))
+            throughput = count / (time.perf_counter() - start)
+        assert all(results)
+        baseline = baseline or throughput
+        label = f'{threads} thread(s)'
+        print(f'{label:<12} {throughput:8.1f} comparisons/s  ({throughput / baseline:4.1f}x)')
+        threads *= 2
+
+
+if __name__ == '__main__':
+    main()
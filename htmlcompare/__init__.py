@@ -1,16 +1,28 @@
 # SPDX-License-Identifier: MIT
 
-from htmlcompare.compare import Difference, compare_html
+from htmlcompare.cache import DocumentCache
+from htmlcompare.compare import (
+    Comparer,
+    Difference,
+    compare_fragments,
+    compare_html,
+    iter_differences,
+)
 from htmlcompare.options import CompareOptions
 from htmlcompare.result import ComparisonResult
-from htmlcompare.testutils import assert_different_html, assert_same_html
+from htmlcompare.testutils import assert_different_html, assert_same_fragment, assert_same_html
 
 
 __all__ = [
+    'compare_fragments',
     'compare_html',
+    'iter_differences',
+    'Comparer',
+    'DocumentCache',
     'Difference',
     'CompareOptions',
     'ComparisonResult',
     'assert_different_html',
+    'assert_same_fragment',
     'assert_same_html',
 ]
@@ -0,0 +1,132 @@
+# SPDX-License-Identifier: MIT
+"""
+Comparisons for asyncio applications.
+
+Parsing a large page takes tens of milliseconds, so calling ``compare_html()``
+in a coroutine blocks the event loop. ``AsyncComparer`` runs the work in an
+executor instead:
+
+- with a thread executor (default: the loop's default executor), both
+  documents are parsed and normalized concurrently, followed by the
+  comparison. The ``DocumentCache`` and the parser pools are thread-safe.
+- with a ``ProcessPoolExecutor``, the complete comparison runs in a
+  worker process and only the result is sent back. The
+  ``DocumentCache`` of the comparer is not used in this case.
+"""
+
+import asyncio
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional, Union
+
+from htmlcompare.cache import DocumentCache
+from htmlcompare.compare import (
+    Comparer,
+    check_max_differences,
+    get_comparer,
+    is_identical_input,
+)
+from htmlcompare.nodes import Document
+from htmlcompare.options import CompareOptions
+from htmlcompare.result import ComparisonResult
+
+
+__all__ = ['AsyncComparer', 'compare_html_async']
+
+
+class AsyncComparer:
+    """
+    Compare HTML in coroutines without blocking the event loop.
+
+    ``max_concurrency`` limits the number of comparisons which run at the same
+    time (per event loop), e.g. to keep memory usage in check with large
+    documents. Cancelling a comparison releases its slot immediately.
+    Work which already started in the executor runs to completion, but its
+    result is discarded.
+    """
+    def __init__(
+        self,
+        options: Optional[CompareOptions] = None,
+        cache: Optional[DocumentCache] = None,
+        *,
+        executor: Optional[Executor] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        if (max_concurrency is not None) and (max_concurrency < 1):
+            raise ValueError(f'max_concurrency must be at least 1 (got {max_concurrency})')
+        self.comparer = Comparer(options, cache)
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        # asyncio primitives are bound to one event loop
+        self._semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    @property
+    def options(self) -> CompareOptions:
+        return self.comparer.options
+
+    async def compare(
+        self,
+        expected_html: Union[str, bytes],
+        actual_html: Union[str, bytes],
+        max_differences: Optional[int] = None,
+    ) -> ComparisonResult:
+        """Compare two HTML strings (see ``Comparer.compare()``)."""
+        semaphore = self._semaphore()
+        if semaphore is None:
+            return await self._compare(expected_html, actual_html, max_differences)
+        async with semaphore:
+            return await self._compare(expected_html, actual_html, max_differences)
+
+    async def parse_normalized(self, html: Union[str, bytes]) -> Document:
+        """Parse and normalize ``html`` in the executor (see ``Comparer.parse_normalized()``)."""
+        return await self._run(self.comparer.parse_normalized, html)
+
+    async def _compare(self, expected_html, actual_html, max_differences) -> ComparisonResult:
+        if isinstance(self.executor, ProcessPoolExecutor):
+            return await self._run(
+                _compare_in_worker, self.options, expected_html, actual_html, max_differences,
+            )
+        # same steps as Comparer.compare() but both documents are parsed
+        # concurrently
+        check_max_differences(max_differences)
+        if is_identical_input(expected_html, actual_html):
+            return ComparisonResult(is_equal=True, differences=[])
+        expected, actual = await asyncio.gather(
+            self.parse_normalized(expected_html),
+            self.parse_normalized(actual_html),
+        )
+        return await self._run(self.comparer._compare_normalized, expected, actual, max_differences)
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    def _semaphore(self) -> Optional[asyncio.Semaphore]:
+        if self.max_concurrency is None:
+            return None
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+
+async def compare_html_async(
+    expected_html: Union[str, bytes],
+    actual_html: Union[str, bytes],
+    options: Optional[CompareOptions] = None,
+    *,
+    max_differences: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> ComparisonResult:
+    """
+    Compare two HTML strings without blocking the event loop (see
+    ``compare_html()`` and ``AsyncComparer``).
+    """
+    comparer = AsyncComparer(options, executor=executor)
+    return await comparer.compare(expected_html, actual_html, max_differences)
+
+
+def _compare_in_worker(options, expected_html, actual_html, max_differences) -> ComparisonResult:
+    # runs in a worker process
+    return get_comparer(options).compare(expected_html, actual_html, max_differences)
@@ -0,0 +1,189 @@
+# SPDX-License-Identifier: MIT
+"""
+Compare many pairs of documents in worker processes.
+
+Parsing and comparing is CPU bound so threads do not help (GIL). The pairs
+are sent to a ``ProcessPoolExecutor`` in chunks and each worker process
+reuses one ``Comparer`` for all its comparisons.
+"""
+
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from itertools import islice
+from typing import Optional, Union
+
+from htmlcompare.compare import get_comparer
+from htmlcompare.options import CompareOptions
+from htmlcompare.result import ComparisonResult
+
+
+__all__ = ['BatchResult', 'compare_many']
+
+HTML = Union[str, bytes]
+
+CRASHED_WORKER = 'worker process crashed'
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    """Result of one comparison in ``compare_many()``."""
+    index: int
+    """Position of the compared pair in the input."""
+    result: Optional[ComparisonResult]
+    """None if the comparison failed (see ``error``)."""
+    error: Optional[str] = None
+
+    def __bool__(self) -> bool:
+        return (self.result is not None) and self.result.is_equal
+
+
+def compare_many(
+    pairs: Iterable[tuple[HTML, HTML]],
+    options: Optional[CompareOptions] = None,
+    *,
+    workers: Optional[int] = None,
+    chunksize: int = 16,
+    ordered: bool = True,
+    max_differences: Optional[int] = None,
+    mp_context=None,
+) -> Iterator[BatchResult]:
+    """
+    Compare (expected, actual) pairs in ``workers`` processes (default: one
+    per CPU).
+
+    ``pairs`` is consumed lazily so it can be a generator which reads the
+    documents from disk. With ``ordered=False`` results are yielded as soon
+    as a chunk is completed (use ``BatchResult.index`` to map them to the
+    input).
+
+    A comparison which raises an exception yields a result with ``error``
+    set. If a worker process crashes (e.g. killed because it ran out of
+    memory) the affected pairs are compared again one by one so only the
+    pair which caused the crash is reported as failed.
+
+    Parser backends must be registered in the worker processes as well
+    (e.g. on import of a module) unless the "fork" start method is used
+    (see ``mp_context``).
+    """
+    if chunksize < 1:
+        raise ValueError(f'chunksize must be at least 1 (got {chunksize})')
+    if workers is None:
+        workers = os.cpu_count() or 1
+    elif workers < 1:
+        raise ValueError(f'workers must be at least 1 (got {workers})')
+    runner = _ChunkRunner(options, max_differences, workers, mp_context)
+    batches = runner.run(_chunked(pairs, chunksize), ordered=ordered)
+    for batch in batches:
+        yield from batch
+
+
+def _chunked(pairs: Iterable, chunksize: int) -> Iterator[tuple[int, list]]:
+    iterator = iter(pairs)
+    start = 0
+    while True:
+        chunk = list(islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield (start, chunk)
+        start += len(chunk)
+
+
+class _ChunkRunner:
+    def __init__(self, options, max_differences, workers: int, mp_context):
+        self.options = options
+        self.max_differences = max_differences
+        self.workers = workers
+        self.mp_context = mp_context
+
+    def run(self, chunks: Iterator[tuple[int, list]], ordered: bool) -> Iterator[list]:
+        # Only a few chunks per worker are submitted at a time so the input
+        # is not read (and kept in memory) completely.
+        max_pending = 2 * self.workers
+        # future -> chunk (in submission order)
+        pending: dict = {}
+        executor = self._executor(self.workers)
+        try:
+            while True:
+                while len(pending) < max_pending:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    pending[self._submit(executor, chunk)] = chunk
+                if not pending:
+                    return
+
+                if ordered:
+                    oldest = next(iter(pending))
+                    done = wait([oldest]).done
+                else:
+                    done = wait(pending, return_when=FIRST_COMPLETED).done
+                if any(isinstance(future.exception(), BrokenProcessPool) for future in done):
+                    # all pending futures fail once a worker process crashed
+                    executor.shutdown(wait=True)
+                    yield from self._recover(pending)
+                    pending.clear()
+                    executor = self._executor(self.workers)
+                    continue
+                for future in done:
+                    del pending[future]
+                    yield future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _recover(self, pending: dict) -> Iterator[list]:
+        for future, chunk in pending.items():
+            if future.done() and (future.exception() is None):
+                yield future.result()
+            else:
+                yield self._compare_isolated(chunk)
+
+    def _compare_isolated(self, chunk: tuple[int, list]) -> list:
+        # compare each pair in a single worker process to find the pair
+        # which crashed the worker
+        start, pairs = chunk
+        results = []
+        executor = None
+        try:
+            for index, pair in enumerate(pairs, start=start):
+                if executor is None:
+                    executor = self._executor(1)
+                future = self._submit(executor, (index, [pair]))
+                try:
+                    results.extend(future.result())
+                except BrokenProcessPool:
+                    executor.shutdown(wait=True)
+                    executor = None
+                    results.append(BatchResult(index=index, result=None, error=CRASHED_WORKER))
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+        return results
+
+    def _executor(self, workers: int) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=workers, mp_context=self.mp_context)
+
+    def _submit(self, executor: ProcessPoolExecutor, chunk: tuple[int, list]):
+        start, pairs = chunk
+        return executor.submit(_compare_chunk, self.options, self.max_differences, start, pairs)
+
+
+def _compare_chunk(
+    options: Optional[CompareOptions],
+    max_differences: Optional[int],
+    start: int,
+    pairs: list,
+) -> list[BatchResult]:
+    # runs in the worker process (the Comparer is cached per process)
+    comparer = get_comparer(options)
+    results = []
+    for index, (expected_html, actual_html) in enumerate(pairs, start=start):
+        try:
+            result = comparer.compare(expected_html, actual_html, max_differences)
+            results.append(BatchResult(index=index, result=result))
+        except Exception as exc:
+            error = f'{type(exc).__name__}: {exc}'
+            results.append(BatchResult(index=index, result=None, error=error))
+    return results
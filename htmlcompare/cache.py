@@ -0,0 +1,160 @@
+# SPDX-License-Identifier: MIT
+"""
+Cache for parsed and normalized documents.
+
+Test suites often compare the same "expected" HTML against many different
+outputs. A ``DocumentCache`` (passed to ``Comparer``) keeps the normalized
+tree so the expected HTML is only parsed and normalized once.
+"""
+
+import dataclasses
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from importlib.metadata import PackageNotFoundError, version
+from typing import Optional, Union
+
+from htmlcompare.nodes import ConditionalComment, Document, Element
+from htmlcompare.options import CompareOptions
+
+
+__all__ = ['CacheStats', 'DocumentCache', 'document_cache_key']
+
+
+def _library_version() -> str:
+    try:
+        return version('HTMLCompare')
+    except PackageNotFoundError:
+        return 'unknown'
+
+
+_LIBRARY_VERSION = _library_version()
+
+
+def document_cache_key(
+    html: Union[str, bytes],
+    options: CompareOptions,
+    container: Optional[str] = None,
+) -> tuple:
+    """
+    Return the cache key for ``html`` normalized with ``options``.
+
+    The key contains a digest of the content, all option values (they
+    influence parsing and normalization), the fragment ``container`` (None
+    for complete documents) and the library version.
+    """
+    if isinstance(html, str):
+        # str and bytes are decoded differently so their keys must not collide
+        content = b's' + html.encode('utf-8', 'surrogatepass')
+    else:
+        content = b'b' + html
+    digest = hashlib.blake2b(content, digest_size=20).digest()
+    return (digest, dataclasses.astuple(options), container, _LIBRARY_VERSION)
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size_bytes: int
+    """Sum of the source HTML lengths of all cached documents."""
+    size_nodes: int
+    """Total number of nodes in all cached documents."""
+
+
+class DocumentCache:
+    """
+    Thread-safe LRU cache for normalized documents.
+
+    The cache size is limited by the size of the source HTML in bytes
+    (``max_bytes``, ``str`` is counted as UTF-8) and/or by the number of nodes
+    in the cached trees (``max_nodes``). The least recently used documents are
+    evicted first. ``None`` disables the respective limit.
+
+    Cached documents are shared so they must not be modified.
+    """
+    def __init__(
+        self,
+        max_bytes: Optional[int] = 64 * 1024 * 1024,
+        max_nodes: Optional[int] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.max_nodes = max_nodes
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._size_bytes = 0
+        self._size_nodes = 0
+
+    def get(self, key) -> Optional[Document]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key, document: Document, size_bytes: int) -> None:
+        size_nodes = _count_nodes(document)
+        if self._exceeds_limits(size_bytes, size_nodes):
+            # would evict everything else and still not fit
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size_bytes -= previous[1]
+                self._size_nodes -= previous[2]
+            self._entries[key] = (document, size_bytes, size_nodes)
+            self._size_bytes += size_bytes
+            self._size_nodes += size_nodes
+            while self._exceeds_limits(self._size_bytes, self._size_nodes):
+                _key, (_document, entry_bytes, entry_nodes) = self._entries.popitem(last=False)
+                self._size_bytes -= entry_bytes
+                self._size_nodes -= entry_nodes
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """Remove all cached documents (the statistics are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+            self._size_nodes = 0
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=len(self._entries),
+                size_bytes=self._size_bytes,
+                size_nodes=self._size_nodes,
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _exceeds_limits(self, size_bytes: int, size_nodes: int) -> bool:
+        if (self.max_bytes is not None) and (size_bytes > self.max_bytes):
+            return True
+        return (self.max_nodes is not None) and (size_nodes > self.max_nodes)
+
+
+def _count_nodes(doc: Document) -> int:
+    count = 0
+    pending = [doc.children]
+    while pending:
+        children = pending.pop()
+        count += len(children)
+        for child in children:
+            if isinstance(child, (Element, ConditionalComment)) and child.children:
+                pending.append(child.children)
+    return count
@@ -0,0 +1,332 @@
+# SPDX-License-Identifier: MIT
+"""
+Canonical serialization of normalized documents.
+
+Two documents which are the same according to ``compare_html()`` have the
+same canonical form, so it can be hashed (e.g. to deduplicate pages) or
+compared with ordinary text diff tools::
+
+    html = canonicalize_html('<p class="b a" style="color:red;margin:0px">x</p>')
+    # '<html>\\n  <head></head>\\n  <body>\\n    <p class="a b" style="color: red; ...'
+
+The canonical form is HTML:
+
+- attributes are sorted by name, class tokens are sorted and deduplicated,
+  empty class/style attributes are dropped.
+- inline styles and stylesheets (``<style>``) are written from their
+  normalized CSS (declarations sorted by name, "0px" as "0", ...). Invalid
+  inline styles are kept as they are.
+- each child of a block element (where whitespace is not significant) is
+  written on a separate line, indented by two spaces per level (up to
+  ``MAX_INDENT_DEPTH`` levels). Whitespace in inline context is kept.
+
+CSS selectors are normalized without whitespace (see
+``htmlcompare.compare_css``) so they are not always written as in the source.
+"""
+
+from collections.abc import Iterator
+from typing import Optional, TextIO, Union
+
+from tinycss2.serializer import (
+    serialize_identifier,
+    serialize_name,
+    serialize_string_value,
+    serialize_url,
+)
+
+from htmlcompare.compare import get_comparer
+from htmlcompare.compare_css import InvalidCSSError, canonical_css, canonical_stylesheet
+from htmlcompare.elements import (
+    HTML5_VOID_ELEMENTS,
+    is_block_element,
+    is_preformatted_element,
+    is_self_closing_significant,
+)
+from htmlcompare.nodes import Comment, ConditionalComment, Doctype, Document, Element, TextNode
+from htmlcompare.normalize import is_inline_context
+from htmlcompare.options import CompareOptions
+
+
+__all__ = ['canonicalize', 'canonicalize_html', 'iter_canonical', 'write_canonical']
+
+INDENT = '  '
+# Deeper levels are not indented any further, otherwise the output would grow
+# quadratically with the nesting depth.
+MAX_INDENT_DEPTH = 40
+
+# content of these elements is not parsed as HTML (no character references)
+RAW_TEXT_ELEMENTS = frozenset({
+    'iframe', 'noembed', 'noframes', 'script', 'style', 'xmp',
+})
+
+
+def canonicalize_html(
+    html: Union[str, bytes],
+    options: Optional[CompareOptions] = None,
+    *,
+    container: Optional[str] = None,
+) -> str:
+    """
+    Return the canonical form of ``html`` (see module docstring).
+
+    ``options`` are the same as for ``compare_html()`` (e.g. comments are
+    only included with ``ignore_comments=False``). With ``container`` the HTML
+    is treated as fragment (see ``compare_fragments()``).
+    """
+    doc = get_comparer(options).parse_normalized(html, container)
+    return canonicalize(doc, container=container)
+
+
+def canonicalize(doc: Document, *, container: Optional[str] = None) -> str:
+    """Return the canonical form of a normalized document."""
+    return ''.join(iter_canonical(doc, container=container))
+
+
+def write_canonical(
+    doc: Document,
+    stream: TextIO,
+    *,
+    container: Optional[str] = None,
+) -> None:
+    """Write the canonical form of a normalized document to ``stream``."""
+    for chunk in iter_canonical(doc, container=container):
+        stream.write(chunk)
+
+
+def iter_canonical(doc: Document, *, container: Optional[str] = None) -> Iterator[str]:
+    """
+    Yield the canonical form of a normalized document in chunks.
+
+    The tree is traversed with an explicit stack (no recursion) so deeply
+    nested documents can be serialized.
+    """
+    if doc.doctype is not None:
+        yield _doctype(doc.doctype) + '\n'
+    if container is None:
+        on_lines = True
+    else:
+        on_lines = _children_on_lines(container, doc.children)
+    yield from _iter_nodes(doc.children, container, on_lines, depth=0)
+    if doc.children and not on_lines:
+        yield '\n'
+
+
+def _iter_nodes(
+    nodes: list,
+    parent_tag: Optional[str],
+    on_lines: bool,
+    depth: int,
+) -> Iterator[str]:
+    # work items: (node, parent_tag, on_lines, depth) or a string (end tag)
+    stack: list = [(node, parent_tag, on_lines, depth) for node in reversed(nodes)]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            yield item
+            continue
+        node, parent_tag, on_lines, depth = item
+        indent = (INDENT * min(depth, MAX_INDENT_DEPTH)) if on_lines else ''
+        newline = '\n' if on_lines else ''
+        if isinstance(node, TextNode):
+            yield indent + _text(node.content, parent_tag) + newline
+        elif isinstance(node, Element):
+            tag = node.tag
+            start_tag = '<' + tag + _attributes(node.attributes)
+            if node.is_self_closing and is_self_closing_significant(tag):
+                start_tag += '/>'
+            else:
+                start_tag += '>'
+            if tag.lower() in HTML5_VOID_ELEMENTS and not node.children:
+                yield indent + start_tag + newline
+                continue
+            children_on_lines = _children_on_lines(tag, node.children)
+            if children_on_lines:
+                yield indent + start_tag + '\n'
+                stack.append(indent + '</' + tag + '>' + newline)
+            else:
+                yield indent + start_tag
+                stack.append('</' + tag + '>' + newline)
+            stack.extend(
+                (child, tag, children_on_lines, depth + 1) for child in reversed(node.children)
+            )
+        elif isinstance(node, Comment):
+            yield indent + '<!--' + node.content + '-->' + newline
+        elif isinstance(node, ConditionalComment):
+            start = '<!--[if ' + node.condition + ']>'
+            # children of conditional comments are always in block context
+            children_on_lines = _has_elements(node.children)
+            if children_on_lines:
+                yield indent + start + '\n'
+                stack.append(indent + '<![endif]-->' + newline)
+            else:
+                yield indent + start
+                stack.append('<![endif]-->' + newline)
+            stack.extend(
+                (child, None, children_on_lines, depth + 1) for child in reversed(node.children)
+            )
+
+
+def _children_on_lines(tag: str, children: list) -> bool:
+    # Line breaks and indentation are only added where whitespace is not
+    # significant (the same rule as in normalize_tree()). Content without
+    # elements (e.g. "<p>Hello</p>") is kept on one line.
+    if is_preformatted_element(tag) or (tag.lower() in RAW_TEXT_ELEMENTS):
+        return False
+    if not is_block_element(tag) or is_inline_context(children):
+        return False
+    return _has_elements(children)
+
+
+def _has_elements(nodes: list) -> bool:
+    return any(isinstance(node, (Element, ConditionalComment)) for node in nodes)
+
+
+def _doctype(doctype: Doctype) -> str:
+    declaration = '<!DOCTYPE ' + doctype.name
+    if doctype.public_id:
+        declaration += ' PUBLIC "' + doctype.public_id + '"'
+        if doctype.system_id:
+            declaration += ' "' + doctype.system_id + '"'
+    elif doctype.system_id:
+        declaration += ' SYSTEM "' + doctype.system_id + '"'
+    return declaration + '>'
+
+
+def _attributes(attributes: dict[str, str]) -> str:
+    parts = []
+    for key in sorted(attributes):
+        value = attributes[key]
+        if key == 'class':
+            if not value.strip():
+                # an empty class attribute is same as absent
+                continue
+            value = ' '.join(sorted(set(value.split())))
+        elif key == 'style':
+            if not value.strip():
+                continue
+            value = _style(value)
+        parts.append(' ' + key + '="' + _escape_attribute(value) + '"')
+    return ''.join(parts)
+
+
+def _text(content: str, parent_tag: Optional[str]) -> str:
+    if parent_tag is None:
+        return _escape_text(content)
+    parent_tag = parent_tag.lower()
+    if parent_tag == 'style':
+        return _stylesheet(canonical_stylesheet(content))
+    elif parent_tag in RAW_TEXT_ELEMENTS:
+        return content
+    return _escape_text(content)
+
+
+def _escape_text(text: str) -> str:
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _escape_attribute(value: str) -> str:
+    return value.replace('&', '&amp;').replace('"', '&quot;')
+
+
+# --- CSS -------------------------------------------------------------------
+# The normalized CSS from htmlcompare.compare_css consists of nested tuples of
+# token keys (see _token_key() there) which are written back as CSS text.
+
+def _style(value: str) -> str:
+    try:
+        declarations = canonical_css(value)
+    except InvalidCSSError:
+        # invalid declaration list: only identical styles are equal
+        return value
+    return _declarations(declarations)
+
+
+def _declarations(declarations: tuple) -> str:
+    parts = []
+    for name, important, value_keys in declarations:
+        declaration = serialize_identifier(name) + ': ' + _value(value_keys)
+        if important:
+            declaration += ' !important'
+        parts.append(declaration)
+    return '; '.join(parts)
+
+
+def _stylesheet(rules: tuple) -> str:
+    parts = []
+    for rule in rules:
+        if rule[0] == 'qualified-rule':
+            _, prelude, declarations = rule
+            parts.append(_selector(prelude) + ' { ' + _declarations(declarations) + ' }')
+        elif rule[0] == 'at-rule':
+            _, keyword, prelude, content = rule
+            at_rule = '@' + serialize_identifier(keyword)
+            if prelude:
+                at_rule += ' ' + _value(prelude)
+            if content is None:
+                at_rule += ';'
+            else:
+                at_rule += ' { ' + _stylesheet(content) + ' }'
+            parts.append(at_rule)
+        else:
+            # parse error (kept in the normalized form)
+            parts.append('/* ' + ' '.join(rule) + ' */')
+    return ' '.join(parts)
+
+
+def _value(keys: tuple) -> str:
+    # whitespace between top-level tokens was removed during normalization
+    parts = []
+    for key in keys:
+        if parts and not _is_literal(key, ',;'):
+            parts.append(' ')
+        parts.append(_token(key))
+    return ''.join(parts)
+
+
+def _selector(keys: tuple) -> str:
+    # no whitespace around "." and ":" for compound selectors ("a.b", "a:hover")
+    parts = []
+    previous = None
+    for key in keys:
+        if parts and not _is_literal(key, ',.:') and not _is_literal(previous, '.:'):
+            parts.append(' ')
+        parts.append(_token(key))
+        previous = key
+    return ''.join(parts)
+
+
+def _is_literal(key: Optional[tuple], values: str) -> bool:
+    return (key is not None) and (key[0] == 'literal') and (key[1] in values)
+
+
+def _token(key: tuple) -> str:
+    token_type = key[0]
+    if token_type == 'ident':
+        return serialize_identifier(key[1])
+    elif token_type == 'hash':
+        return '#' + serialize_name(key[1])
+    elif token_type == 'string':
+        return '"' + serialize_string_value(key[1]) + '"'
+    elif token_type == 'url':
+        return 'url(' + serialize_url(key[1]) + ')'
+    elif token_type == 'comment':
+        return '/*' + key[1] + '*/'
+    elif token_type == 'percentage':
+        return key[1] + '%'
+    elif token_type == 'dimension':
+        return key[1] + serialize_identifier(key[2])
+    elif token_type == 'function':
+        return serialize_identifier(key[1]) + '(' + _tokens(key[2]) + ')'
+    elif token_type == '() block':
+        return '(' + _tokens(key[1]) + ')'
+    elif token_type == '[] block':
+        return '[' + _tokens(key[1]) + ']'
+    elif token_type == '{} block':
+        return '{' + _tokens(key[1]) + '}'
+    # literal, whitespace, number and rare tokens (already serialized)
+    return key[1]
+
+
+def _tokens(keys: tuple) -> str:
+    # nested tokens still contain their whitespace
+    return ''.join(_token(key) for key in keys)
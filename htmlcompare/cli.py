@@ -1,24 +1,330 @@
 # SPDX-License-Identifier: MIT
+"""
+Command line interface.
 
+``htmlcompare EXPECTED ACTUAL`` compares two files,
+``htmlcompare --recursive EXPECTED_DIR ACTUAL_DIR`` compares all HTML files
+in two directory trees (paired by their relative path) in worker processes.
+``htmlcompare serve`` starts a comparison server (see ``htmlcompare.server``).
+``htmlcompare canonicalize [FILE]`` writes the canonical form of a file (see
+``htmlcompare.canonical``). To compare files which are named like a
+subcommand put ``--`` before the file names.
+
+Exit codes: 0 if everything is the same, 1 if there are differences (or
+missing/extra files) and 2 for errors (e.g. unreadable files).
+"""
+
+import argparse
+import json
+import os
 import sys
+from collections.abc import Iterator
+from fnmatch import fnmatch
+from typing import Optional
+
+from htmlcompare.batch import compare_many
+from htmlcompare.canonical import write_canonical
+from htmlcompare.compare import compare_html, get_comparer
+from htmlcompare.options import CompareOptions
+from htmlcompare.parser import DEFAULT_PARSER, available_parsers
+from htmlcompare.result import ComparisonResult
+from htmlcompare.server import DEFAULT_CACHE_BYTES, ComparisonServer, serve_socket, serve_stdio
+
+
+__all__ = ['htmlcompare_cli']
+
+EXIT_SAME = 0
+EXIT_DIFFERENT = 1
+EXIT_ERROR = 2
+
+DEFAULT_PATTERNS = ('*.html', '*.htm')
+
+# status of a file in the report
+SAME = 'same'
+DIFFERENT = 'different'
+MISSING = 'missing'
+EXTRA = 'extra'
+ERROR = 'error'
+
+
+def htmlcompare_cli(argv: Optional[list[str]] = None) -> None:
+    sys.exit(main(argv))
+
 
-from .testutils import assert_same_html
+def main(argv: Optional[list[str]] = None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    # subcommands, "htmlcompare -- serve canonicalize" compares files with these names
+    if argv[:1] == ['serve']:
+        return _serve(argv[1:])
+    elif argv[:1] == ['canonicalize']:
+        return _canonicalize(argv[1:])
+    arg_parser = _argument_parser()
+    args = arg_parser.parse_args(argv)
+    options = _options(args)
+    if args.recursive:
+        for path in (args.expected, args.actual):
+            if not os.path.isdir(path):
+                arg_parser.error(f'not a directory: {path}')
+        entries = _compare_directories(args, options)
+    else:
+        entries = iter([_compare_files(args, options)])
 
+    # the text output must not end up in a JSON report written to stdout
+    text_stream = sys.stderr if (args.json == '-') else sys.stdout
+    counts = dict.fromkeys((SAME, DIFFERENT, MISSING, EXTRA, ERROR), 0)
+    files = []
+    for entry in entries:
+        counts[entry['status']] += 1
+        if args.json is not None:
+            files.append(entry)
+        _print_entry(entry, text_stream, quiet=args.quiet)
 
-__all__ = []
+    if args.recursive:
+        summary = ', '.join(f'{count} {status}' for status, count in counts.items())
+        print(f'{sum(counts.values())} files: {summary}', file=text_stream)
+    elif counts[SAME]:
+        print('HTML in both files is the same. :-)', file=text_stream)
 
-def htmlcompare_cli():
-    if len(sys.argv) < 3:
-        sys.stderr.write('usage: htmlcompare <EXPECTED> <ACTUAL>\n')
-        sys.exit(1)
-    expected_fn, actual_fn = sys.argv[1:3]
-    with open(expected_fn, 'rb') as expected_fp:
-        expected_html = expected_fp.read().decode('utf8')
-    with open(actual_fn, 'rb') as actual_fp:
-        actual_html = actual_fp.read().decode('utf8')
+    if args.json is not None:
+        report = {
+            'expected': args.expected,
+            'actual': args.actual,
+            'summary': counts,
+            'files': files,
+        }
+        _write_json(report, args.json)
+
+    if counts[ERROR]:
+        return EXIT_ERROR
+    if counts[DIFFERENT] or counts[MISSING] or counts[EXTRA]:
+        return EXIT_DIFFERENT
+    return EXIT_SAME
+
+
+def _argument_parser() -> argparse.ArgumentParser:
+    arg_parser = argparse.ArgumentParser(
+        prog='htmlcompare',
+        description='Compare HTML files while ignoring non-functional differences.',
+        epilog=(
+            'other commands: "htmlcompare serve" (comparison server) and '
+            '"htmlcompare canonicalize" (canonical form of a file), see their --help. '
+            'Use "htmlcompare -- EXPECTED ACTUAL" to compare files with these names.'
+        ),
+    )
+    arg_parser.add_argument('expected', metavar='EXPECTED')
+    arg_parser.add_argument('actual', metavar='ACTUAL')
+    arg_parser.add_argument(
+        '-r', '--recursive', action='store_true',
+        help='compare all HTML files in two directories (paired by relative path)',
+    )
+    arg_parser.add_argument(
+        '--pattern', action='append', dest='patterns', metavar='GLOB',
+        help='file name pattern for --recursive (default: *.html, *.htm), can be repeated',
+    )
+    arg_parser.add_argument(
+        '-j', '--workers', type=int, default=None,
+        help='number of worker processes for --recursive (default: number of CPUs)',
+    )
+    arg_parser.add_argument(
+        '--json', metavar='FILE',
+        help='write a JSON report to FILE ("-" for stdout)',
+    )
+    arg_parser.add_argument(
+        '--max-differences', type=int, default=None, metavar='N',
+        help='stop comparing a file after N differences',
+    )
+    _add_option_arguments(arg_parser)
+    arg_parser.add_argument(
+        '-q', '--quiet', action='store_true', help='do not list files which are the same',
+    )
+    return arg_parser
+
+
+def _add_option_arguments(arg_parser: argparse.ArgumentParser) -> None:
+    arg_parser.add_argument(
+        '--parser', choices=available_parsers(), default=DEFAULT_PARSER,
+        help=f'parser backend (default: {DEFAULT_PARSER})',
+    )
+    arg_parser.add_argument(
+        '--compare-comments', action='store_true', help='do not ignore HTML comments',
+    )
+    arg_parser.add_argument(
+        '--ignore-conditional-comments', action='store_true',
+        help='ignore IE conditional comments',
+    )
+
+
+def _options(args) -> CompareOptions:
+    return CompareOptions(
+        ignore_comments=not args.compare_comments,
+        ignore_conditional_comments=args.ignore_conditional_comments,
+        parser=args.parser,
+    )
+
+
+def _serve(argv: list[str]) -> int:
+    arg_parser = argparse.ArgumentParser(
+        prog='htmlcompare serve',
+        description='Answer comparison requests (NDJSON) from stdin or a Unix socket.',
+    )
+    arg_parser.add_argument(
+        '--socket', metavar='PATH', help='listen on a Unix socket instead of stdin/stdout',
+    )
+    arg_parser.add_argument(
+        '-j', '--workers', type=int, default=None,
+        help='number of worker processes (default: number of CPUs)',
+    )
+    arg_parser.add_argument(
+        '--cache-mb', type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+        help='document cache size per worker process in MiB (source HTML)',
+    )
+    args = arg_parser.parse_args(argv)
+    server = ComparisonServer(workers=args.workers, cache_bytes=args.cache_mb * 1024 * 1024)
     try:
-        assert_same_html(expected_html, actual_html, verbose=True)
-    except AssertionError:
-        raise
-        sys.exit(10)
-    print('HTML in both files is the same. :-)')
+        if args.socket:
+            serve_socket(server, args.socket)
+        else:
+            serve_stdio(server, sys.stdin, sys.stdout)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    return EXIT_SAME
+
+
+def _canonicalize(argv: list[str]) -> int:
+    arg_parser = argparse.ArgumentParser(
+        prog='htmlcompare canonicalize',
+        description='Write the canonical form of an HTML file (for hashing or text diffs).',
+    )
+    arg_parser.add_argument(
+        'path', metavar='FILE', nargs='?', default='-', help='HTML file (default: stdin)',
+    )
+    arg_parser.add_argument(
+        '-o', '--output', metavar='FILE', default='-', help='output file (default: stdout)',
+    )
+    arg_parser.add_argument(
+        '--container', metavar='TAG',
+        help='treat the HTML as fragment inside a TAG element (e.g. "body")',
+    )
+    _add_option_arguments(arg_parser)
+    args = arg_parser.parse_args(argv)
+    try:
+        if args.path == '-':
+            html = sys.stdin.buffer.read().decode('utf8')
+        else:
+            html = _read_html(args.path)
+        doc = get_comparer(_options(args)).parse_normalized(html, args.container)
+        if args.output == '-':
+            write_canonical(doc, sys.stdout, container=args.container)
+        else:
+            with open(args.output, 'w', encoding='utf8') as output_fp:
+                write_canonical(doc, output_fp, container=args.container)
+    except (OSError, UnicodeDecodeError, ValueError) as exc:
+        print(f'htmlcompare canonicalize: {type(exc).__name__}: {exc}', file=sys.stderr)
+        return EXIT_ERROR
+    return EXIT_SAME
+
+
+def _compare_files(args, options: CompareOptions) -> dict:
+    path = os.path.basename(args.actual)
+    try:
+        expected_html = _read_html(args.expected)
+        actual_html = _read_html(args.actual)
+        result = compare_html(
+            expected_html, actual_html, options, max_differences=args.max_differences,
+        )
+    except (OSError, UnicodeDecodeError, ValueError) as exc:
+        return _error_entry(path, exc)
+    return _result_entry(path, result)
+
+
+def _compare_directories(args, options: CompareOptions) -> Iterator[dict]:
+    patterns = args.patterns or DEFAULT_PATTERNS
+    expected_paths = set(_find_files(args.expected, patterns))
+    actual_paths = set(_find_files(args.actual, patterns))
+    for path in sorted(expected_paths - actual_paths):
+        yield {'path': path, 'status': MISSING}
+    for path in sorted(actual_paths - expected_paths):
+        yield {'path': path, 'status': EXTRA}
+
+    compared_paths = []
+    read_errors = []
+
+    def read_pairs():
+        for path in sorted(expected_paths & actual_paths):
+            try:
+                pair = (
+                    _read_html(os.path.join(args.expected, path)),
+                    _read_html(os.path.join(args.actual, path)),
+                )
+            except (OSError, UnicodeDecodeError) as exc:
+                read_errors.append(_error_entry(path, exc))
+                continue
+            compared_paths.append(path)
+            yield pair
+
+    results = compare_many(
+        read_pairs(), options, workers=args.workers, max_differences=args.max_differences,
+    )
+    for item in results:
+        # files which could not be read are reported as soon as possible
+        yield from read_errors
+        read_errors.clear()
+        path = compared_paths[item.index]
+        if item.result is None:
+            yield {'path': path, 'status': ERROR, 'error': item.error}
+        else:
+            yield _result_entry(path, item.result)
+    yield from read_errors
+
+
+def _find_files(root: str, patterns) -> Iterator[str]:
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            if any(fnmatch(filename, pattern) for pattern in patterns):
+                path = os.path.relpath(os.path.join(dirpath, filename), root)
+                # the same relative path on all platforms (JSON report)
+                yield path.replace(os.sep, '/')
+
+
+def _read_html(path: str) -> str:
+    with open(path, 'rb') as html_fp:
+        return html_fp.read().decode('utf8')
+
+
+def _result_entry(path: str, result: ComparisonResult) -> dict:
+    if result.is_equal:
+        return {'path': path, 'status': SAME}
+    differences = [difference.to_dict() for difference in result.differences]
+    return {'path': path, 'status': DIFFERENT, 'differences': differences}
+
+
+def _error_entry(path: str, exc: Exception) -> dict:
+    return {'path': path, 'status': ERROR, 'error': f'{type(exc).__name__}: {exc}'}
+
+
+def _print_entry(entry: dict, stream, quiet: bool) -> None:
+    status = entry['status']
+    if quiet and (status == SAME):
+        return
+    if status == ERROR:
+        print(f'{status:<9} {entry["path"]}: {entry["error"]}', file=stream)
+        return
+    print(f'{status:<9} {entry["path"]}', file=stream)
+    for difference in entry.get('differences', ()):
+        if difference['message']:
+            details = difference['message']
+        else:
+            details = f'expected {difference["expected"]!r}, got {difference["actual"]!r}'
+        print(f'  - {difference["type"]} at {difference["path"]}: {details}', file=stream)
+
+
+def _write_json(report: dict, filename: str) -> None:
+    if filename == '-':
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return
+    with open(filename, 'w', encoding='utf8') as json_fp:
+        json.dump(report, json_fp, indent=2)
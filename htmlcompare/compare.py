@@ -1,9 +1,16 @@
 # SPDX-License-Identifier: MIT
 
+import threading
 from collections.abc import Iterator, Sequence
-from typing import Optional
-
-from htmlcompare.compare_css import compare_css, compare_stylesheet
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+from typing import Optional, Union
+
+from htmlcompare.cache import DocumentCache, document_cache_key
+from htmlcompare.compare_css import InvalidCSSError, compare_css, compare_stylesheet
+from htmlcompare.digest import document_digest
 from htmlcompare.elements import is_self_closing_significant
 from htmlcompare.nodes import (
     Comment,
@@ -16,42 +23,425 @@ from htmlcompare.nodes import (
 )
 from htmlcompare.normalize import normalize_tree
 from htmlcompare.options import CompareOptions
-from htmlcompare.parser import parse_html
+from htmlcompare.parser import ParserBackend, get_parser
+from htmlcompare.path import (
+    ATTRIBUTE,
+    CHILD,
+    CONDITIONAL,
+    DOCTYPE_PATH,
+    ELEMENT,
+    DifferencePath,
+    SiblingPositions,
+)
 from htmlcompare.result import ComparisonResult, Difference, DifferenceType
 
 
-__all__ = ['compare_html']
+__all__ = [
+    'Comparer',
+    'FastPathStats',
+    'compare_fragments',
+    'compare_html',
+    'fast_path_stats',
+    'get_comparer',
+    'iter_differences',
+    'reset_fast_path_stats',
+]
+
+
+class Comparer:
+    """
+    Reusable HTML comparison with a fixed set of options.
+
+    All the setup work (resolving options, looking up the parser backend) is
+    done once so a ``Comparer`` is the cheapest way to run many comparisons.
+    Instances can be shared between threads.
+
+    With a ``DocumentCache`` normalized documents are reused when the same
+    HTML is compared again (e.g. a golden "expected" document). A
+    ``SnapshotStore`` (``htmlcompare.snapshot``) keeps them on disk between
+    test runs.
+
+    With ``parallel=True`` the expected HTML is parsed and normalized in a
+    separate thread while the calling thread handles the actual HTML. This
+    only reduces the latency on free-threaded Python builds (3.13t+),
+    otherwise both threads compete for the GIL.
+    """
+    def __init__(
+        self,
+        options: Optional[CompareOptions] = None,
+        cache: Optional[DocumentCache] = None,
+        *,
+        parallel: bool = False,
+    ):
+        self.options = options if (options is not None) else CompareOptions()
+        self.cache = cache
+        self.parallel = parallel
+        self._parser: ParserBackend = get_parser(self.options.parser)
+
+    def parse(self, html: Union[str, bytes]) -> Document:
+        """Parse an HTML string with the configured parser backend."""
+        return self._parser.parse(html)
+
+    def parse_fragment(self, html: Union[str, bytes], container: str = 'body') -> Document:
+        """Parse an HTML fragment (see ``htmlcompare.parser.parse_fragment()``)."""
+        return Document(children=self._parser.parse_fragment(html, container))
+
+    def normalize(self, doc: Document) -> Document:
+        """Return a normalized copy of ``doc`` (see ``normalize_tree()``)."""
+        return normalize_tree(doc, self.options)
+
+    def compare(
+        self,
+        expected_html: Union[str, bytes],
+        actual_html: Union[str, bytes],
+        max_differences: Optional[int] = None,
+    ) -> ComparisonResult:
+        """
+        Compare two HTML strings for equality.
+
+        This implementation uses a tree-based approach with normalization
+        to handle insignificant whitespace between block elements.
+
+        The comparison stops once ``max_differences`` differences were found
+        (e.g. ``max_differences=1`` when only equality matters).
+
+        Identical input is not parsed at all and documents with the same
+        digest (see ``htmlcompare.digest``) are not compared node by node
+        (see ``fast_path_stats()``).
+        """
+        return self._compare(expected_html, actual_html, max_differences)
+
+    def iter_differences(
+        self,
+        expected_html: Union[str, bytes],
+        actual_html: Union[str, bytes],
+    ) -> Iterator[Difference]:
+        """Yield the differences between two HTML strings (see ``iter_differences()``)."""
+        expected_normalized, actual_normalized = self._parse_normalized_pair(
+            expected_html, actual_html,
+        )
+        return _iter_tree_differences(expected_normalized, actual_normalized)
+
+    def compare_fragments(
+        self,
+        expected_html: Union[str, bytes],
+        actual_html: Union[str, bytes],
+        max_differences: Optional[int] = None,
+        container: str = 'body',
+    ) -> ComparisonResult:
+        """
+        Compare two HTML fragments (e.g. rendered widgets) for equality.
+
+        Both fragments are parsed as content of a ``container`` element
+        without the ``<html>``/``<head>``/``<body>`` scaffolding of a complete
+        document. Paths in the result are relative to the fragment root.
+        """
+        return self._compare(expected_html, actual_html, max_differences, container)
+
+    def parse_normalized(
+        self,
+        html: Union[str, bytes],
+        container: Optional[str] = None,
+    ) -> Document:
+        """
+        Parse and normalize ``html`` (using the cache if configured).
+
+        With ``container`` the HTML is parsed as fragment (content of a
+        ``container`` element). Documents returned from the cache are shared
+        and must not be modified.
+        """
+        if self.cache is None:
+            return self._parse_and_normalize(html, container)
+        key = document_cache_key(html, self.options, container)
+        doc = self.cache.get(key)
+        if doc is None:
+            doc = self._parse_and_normalize(html, container)
+            self.cache.put(key, doc, size_bytes=_html_size_bytes(html))
+        return doc
+
+    def _compare(
+        self,
+        expected_html: Union[str, bytes],
+        actual_html: Union[str, bytes],
+        max_differences: Optional[int],
+        container: Optional[str] = None,
+    ) -> ComparisonResult:
+        check_max_differences(max_differences)
+        if is_identical_input(expected_html, actual_html):
+            return ComparisonResult(is_equal=True, differences=[])
+        # normalize trees to remove insignificant whitespace
+        expected_normalized, actual_normalized = self._parse_normalized_pair(
+            expected_html, actual_html, container,
+        )
+        return self._compare_normalized(
+            expected_normalized, actual_normalized, max_differences, container,
+        )
+
+    def _compare_normalized(
+        self,
+        expected_normalized: Document,
+        actual_normalized: Document,
+        max_differences: Optional[int],
+        container: Optional[str] = None,
+    ) -> ComparisonResult:
+        expected_digest = _document_digest(expected_normalized)
+        actual_digest = _document_digest(actual_normalized)
+        if (expected_digest is not None) and (expected_digest == actual_digest):
+            _fast_path_counters.add(equal_digest=1)
+            return ComparisonResult(is_equal=True, differences=[])
+        _fast_path_counters.add(full=1)
+        return _compare_trees(
+            expected_normalized, actual_normalized, max_differences, parent_tag=container,
+        )
+
+    def _parse_normalized_pair(
+        self,
+        expected_html: Union[str, bytes],
+        actual_html: Union[str, bytes],
+        container: Optional[str] = None,
+    ) -> tuple[Document, Document]:
+        if not self.parallel:
+            return (
+                self.parse_normalized(expected_html, container),
+                self.parse_normalized(actual_html, container),
+            )
+        expected_future = _parse_executor().submit(self.parse_normalized, expected_html, container)
+        actual_normalized = self.parse_normalized(actual_html, container)
+        return (expected_future.result(), actual_normalized)
+
+    def _parse_and_normalize(
+        self,
+        html: Union[str, bytes],
+        container: Optional[str] = None,
+    ) -> Document:
+        doc = self.parse(html) if (container is None) else self.parse_fragment(html, container)
+        # the parsed tree is not referenced anywhere else so it can be
+        # normalized in place (instead of building a second tree)
+        return normalize_tree(doc, self.options, in_place=True, container=container)
+
+
+@dataclass(frozen=True)
+class FastPathStats:
+    identical_input: int
+    """Comparisons of identical HTML (without parsing)."""
+    equal_digest: int
+    """Comparisons of normalized documents with the same digest."""
+    full: int
+    """Comparisons which compared the documents node by node."""
+
+
+class _FastPathCounters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def add(self, identical_input: int = 0, equal_digest: int = 0, full: int = 0) -> None:
+        with self._lock:
+            self._identical_input += identical_input
+            self._equal_digest += equal_digest
+            self._full += full
+
+    def reset(self) -> None:
+        with self._lock:
+            self._identical_input = 0
+            self._equal_digest = 0
+            self._full = 0
+
+    def stats(self) -> FastPathStats:
+        with self._lock:
+            return FastPathStats(
+                identical_input=self._identical_input,
+                equal_digest=self._equal_digest,
+                full=self._full,
+            )
+
+
+_fast_path_counters = _FastPathCounters()
+
+
+def fast_path_stats() -> FastPathStats:
+    """
+    Return how often comparisons (in this process) were decided by a fast
+    path (identical input, same document digest) and how often the documents
+    had to be compared node by node.
+    """
+    return _fast_path_counters.stats()
+
+
+def reset_fast_path_stats() -> None:
+    _fast_path_counters.reset()
+
+
+def _document_digest(doc: Document) -> Optional[bytes]:
+    # the digests of all nodes are computed during normalization so this only
+    # needs the top-level nodes (None for trees without digests)
+    child_digests = [child.digest for child in doc.children]
+    if None in child_digests:
+        return None
+    return document_digest(doc.doctype, child_digests)
+
+
+_parse_executor_instance: Optional[ThreadPoolExecutor] = None
+_parse_executor_lock = threading.Lock()
+
+
+def _parse_executor() -> ThreadPoolExecutor:
+    # shared by all comparers with parallel=True (tasks never wait for other
+    # tasks so a bounded pool can not deadlock)
+    global _parse_executor_instance
+    with _parse_executor_lock:
+        if _parse_executor_instance is None:
+            _parse_executor_instance = ThreadPoolExecutor(thread_name_prefix='htmlcompare-parse')
+        return _parse_executor_instance
+
+
+@lru_cache(maxsize=32)
+def get_comparer(options: Optional[CompareOptions], parallel: bool = False) -> Comparer:
+    """Return a shared ``Comparer`` for ``options`` (as used by ``compare_html()``)."""
+    return Comparer(options, parallel=parallel)
 
 
 def compare_html(
     expected_html: str,
     actual_html: str,
     options: Optional[CompareOptions] = None,
+    *,
+    max_differences: Optional[int] = None,
+    parallel: bool = False,
 ) -> ComparisonResult:
     """
     Compare two HTML strings for equality.
 
     This implementation uses a tree-based approach with normalization
     to handle insignificant whitespace between block elements.
+
+    With ``max_differences`` the comparison stops as soon as that many
+    differences were found so ``result.differences`` might be incomplete.
+    ``parallel=True`` parses both documents in parallel threads (see
+    ``Comparer``).
     """
-    expected_tree = parse_html(expected_html)
-    actual_tree = parse_html(actual_html)
+    comparer = get_comparer(options, parallel)
+    return comparer.compare(expected_html, actual_html, max_differences)
 
-    # normalize trees to remove insignificant whitespace
-    expected_normalized = normalize_tree(expected_tree, options)
-    actual_normalized = normalize_tree(actual_tree, options)
-    return _compare_trees(expected_normalized, actual_normalized)
 
+def compare_fragments(
+    expected_html: Union[str, bytes],
+    actual_html: Union[str, bytes],
+    options: Optional[CompareOptions] = None,
+    *,
+    container: str = 'body',
+    max_differences: Optional[int] = None,
+) -> ComparisonResult:
+    """
+    Compare two HTML fragments (e.g. a rendered widget or email block).
+
+    Unlike ``compare_html()`` the fragments are not wrapped in a complete
+    document: both are parsed as content of a ``container`` element (default:
+    ``<body>``) and paths in the result are relative to the fragment root.
+    """
+    return get_comparer(options).compare_fragments(
+        expected_html, actual_html, max_differences, container,
+    )
 
-def _compare_trees(expected: Document, actual: Document) -> ComparisonResult:
-    differences: list[Difference] = []
-    differences += _compare_doctype_declarations(expected.doctype, actual.doctype)
-    _compare_node_lists(expected.children, actual.children, "", differences, parent_tag=None)
-    _documents_are_equal = (len(differences) == 0)
-    return ComparisonResult(is_equal=_documents_are_equal, differences=differences)
+
+def iter_differences(
+    expected_html: Union[str, bytes],
+    actual_html: Union[str, bytes],
+    options: Optional[CompareOptions] = None,
+) -> Iterator[Difference]:
+    """
+    Yield the differences between two HTML strings.
+
+    Both documents are parsed immediately but the trees are only compared as
+    far as the caller consumes the iterator.
+    """
+    return get_comparer(options).iter_differences(expected_html, actual_html)
+
+
+def _html_size_bytes(html: Union[str, bytes]) -> int:
+    if isinstance(html, bytes):
+        return len(html)
+    # len() counts characters, the cache limit is in bytes (UTF-8)
+    return len(html) if html.isascii() else len(html.encode('utf-8', 'surrogatepass'))
+
+
+def is_identical_input(expected_html, actual_html) -> bool:
+    # Most comparisons (e.g. in test suites) find equal documents. Identical
+    # input is detected without parsing at all.
+    if isinstance(expected_html, (str, bytes)) and (expected_html == actual_html):
+        _fast_path_counters.add(identical_input=1)
+        return True
+    return False
+
+
+def _compare_trees(
+    expected: Document,
+    actual: Document,
+    max_differences: Optional[int] = None,
+    parent_tag: Optional[str] = None,
+) -> ComparisonResult:
+    differences = _iter_tree_differences(expected, actual, parent_tag)
+    return collect_differences(differences, max_differences)
+
+
+def collect_differences(
+    differences: Iterator[Difference],
+    max_differences: Optional[int] = None,
+) -> ComparisonResult:
+    if max_differences is not None:
+        check_max_differences(max_differences)
+        differences = islice(differences, max_differences)
+    return ComparisonResult.from_differences(differences)
 
 
-def _compare_doctype_declarations(
+def check_max_differences(max_differences: Optional[int]) -> None:
+    if (max_differences is not None) and (max_differences < 1):
+        raise ValueError(f'max_differences must be at least 1 (got {max_differences})')
+
+
+def _iter_tree_differences(
+    expected: Document,
+    actual: Document,
+    parent_tag: Optional[str] = None,
+) -> Iterator[Difference]:
+    """
+    Yield all differences between two normalized documents.
+
+    ``parent_tag`` is the container element of fragments (None for documents).
+
+    The trees are traversed with an explicit stack instead of recursion so the
+    nesting depth is only limited by the available memory.
+    """
+    yield from compare_doctype_declarations(expected.doctype, actual.doctype)
+    # work items: (expected node, actual node, path, parent_tag), one of the
+    # nodes is None for missing/extra nodes
+    stack: list[tuple] = []
+    _push_node_lists(stack, expected.children, actual.children, None, parent_tag=parent_tag)
+    while stack:
+        expected_node, actual_node, path, parent_tag = stack.pop()
+        if expected_node is None:
+            yield Difference(
+                type=DifferenceType.CHILD_EXTRA,
+                path=DifferencePath(path),
+                expected=None,
+                actual=node_summary(actual_node),
+                message=f"unexpected node: {node_summary(actual_node)}",
+            )
+        elif actual_node is None:
+            yield Difference(
+                type=DifferenceType.CHILD_MISSING,
+                path=DifferencePath(path),
+                expected=node_summary(expected_node),
+                actual=None,
+                message=f"missing node: {node_summary(expected_node)}",
+            )
+        else:
+            yield from _compare_nodes(
+                stack, expected_node, actual_node, path, parent_tag=parent_tag,
+            )
+
+
+def compare_doctype_declarations(
     expected: Optional[Doctype],
     actual: Optional[Doctype],
 ) -> Iterator[Difference]:
@@ -60,7 +450,7 @@ def _compare_doctype_declarations(
     elif expected is not None and actual is None:
         difference = Difference(
             type=DifferenceType.DOCTYPE_MISSING,
-            path='DOCTYPE',
+            path=DifferencePath(DOCTYPE_PATH),
             expected=_doctype_summary(expected),
             actual=None,
             message=f"missing DOCTYPE: {_doctype_summary(expected)}",
@@ -69,7 +459,7 @@ def _compare_doctype_declarations(
     elif expected is None and actual is not None:
         difference = Difference(
             type=DifferenceType.DOCTYPE_EXTRA,
-            path='DOCTYPE',
+            path=DifferencePath(DOCTYPE_PATH),
             expected=None,
             actual=_doctype_summary(actual),
             message=f"unexpected DOCTYPE: {_doctype_summary(actual)}",
@@ -78,7 +468,7 @@ def _compare_doctype_declarations(
     elif expected != actual:
         difference = Difference(
             type=DifferenceType.DOCTYPE_MISMATCH,
-            path='DOCTYPE',
+            path=DifferencePath(DOCTYPE_PATH),
             expected=_doctype_summary(expected),
             actual=_doctype_summary(actual),
             message="DOCTYPE mismatch",
@@ -98,165 +488,149 @@ def _doctype_summary(doctype: Doctype) -> str:
         return f'<!DOCTYPE {doctype.name}>'
 
 
-def _compare_node_lists(
+def _push_node_lists(
+    stack: list,
     expected: Sequence[Node],
     actual: Sequence[Node],
-    path: str,
-    differences: list[Difference],
+    path: Optional[tuple],
     *,
     parent_tag: Optional[str] = None,
 ) -> None:
-    max_len = max(len(expected), len(actual))
-
-    for i in range(max_len):
-        child_path = f"{path}[{i}]" if path else f"[{i}]"
-
+    expected_siblings = SiblingPositions(expected)
+    actual_siblings = SiblingPositions(actual) if (len(actual) > len(expected)) else None
+    # pushed in reverse so the children are compared in document order
+    for i in reversed(range(max(len(expected), len(actual)))):
         if i >= len(expected):
             # Extra node in actual
-            actual_node = actual[i]
-            differences.append(Difference(
-                type=DifferenceType.CHILD_EXTRA,
-                path=child_path,
-                expected=None,
-                actual=_node_summary(actual_node),
-                message=f"unexpected node: {_node_summary(actual_node)}",
-            ))
-            continue
-
-        if i >= len(actual):
+            stack.append((None, actual[i], (path, CHILD, i, actual_siblings), parent_tag))
+        elif i >= len(actual):
             # Missing node in actual
-            expected_node = expected[i]
-            differences.append(Difference(
-                type=DifferenceType.CHILD_MISSING,
-                path=child_path,
-                expected=_node_summary(expected_node),
-                actual=None,
-                message=f"missing node: {_node_summary(expected_node)}",
-            ))
-            continue
-
-        _compare_nodes(expected[i], actual[i], child_path, differences, parent_tag=parent_tag)
+            stack.append((expected[i], None, (path, CHILD, i, expected_siblings), parent_tag))
+        else:
+            stack.append((expected[i], actual[i], (path, CHILD, i, expected_siblings), parent_tag))
 
 
 def _compare_nodes(
+    stack: list,
     expected: Node,
     actual: Node,
-    path: str,
-    differences: list[Difference],
+    path: Optional[tuple],
     *,
     parent_tag: Optional[str] = None,
-) -> None:
+) -> Iterator[Difference]:
+    if (expected.digest is not None) and (expected.digest == actual.digest):
+        # identical subtrees (see htmlcompare.digest)
+        return
     if type(expected) is not type(actual):
-        differences.append(Difference(
+        yield Difference(
             type=DifferenceType.NODE_TYPE_MISMATCH,
-            path=path,
+            path=DifferencePath(path),
             expected=type(expected).__name__,
             actual=type(actual).__name__,
-        ))
+        )
         return
 
     if isinstance(expected, Element):
         assert isinstance(actual, Element)
-        _compare_elements(expected, actual, path, differences)
+        yield from _compare_elements(stack, expected, actual, path)
     elif isinstance(expected, TextNode):
         assert isinstance(actual, TextNode)
-        _compare_text_nodes(expected, actual, path, differences, parent_tag=parent_tag)
+        yield from compare_text_nodes(expected, actual, path, parent_tag=parent_tag)
     elif isinstance(expected, Comment):
         assert isinstance(actual, Comment)
-        _compare_comments(expected, actual, path, differences)
+        yield from _compare_comments(expected, actual, path)
     elif isinstance(expected, ConditionalComment):
         assert isinstance(actual, ConditionalComment)
-        _compare_conditional_comments(expected, actual, path, differences)
+        yield from _compare_conditional_comments(stack, expected, actual, path)
 
 
 def _compare_elements(
+    stack: list,
     expected: Element,
     actual: Element,
-    path: str,
-    differences: list[Difference],
-) -> None:
-    element_path = f"{path} > {expected.tag}" if path else expected.tag
+    path: Optional[tuple],
+) -> Iterator[Difference]:
+    element_path = (path, ELEMENT, expected.tag)
 
     # check tag names
     if expected.tag != actual.tag:
-        differences.append(Difference(
+        yield Difference(
             type=DifferenceType.TAG_MISMATCH,
-            path=element_path,
+            path=DifferencePath(element_path),
             expected=expected.tag,
             actual=actual.tag,
-        ))
+        )
         return  # don't compare children if tags differ
 
     is_self_closing_different = (expected.is_self_closing != actual.is_self_closing)
     if is_self_closing_different and is_self_closing_significant(expected.tag):
-        expected_form = _html_tag(expected.tag, expected.is_self_closing)
-        actual_form = _html_tag(actual.tag, actual.is_self_closing)
-        differences.append(Difference(
+        expected_form = html_tag(expected.tag, expected.is_self_closing)
+        actual_form = html_tag(actual.tag, actual.is_self_closing)
+        yield Difference(
             type=DifferenceType.SELF_CLOSING_MISMATCH,
-            path=element_path,
+            path=DifferencePath(element_path),
             expected=expected_form,
             actual=actual_form,
             message=f"self-closing syntax differs: expected {expected_form}, got {actual_form}",
-        ))
+        )
 
-    _compare_attributes(expected.attributes, actual.attributes, element_path, differences)
+    yield from compare_attributes(expected.attributes, actual.attributes, element_path)
     # compare children, passing tag name for context-aware comparison (e.g., CSS in <style> tags)
-    _compare_node_lists(
+    _push_node_lists(
+        stack,
         expected.children,
         actual.children,
         element_path,
-        differences,
         parent_tag=expected.tag,
     )
 
 
-def _html_tag(tag: str, is_self_closing) -> str:
+def html_tag(tag: str, is_self_closing) -> str:
     if is_self_closing:
         return f"<{tag} ... />"
     return f"<{tag} ...>"
 
 
-def _compare_attributes(
+def compare_attributes(
     expected: dict[str, str],
     actual: dict[str, str],
-    path: str,
-    differences: list[Difference],
-) -> None:
+    path: Optional[tuple],
+) -> Iterator[Difference]:
     expected_normalized = _normalize_attributes(expected)
     actual_normalized = _normalize_attributes(actual)
     all_keys = set(expected_normalized) | set(actual_normalized)
     for key in sorted(all_keys):
         if key not in expected_normalized:
-            differences.append(Difference(
+            yield Difference(
                 type=DifferenceType.ATTRIBUTE_EXTRA,
-                path=f"{path}@{key}",
+                path=DifferencePath((path, ATTRIBUTE, key)),
                 expected=None,
                 actual=actual_normalized[key],
                 message=f"unexpected attribute '{key}'",
-            ))
+            )
         elif key not in actual_normalized:
-            differences.append(Difference(
+            yield Difference(
                 type=DifferenceType.ATTRIBUTE_MISSING,
-                path=f"{path}@{key}",
+                path=DifferencePath((path, ATTRIBUTE, key)),
                 expected=expected_normalized[key],
                 actual=None,
                 message=f"missing attribute '{key}'",
-            ))
+            )
         elif key == 'class':
-            _compare_class_attribute(
-                expected_normalized[key], actual_normalized[key], path, differences
+            yield from _compare_class_attribute(
+                expected_normalized[key], actual_normalized[key], path
             )
         elif key == 'style':
-            _compare_style_attribute(
-                expected_normalized[key], actual_normalized[key], path, differences
+            yield from _compare_style_attribute(
+                expected_normalized[key], actual_normalized[key], path
             )
         elif expected_normalized[key] != actual_normalized[key]:
-            differences.append(Difference(
+            yield Difference(
                 type=DifferenceType.ATTRIBUTE_MISMATCH,
-                path=f"{path}@{key}",
+                path=DifferencePath((path, ATTRIBUTE, key)),
                 expected=expected_normalized[key],
                 actual=actual_normalized[key],
-            ))
+            )
 
 
 def _normalize_attributes(attrs: dict[str, str]) -> dict[str, str]:
@@ -276,9 +650,8 @@ def _normalize_attributes(attrs: dict[str, str]) -> dict[str, str]:
 def _compare_class_attribute(
     expected: str,
     actual: str,
-    path: str,
-    differences: list[Difference],
-) -> None:
+    path: Optional[tuple],
+) -> Iterator[Difference]:
     expected_classes = set(expected.split())
     actual_classes = set(actual.split())
 
@@ -286,107 +659,108 @@ def _compare_class_attribute(
     extra = actual_classes - expected_classes
 
     if missing:
-        differences.append(Difference(
+        yield Difference(
             type=DifferenceType.CLASS_MISSING,
-            path=f"{path}@class",
+            path=DifferencePath((path, ATTRIBUTE, 'class')),
             expected=sorted(missing),
             actual=None,
             message=f"missing classes: {sorted(missing)}",
-        ))
+        )
     if extra:
-        differences.append(Difference(
+        yield Difference(
             type=DifferenceType.CLASS_EXTRA,
-            path=f"{path}@class",
+            path=DifferencePath((path, ATTRIBUTE, 'class')),
             expected=None,
             actual=sorted(extra),
             message=f"unexpected classes: {sorted(extra)}",
-        ))
+        )
 
 
 def _compare_style_attribute(
     expected: str,
     actual: str,
-    path: str,
-    differences: list[Difference],
-) -> None:
+    path: Optional[tuple],
+) -> Iterator[Difference]:
     """Compare style attributes using CSS-aware comparison."""
-    if compare_css(expected, actual):
-        return  # styles are equivalent
-
-    differences.append(Difference(
+    try:
+        if compare_css(expected, actual):
+            return  # styles are equivalent
+    except InvalidCSSError:
+        # only identical invalid styles are equal (same as in digest.py)
+        pass
+
+    yield Difference(
         type=DifferenceType.STYLE_MISMATCH,
-        path=f"{path}@style",
+        path=DifferencePath((path, ATTRIBUTE, 'style')),
         expected=expected,
         actual=actual,
-    ))
+    )
 
 
-def _compare_text_nodes(
+def compare_text_nodes(
     expected: TextNode,
     actual: TextNode,
-    path: str,
-    differences: list[Difference],
+    path: Optional[tuple],
     *,
     parent_tag: Optional[str] = None,
-) -> None:
+) -> Iterator[Difference]:
     if parent_tag == 'style':
         if compare_stylesheet(expected.content, actual.content):
             return  # CSS is semantically equivalent
-        differences.append(Difference(
+        yield Difference(
             type=DifferenceType.TEXT_MISMATCH,
-            path=path,
+            path=DifferencePath(path),
             expected=expected.content,
             actual=actual.content,
-        ))
+        )
         return
 
     if expected.content != actual.content:
-        differences.append(Difference(
+        yield Difference(
             type=DifferenceType.TEXT_MISMATCH,
-            path=path,
+            path=DifferencePath(path),
             expected=expected.content,
             actual=actual.content,
-        ))
+        )
 
 
 def _compare_comments(
     expected: Comment,
     actual: Comment,
-    path: str,
-    differences: list[Difference],
-) -> None:
+    path: Optional[tuple],
+) -> Iterator[Difference]:
     if expected.content != actual.content:
-        differences.append(Difference(
+        yield Difference(
             type=DifferenceType.COMMENT_MISMATCH,
-            path=path,
+            path=DifferencePath(path),
             expected=expected.content,
             actual=actual.content,
-        ))
+        )
 
 
 def _compare_conditional_comments(
+    stack: list,
     expected: ConditionalComment,
     actual: ConditionalComment,
-    path: str,
-    differences: list[Difference],
-) -> None:
-    cc_path = f"{path} > <!--[if {expected.condition}]>" if path else f"<!--[if {expected.condition}]>"  # noqa: E501
+    path: Optional[tuple],
+) -> Iterator[Difference]:
+    cc_path = (path, CONDITIONAL, expected.condition)
 
     # Compare conditions
     if expected.condition != actual.condition:
-        differences.append(Difference(
+        yield Difference(
             type=DifferenceType.CONDITIONAL_COMMENT_CONDITION_MISMATCH,
-            path=cc_path,
+            path=DifferencePath(cc_path),
             expected=expected.condition,
             actual=actual.condition,
-        ))
+        )
         return  # don't compare children if conditions differ
 
     # Compare children
-    _compare_node_lists(expected.children, actual.children, cc_path, differences)
+    _push_node_lists(stack, expected.children, actual.children, cc_path)
 
 
-def _node_summary(node: Node) -> str:
+def node_summary(node: Node) -> str:
     if isinstance(node, Element):
         return f"<{node.tag}>"
     elif isinstance(node, TextNode):
@@ -1,25 +1,67 @@
 # SPDX-License-Identifier: MIT
 
-from operator import attrgetter
+from functools import lru_cache
+from operator import itemgetter
 
 import tinycss2
-from tinycss2.ast import AtRule, Declaration, NumberToken, QualifiedRule
 
 
-__all__ = ['compare_css', 'compare_stylesheet']
+__all__ = [
+    'InvalidCSSError',
+    'canonical_css',
+    'canonical_stylesheet',
+    'clear_css_cache',
+    'compare_css',
+    'compare_stylesheet',
+    'css_cache_info',
+]
+
+# The same inline styles are repeated a lot (especially in email templates) so
+# the normalized form of each CSS string is memoized.
+CSS_CACHE_SIZE = 4096
+STYLESHEET_CACHE_SIZE = 256
+
+
+class InvalidCSSError(ValueError):
+    """A declaration list (e.g. a style attribute) could not be parsed."""
+    pass
+
 
 def compare_css(expected_css, actual_css):
-    _e_css = normalize_css(expected_css)
-    _a_css = normalize_css(actual_css)
-    _e_css_str = tinycss2.serialize(_e_css)
-    _a_css_str = tinycss2.serialize(_a_css)
-    return _e_css_str == _a_css_str
+    if expected_css == actual_css:
+        return True
+    return canonical_css(expected_css) == canonical_css(actual_css)
 
 
 def compare_stylesheet(expected_css, actual_css):
-    _e_css_str = tinycss2.serialize(normalize_stylesheet(expected_css))
-    _a_css_str = tinycss2.serialize(normalize_stylesheet(actual_css))
-    return _e_css_str == _a_css_str
+    if expected_css == actual_css:
+        return True
+    return canonical_stylesheet(expected_css) == canonical_stylesheet(actual_css)
+
+
+@lru_cache(maxsize=CSS_CACHE_SIZE)
+def canonical_css(css_declaration_str):
+    """Return the (hashable) normalized form of CSS declarations, see normalize_css()."""
+    return normalize_css(css_declaration_str)
+
+
+@lru_cache(maxsize=STYLESHEET_CACHE_SIZE)
+def canonical_stylesheet(css_str):
+    """Return the (hashable) normalized form of a CSS stylesheet, see normalize_stylesheet()."""
+    return normalize_stylesheet(css_str)
+
+
+def css_cache_info():
+    """Return statistics of the memoized CSS normalization (``functools`` cache info)."""
+    return {
+        'css': canonical_css.cache_info(),
+        'stylesheet': canonical_stylesheet.cache_info(),
+    }
+
+
+def clear_css_cache():
+    canonical_css.cache_clear()
+    canonical_stylesheet.cache_clear()
 
 
 def is_dimension(token):
@@ -36,40 +78,58 @@ def _strip_whitespace(all_tokens):
         tokens.append(token)
     return tokens
 
-def _strip_zero_units(all_tokens):
-    tokens = []
+def _token_key(token):
+    """Return a hashable value which identifies a token (and its content)."""
+    token_type = token.type
+    if token_type in ('ident', 'hash', 'string', 'url', 'literal', 'whitespace', 'comment'):
+        return (token_type, token.value)
+    elif token_type in ('number', 'percentage'):
+        return (token_type, token.representation)
+    elif token_type == 'dimension':
+        return (token_type, token.representation, token.unit)
+    elif token_type == 'function':
+        return (token_type, token.name, _token_keys(token.arguments))
+    elif token_type in ('() block', '[] block', '{} block'):
+        return (token_type, _token_keys(token.content))
+    # rare tokens (e.g. unicode-range, at-keyword, errors)
+    return (token_type, token.serialize())
+
+def _token_keys(tokens):
+    return tuple(_token_key(token) for token in tokens)
+
+def _value_key(all_tokens):
+    # whitespace is not significant between top-level tokens and "0" units
+    # can be dropped (e.g. "0px" == "0")
+    keys = []
     for token in all_tokens:
+        if is_whitespace(token):
+            continue
         if is_dimension(token) and token.int_value == 0:
-            token = NumberToken(
-                token.source_line,
-                token.source_column,
-                token.value,
-                token.int_value,
-                token.representation,
-            )
-        tokens.append(token)
-    return tokens
+            keys.append(('number', token.representation))
+        else:
+            keys.append(_token_key(token))
+    return tuple(keys)
+
+def _declaration_key(decl):
+    return (decl.name, decl.important, _value_key(decl.value))
 
 def normalize_css(css_declaration_str):
+    """Normalize CSS declarations (e.g. a style attribute) for comparison.
+
+    The result is a tuple of (name, important, value) tuples sorted by name.
+    It can be compared, hashed and cached directly. Raises InvalidCSSError if
+    the string contains something else than declarations.
+    """
     _decls = []
     _css_decls = tinycss2.parse_declaration_list(
         css_declaration_str, skip_comments=True, skip_whitespace=True
     )
     for decl in _css_decls:
-        assert (decl.type == 'declaration'), decl
-        tokens = _strip_whitespace(decl.value)
-        tokens = _strip_zero_units(tokens)
-        _decl = Declaration(
-            line       = decl.source_line,
-            column     = decl.source_column,
-            name       = decl.name,
-            lower_name = decl.lower_name,
-            value      = tokens,
-            important  = decl.important
-        )
-        _decls.append(_decl)
+        if decl.type != 'declaration':
+            raise InvalidCSSError(f'invalid CSS declaration in {css_declaration_str!r}')
+        _decls.append(_declaration_key(decl))
 
-    sorted_decls = sorted(_decls, key=attrgetter('name'))
+    sorted_decls = sorted(_decls, key=itemgetter(0))
     return tuple(sorted_decls)
 
 
@@ -81,6 +141,8 @@ def normalize_stylesheet(css_str):
         body { margin: 0; }
         .foo { color: red; }
         @media screen { .foo { color: blue; } }
+
+    Like normalize_css() this returns nested tuples.
     """
     rules = tinycss2.parse_stylesheet(css_str, skip_comments=True, skip_whitespace=True)
     return _normalize_rule_list(rules)
@@ -99,14 +161,14 @@ def _normalize_rule_list(rules):
             normalized_rules.append(normalized_rule)
         elif rule.type == 'error':
             # keep errors for debugging
-            normalized_rules.append(rule)
+            normalized_rules.append(('error', rule.kind))
 
     return tuple(normalized_rules)
 
 
 def _normalize_qualified_rule(rule):
     """Normalize a qualified rule (selector { declarations })."""
-    prelude = _strip_whitespace(rule.prelude)
+    prelude = _token_keys(_strip_whitespace(rule.prelude))
 
     # parse and normalize the content (declarations)
     content_decls = tinycss2.parse_declaration_list(
@@ -115,32 +177,16 @@ def _normalize_qualified_rule(rule):
     normalized_decls = []
     for decl in content_decls:
         if decl.type == 'declaration':
-            tokens = _strip_whitespace(decl.value)
-            tokens = _strip_zero_units(tokens)
-            _decl = Declaration(
-                line       = decl.source_line,
-                column     = decl.source_column,
-                name       = decl.name,
-                lower_name = decl.lower_name,
-                value      = tokens,
-                important  = decl.important
-            )
-            normalized_decls.append(_decl)
+            normalized_decls.append(_declaration_key(decl))
 
     # sort declarations by name for order-independent comparison
-    sorted_decls = sorted(normalized_decls, key=attrgetter('name'))
-
-    return QualifiedRule(
-        rule.source_line,
-        rule.source_column,
-        prelude,
-        sorted_decls,
-    )
+    sorted_decls = sorted(normalized_decls, key=itemgetter(0))
+    return ('qualified-rule', prelude, tuple(sorted_decls))
 
 
 def _normalize_at_rule(rule):
     """Normalize an at-rule (@media, @keyframes, etc.)."""
-    prelude = _strip_whitespace(rule.prelude)
+    prelude = _token_keys(_strip_whitespace(rule.prelude))
 
     # normalize the content if it contains nested rules (like @media)
     if rule.content is not None:
@@ -149,15 +195,8 @@ def _normalize_at_rule(rule):
             skip_comments=True,
             skip_whitespace=True,
         )
-        normalized_content = list(_normalize_rule_list(content_rules))
+        normalized_content = _normalize_rule_list(content_rules)
     else:
         normalized_content = None
 
-    return AtRule(
-        rule.source_line,
-        rule.source_column,
-        rule.at_keyword,
-        rule.lower_at_keyword,
-        prelude,
-        normalized_content,
-    )
+    return ('at-rule', rule.at_keyword, prelude, normalized_content)
@@ -0,0 +1,124 @@
+# SPDX-License-Identifier: MIT
+"""
+Structural (Merkle) digests for normalized nodes.
+
+The digest of a node covers the node itself and all of its descendants. It
+is built from the same canonical forms the comparison uses (unordered CSS
+classes, normalized inline CSS/stylesheets, self-closing syntax only where it
+is significant, ...). Two nodes with the same digest do not have any
+differences so the comparison can skip these subtrees.
+"""
+
+from collections.abc import Iterable
+from hashlib import blake2b
+from typing import Optional
+
+from htmlcompare.compare_css import InvalidCSSError, canonical_css, canonical_stylesheet
+from htmlcompare.elements import is_self_closing_significant
+from htmlcompare.nodes import Doctype
+
+
+__all__ = [
+    'comment_digest',
+    'conditional_comment_digest',
+    'document_digest',
+    'element_digest',
+    'text_digest',
+]
+
+
+DIGEST_SIZE = 16
+
+
+def element_digest(
+    tag: str,
+    attributes: dict[str, str],
+    is_self_closing: bool,
+    child_digests: Iterable[bytes],
+) -> bytes:
+    """Digest of an element given the digests of its (normalized) children."""
+    h = blake2b(b'E', digest_size=DIGEST_SIZE)
+    _update(h, tag)
+    is_self_closing = is_self_closing and is_self_closing_significant(tag)
+    h.update(b'/' if is_self_closing else b'>')
+    canonical_attributes = _canonical_attributes(attributes)
+    h.update(len(canonical_attributes).to_bytes(4, 'little'))
+    for key, value in canonical_attributes:
+        _update(h, key)
+        _update(h, value)
+    for child_digest in child_digests:
+        h.update(child_digest)
+    return h.digest()
+
+
+def text_digest(content: str, parent_tag: Optional[str] = None) -> bytes:
+    if parent_tag == 'style':
+        # CSS in <style> tags is compared semantically
+        h = blake2b(b'S', digest_size=DIGEST_SIZE)
+        _update(h, repr(canonical_stylesheet(content)))
+    else:
+        h = blake2b(b'T', digest_size=DIGEST_SIZE)
+        _update(h, content)
+    return h.digest()
+
+
+def comment_digest(content: str) -> bytes:
+    h = blake2b(b'C', digest_size=DIGEST_SIZE)
+    _update(h, content)
+    return h.digest()
+
+
+def conditional_comment_digest(condition: str, child_digests: Iterable[bytes]) -> bytes:
+    h = blake2b(b'I', digest_size=DIGEST_SIZE)
+    _update(h, condition)
+    for child_digest in child_digests:
+        h.update(child_digest)
+    return h.digest()
+
+
+def document_digest(doctype: Optional[Doctype], child_digests: Iterable[bytes]) -> bytes:
+    """Digest of a document given the digests of its top-level nodes."""
+    h = blake2b(b'D', digest_size=DIGEST_SIZE)
+    if doctype is None:
+        h.update(b'\x00')
+    else:
+        h.update(b'\x01')
+        _update(h, doctype.name)
+        _update(h, doctype.public_id)
+        _update(h, doctype.system_id)
+    for child_digest in child_digests:
+        h.update(child_digest)
+    return h.digest()
+
+
+def _canonical_attributes(attributes: dict[str, str]) -> list[tuple[str, str]]:
+    canonical = []
+    for key, value in attributes.items():
+        if key == 'class':
+            if not value.strip():
+                # an empty class attribute is same as absent
+                continue
+            value = ' '.join(sorted(set(value.split())))
+        elif key == 'style':
+            if not value.strip():
+                continue
+            value = _canonical_style(value)
+        canonical.append((key, value))
+    canonical.sort()
+    return canonical
+
+
+def _canonical_style(value: str) -> str:
+    try:
+        return 'c' + repr(canonical_css(value))
+    except InvalidCSSError:
+        # invalid declaration list: keep the raw value so that only identical
+        # styles are considered equal
+        return 'r' + value
+
+
+def _update(h, value: str) -> None:
+    # length prefix so that adjacent values can not be confused
+    data = value.encode('utf-8', 'surrogatepass')
+    h.update(len(data).to_bytes(4, 'little'))
+    h.update(data)
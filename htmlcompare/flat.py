@@ -0,0 +1,599 @@
+# SPDX-License-Identifier: MIT
+"""
+Array-backed ("flat") document representation for very large documents.
+
+A ``Document`` uses one Python object per node (plus a dict and a list per
+element) which adds up to hundreds of MB for multi-megabyte HTML reports.
+A ``FlatDocument`` stores the same tree as parallel arrays (struct of
+arrays): node kind, interned tag/condition id, parent/first child/next
+sibling indices and offsets into a single text buffer. Nodes are stored in
+document order so a parent always has a smaller index than its children.
+
+Normalization (``normalize_flat()``) and comparison (``compare_flat()``)
+work on the arrays directly. Parsing (``parse_flat()``) still builds a
+``Document`` first, so this reduces the memory needed to keep documents
+(e.g. golden files) but not the peak memory while parsing. All algorithms
+are iterative so deeply nested documents can not exhaust the Python stack.
+"""
+
+from array import array
+from collections.abc import Iterator, Sequence
+from typing import Optional, Union
+
+from htmlcompare.compare import (
+    collect_differences,
+    compare_attributes,
+    compare_doctype_declarations,
+    compare_text_nodes,
+    html_tag,
+    node_summary,
+)
+from htmlcompare.digest import (
+    DIGEST_SIZE,
+    comment_digest,
+    conditional_comment_digest,
+    element_digest,
+    text_digest,
+)
+from htmlcompare.elements import is_block_element, is_self_closing_significant
+from htmlcompare.nodes import (
+    EMPTY_ATTRIBUTES,
+    EMPTY_CHILDREN,
+    Comment,
+    ConditionalComment,
+    Doctype,
+    Document,
+    Element,
+    Node,
+    TextNode,
+)
+from htmlcompare.normalize import is_inline_context, normalize_text
+from htmlcompare.options import CompareOptions
+from htmlcompare.parser import parse_html
+from htmlcompare.path import CHILD, CONDITIONAL, ELEMENT, DifferencePath, SiblingPositions
+from htmlcompare.result import ComparisonResult, Difference, DifferenceType
+
+
+__all__ = ['FlatDocument', 'compare_flat', 'iter_flat_differences', 'normalize_flat', 'parse_flat']
+
+
+# node kinds
+ELEMENT_NODE = 1
+TEXT_NODE = 2
+COMMENT_NODE = 3
+CONDITIONAL_NODE = 4
+
+NO_NODE = -1
+
+_SELF_CLOSING = 1
+_KIND_NAMES = {
+    ELEMENT_NODE: 'Element',
+    TEXT_NODE: 'TextNode',
+    COMMENT_NODE: 'Comment',
+    CONDITIONAL_NODE: 'ConditionalComment',
+}
+_DEFAULT_OPTIONS = CompareOptions()
+
+
+class FlatDocument:
+    """
+    Document stored as parallel arrays (see module docstring).
+
+    Nodes are identified by their index. ``children(NO_NODE)`` returns the
+    root nodes of the document. Instances should be created with
+    ``from_document()``, ``parse_flat()`` or ``normalize_flat()`` and are not
+    modified afterwards.
+    """
+
+    def __init__(self, doctype: Optional[Doctype] = None):
+        self.doctype = doctype
+        self.kinds = array('b')
+        # tag (elements) or condition (conditional comments), index into ``names``
+        self.name_ids = array('i')
+        self.flags = array('b')
+        self.parents = array('i')
+        self.first_children = array('i')
+        self.next_siblings = array('i')
+        # content of text nodes/comments, offsets into ``text``
+        self.text_starts = array('i')
+        self.text_ends = array('i')
+        # attributes of node i: attribute_offsets[i] to attribute_offsets[i+1]
+        self.attribute_offsets = array('i', [0])
+        self.attribute_names = array('i')
+        self.value_starts = array('i')
+        self.value_ends = array('i')
+        self.names: list[str] = []
+        self.text = ''
+        # DIGEST_SIZE bytes per node (only for normalized documents)
+        self.digests: Optional[bytes] = None
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __eq__(self, other):
+        if not isinstance(other, FlatDocument):
+            return NotImplemented
+        return self.to_document() == other.to_document()
+
+    def __repr__(self) -> str:
+        return f'<FlatDocument with {len(self)} nodes>'
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the arrays and the text buffer."""
+        arrays = (
+            self.kinds, self.name_ids, self.flags, self.parents, self.first_children,
+            self.next_siblings, self.text_starts, self.text_ends, self.attribute_offsets,
+            self.attribute_names, self.value_starts, self.value_ends,
+        )
+        size = sum(len(values) * values.itemsize for values in arrays)
+        size += len(self.text) + sum(len(name) for name in self.names)
+        if self.digests is not None:
+            size += len(self.digests)
+        return size
+
+    def children(self, index: int) -> Iterator[int]:
+        """Yield the indices of all children of node ``index``."""
+        if index == NO_NODE:
+            child = 0 if len(self) else NO_NODE
+        else:
+            child = self.first_children[index]
+        next_siblings = self.next_siblings
+        while child != NO_NODE:
+            yield child
+            child = next_siblings[child]
+
+    def tag(self, index: int) -> str:
+        """Tag name of an element (condition of a conditional comment)."""
+        return self.names[self.name_ids[index]]
+
+    def content(self, index: int) -> str:
+        """Content of a text node/comment."""
+        return self.text[self.text_starts[index]:self.text_ends[index]]
+
+    def attributes(self, index: int) -> dict[str, str]:
+        start = self.attribute_offsets[index]
+        end = self.attribute_offsets[index + 1]
+        if start == end:
+            return EMPTY_ATTRIBUTES
+        text = self.text
+        return {
+            self.names[self.attribute_names[i]]: text[self.value_starts[i]:self.value_ends[i]]
+            for i in range(start, end)
+        }
+
+    def is_self_closing(self, index: int) -> bool:
+        return bool(self.flags[index] & _SELF_CLOSING)
+
+    def digest(self, index: int) -> Optional[bytes]:
+        if self.digests is None:
+            return None
+        offset = index * DIGEST_SIZE
+        return self.digests[offset:offset + DIGEST_SIZE]
+
+    def node(self, index: int) -> Node:
+        """Node ``index`` without its children (e.g. to describe a difference)."""
+        kind = self.kinds[index]
+        if kind == ELEMENT_NODE:
+            return Element(
+                tag=self.tag(index),
+                attributes=self.attributes(index),
+                children=EMPTY_CHILDREN,
+                is_self_closing=self.is_self_closing(index),
+            )
+        elif kind == TEXT_NODE:
+            return TextNode(self.content(index))
+        elif kind == COMMENT_NODE:
+            return Comment(self.content(index))
+        return ConditionalComment(condition=self.tag(index), children=[])
+
+    @classmethod
+    def from_document(cls, doc: Document) -> 'FlatDocument':
+        """Convert a ``Document`` (digests are kept if all nodes have one)."""
+        builder = _FlatBuilder(doc.doctype)
+        digests = []
+        stack = [(node, NO_NODE) for node in reversed(doc.children)]
+        while stack:
+            node, parent = stack.pop()
+            if isinstance(node, Element):
+                index = builder.add_element(
+                    parent, node.tag, node.attributes, node.is_self_closing,
+                )
+                stack.extend((child, index) for child in reversed(node.children))
+            elif isinstance(node, TextNode):
+                builder.add_text(parent, TEXT_NODE, node.content)
+            elif isinstance(node, Comment):
+                builder.add_text(parent, COMMENT_NODE, node.content)
+            elif isinstance(node, ConditionalComment):
+                index = builder.add_conditional_comment(parent, node.condition)
+                stack.extend((child, index) for child in reversed(node.children))
+            digests.append(node.digest)
+        flat = builder.build()
+        if (None not in digests) and digests:
+            flat.digests = b''.join(digests)
+        return flat
+
+    def to_document(self) -> Document:
+        """Convert to a ``Document`` (e.g. for APIs which expect a tree)."""
+        nodes: list[Node] = []
+        roots: list[Node] = []
+        kinds = self.kinds
+        parents = self.parents
+        for index in range(len(self)):
+            node = self.node(index)
+            if self.digests is not None:
+                node = _with_digest(node, self.digest(index))
+            nodes.append(node)
+            parent_index = parents[index]
+            if parent_index == NO_NODE:
+                roots.append(node)
+                continue
+            parent = nodes[parent_index]
+            if (kinds[parent_index] == ELEMENT_NODE) and (parent.children is EMPTY_CHILDREN):
+                parent.children = []
+            parent.children.append(node)
+        return Document(children=roots, doctype=self.doctype)
+
+
+def _with_digest(node: Node, digest: bytes) -> Node:
+    if isinstance(node, ConditionalComment):
+        # frozen dataclass
+        return ConditionalComment(condition=node.condition, children=node.children, digest=digest)
+    node.digest = digest
+    return node
+
+
+class _FlatBuilder:
+    """Appends nodes (in document order) to a new ``FlatDocument``."""
+
+    def __init__(self, doctype: Optional[Doctype]):
+        self.doc = FlatDocument(doctype)
+        self._text_parts: list[str] = []
+        self._text_length = 0
+        self._name_ids: dict[str, int] = {}
+        # last child of each node (and of the document) to link siblings
+        self._last_children = array('i')
+        self._last_root = NO_NODE
+
+    def add_element(
+        self,
+        parent: int,
+        tag: str,
+        attributes: dict[str, str],
+        is_self_closing: bool,
+    ) -> int:
+        doc = self.doc
+        for key, value in attributes.items():
+            doc.attribute_names.append(self._name_id(key))
+            start, end = self._add_text(value)
+            doc.value_starts.append(start)
+            doc.value_ends.append(end)
+        flags = _SELF_CLOSING if is_self_closing else 0
+        return self._add_node(parent, ELEMENT_NODE, self._name_id(tag), flags, 0, 0)
+
+    def add_text(self, parent: int, kind: int, content: str) -> int:
+        start, end = self._add_text(content)
+        return self._add_node(parent, kind, NO_NODE, 0, start, end)
+
+    def add_conditional_comment(self, parent: int, condition: str) -> int:
+        return self._add_node(parent, CONDITIONAL_NODE, self._name_id(condition), 0, 0, 0)
+
+    def build(self) -> FlatDocument:
+        doc = self.doc
+        doc.text = ''.join(self._text_parts)
+        self._text_parts = []
+        self._last_children = array('i')
+        return doc
+
+    def _add_node(
+        self,
+        parent: int,
+        kind: int,
+        name_id: int,
+        flags: int,
+        text_start: int,
+        text_end: int,
+    ) -> int:
+        doc = self.doc
+        index = len(doc.kinds)
+        doc.kinds.append(kind)
+        doc.name_ids.append(name_id)
+        doc.flags.append(flags)
+        doc.parents.append(parent)
+        doc.first_children.append(NO_NODE)
+        doc.next_siblings.append(NO_NODE)
+        doc.text_starts.append(text_start)
+        doc.text_ends.append(text_end)
+        doc.attribute_offsets.append(len(doc.attribute_names))
+        self._last_children.append(NO_NODE)
+
+        previous = self._last_root if (parent == NO_NODE) else self._last_children[parent]
+        if previous != NO_NODE:
+            doc.next_siblings[previous] = index
+        elif parent != NO_NODE:
+            doc.first_children[parent] = index
+        if parent == NO_NODE:
+            self._last_root = index
+        else:
+            self._last_children[parent] = index
+        return index
+
+    def _add_text(self, text: str) -> tuple[int, int]:
+        start = self._text_length
+        self._text_parts.append(text)
+        self._text_length += len(text)
+        return start, self._text_length
+
+    def _name_id(self, name: str) -> int:
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self.doc.names)
+            self.doc.names.append(name)
+        return name_id
+
+
+def parse_flat(html_string: Union[str, bytes], parser: Optional[str] = None) -> FlatDocument:
+    """
+    Parse an HTML string into a ``FlatDocument`` (see ``parse_html()``).
+
+    The HTML is parsed into a ``Document`` first which is then converted. So
+    only the memory needed to keep the parsed document shrinks, peak memory
+    while parsing is the same as with ``parse_html()`` (plus the arrays).
+    """
+    return FlatDocument.from_document(parse_html(html_string, parser=parser))
+
+
+def normalize_flat(doc: FlatDocument, options: Optional[CompareOptions] = None) -> FlatDocument:
+    """
+    Return a normalized copy of ``doc``.
+
+    This applies the same rules as ``normalize_tree()`` (including the
+    structural digests) to a ``FlatDocument``.
+    """
+    if options is None:
+        options = _DEFAULT_OPTIONS
+    builder = _FlatBuilder(doc.doctype)
+    # (node, parent in the new document, in_block_context, parent_tag)
+    stack = [(index, NO_NODE, True, None) for index in reversed(list(doc.children(NO_NODE)))]
+    while stack:
+        index, parent, in_block_context, parent_tag = stack.pop()
+        kind = doc.kinds[index]
+        if kind == TEXT_NODE:
+            normalized = normalize_text(doc.content(index), in_block_context)
+            if normalized is not None:
+                builder.add_text(parent, TEXT_NODE, normalized)
+        elif kind == ELEMENT_NODE:
+            tag = doc.tag(index)
+            new_index = builder.add_element(
+                parent, tag, doc.attributes(index), doc.is_self_closing(index),
+            )
+            children = list(doc.children(index))
+            # same rule as in normalize_tree(), the (childless) nodes are only
+            # created as far as needed
+            children_in_block_context = (
+                is_block_element(tag)
+                and not is_inline_context(doc.node(child) for child in children)
+            )
+            stack.extend(
+                (child, new_index, children_in_block_context, tag)
+                for child in reversed(children)
+            )
+        elif kind == COMMENT_NODE:
+            if not options.ignore_comments:
+                builder.add_text(parent, COMMENT_NODE, doc.content(index))
+        elif kind == CONDITIONAL_NODE:
+            if not options.ignore_conditional_comments:
+                new_index = builder.add_conditional_comment(parent, doc.tag(index))
+                stack.extend(
+                    (child, new_index, True, None)
+                    for child in reversed(list(doc.children(index)))
+                )
+    normalized_doc = builder.build()
+    normalized_doc.digests = _build_digests(normalized_doc)
+    return normalized_doc
+
+
+def _build_digests(doc: FlatDocument) -> bytes:
+    # children are stored after their parent so iterating backwards visits
+    # all children before their parent
+    digests: list[bytes] = [b''] * len(doc)
+    for index in reversed(range(len(doc))):
+        kind = doc.kinds[index]
+        if kind == ELEMENT_NODE:
+            digests[index] = element_digest(
+                doc.tag(index),
+                doc.attributes(index),
+                doc.is_self_closing(index),
+                [digests[child] for child in doc.children(index)],
+            )
+        elif kind == TEXT_NODE:
+            digests[index] = text_digest(doc.content(index), _parent_tag(doc, index))
+        elif kind == COMMENT_NODE:
+            digests[index] = comment_digest(doc.content(index))
+        else:
+            digests[index] = conditional_comment_digest(
+                doc.tag(index),
+                [digests[child] for child in doc.children(index)],
+            )
+    return b''.join(digests)
+
+
+def _parent_tag(doc: FlatDocument, index: int) -> Optional[str]:
+    parent = doc.parents[index]
+    if (parent == NO_NODE) or (doc.kinds[parent] != ELEMENT_NODE):
+        return None
+    return doc.tag(parent)
+
+
+class _FlatSiblings(Sequence):
+    """Child list of a flat node (see ``SiblingPositions``)."""
+
+    def __init__(self, doc: FlatDocument, indices: list[int]):
+        self._doc = doc
+        self._indices = indices
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+    def __getitem__(self, index: int) -> Node:
+        return self._doc.node(self._indices[index])
+
+
+def compare_flat(
+    expected: FlatDocument,
+    actual: FlatDocument,
+    max_differences: Optional[int] = None,
+) -> ComparisonResult:
+    """
+    Compare two normalized flat documents (see ``normalize_flat()``).
+
+    The result is the same as ``compare_html()`` would return for the
+    equivalent ``Document`` trees.
+    """
+    differences = iter_flat_differences(expected, actual)
+    return collect_differences(differences, max_differences)
+
+
+def iter_flat_differences(expected: FlatDocument, actual: FlatDocument) -> Iterator[Difference]:
+    """Yield the differences between two normalized flat documents."""
+    yield from compare_doctype_declarations(expected.doctype, actual.doctype)
+    # work items: (expected node, actual node, path, parent_tag), one of the
+    # nodes is NO_NODE for missing/extra nodes
+    stack: list[tuple] = []
+    _push_children(stack, expected, actual, NO_NODE, NO_NODE, None, None)
+    while stack:
+        expected_index, actual_index, path, parent_tag = stack.pop()
+        if expected_index == NO_NODE:
+            actual_node = actual.node(actual_index)
+            yield Difference(
+                type=DifferenceType.CHILD_EXTRA,
+                path=DifferencePath(path),
+                expected=None,
+                actual=node_summary(actual_node),
+                message=f"unexpected node: {node_summary(actual_node)}",
+            )
+            continue
+        if actual_index == NO_NODE:
+            expected_node = expected.node(expected_index)
+            yield Difference(
+                type=DifferenceType.CHILD_MISSING,
+                path=DifferencePath(path),
+                expected=node_summary(expected_node),
+                actual=None,
+                message=f"missing node: {node_summary(expected_node)}",
+            )
+            continue
+
+        expected_digest = expected.digest(expected_index)
+        if (expected_digest is not None) and (expected_digest == actual.digest(actual_index)):
+            # identical subtrees (see htmlcompare.digest)
+            continue
+        kind = expected.kinds[expected_index]
+        if kind != actual.kinds[actual_index]:
+            yield Difference(
+                type=DifferenceType.NODE_TYPE_MISMATCH,
+                path=DifferencePath(path),
+                expected=_KIND_NAMES[kind],
+                actual=_KIND_NAMES[actual.kinds[actual_index]],
+            )
+        elif kind == ELEMENT_NODE:
+            yield from _compare_flat_elements(
+                stack, expected, actual, expected_index, actual_index, path,
+            )
+        elif kind == TEXT_NODE:
+            yield from compare_text_nodes(
+                TextNode(expected.content(expected_index)),
+                TextNode(actual.content(actual_index)),
+                path,
+                parent_tag=parent_tag,
+            )
+        elif kind == COMMENT_NODE:
+            expected_content = expected.content(expected_index)
+            actual_content = actual.content(actual_index)
+            if expected_content != actual_content:
+                yield Difference(
+                    type=DifferenceType.COMMENT_MISMATCH,
+                    path=DifferencePath(path),
+                    expected=expected_content,
+                    actual=actual_content,
+                )
+        else:
+            expected_condition = expected.tag(expected_index)
+            actual_condition = actual.tag(actual_index)
+            cc_path = (path, CONDITIONAL, expected_condition)
+            if expected_condition != actual_condition:
+                yield Difference(
+                    type=DifferenceType.CONDITIONAL_COMMENT_CONDITION_MISMATCH,
+                    path=DifferencePath(cc_path),
+                    expected=expected_condition,
+                    actual=actual_condition,
+                )
+                continue
+            _push_children(stack, expected, actual, expected_index, actual_index, cc_path, None)
+
+
+def _compare_flat_elements(
+    stack: list,
+    expected: FlatDocument,
+    actual: FlatDocument,
+    expected_index: int,
+    actual_index: int,
+    path: Optional[tuple],
+) -> Iterator[Difference]:
+    tag = expected.tag(expected_index)
+    actual_tag = actual.tag(actual_index)
+    element_path = (path, ELEMENT, tag)
+    if tag != actual_tag:
+        yield Difference(
+            type=DifferenceType.TAG_MISMATCH,
+            path=DifferencePath(element_path),
+            expected=tag,
+            actual=actual_tag,
+        )
+        return
+
+    expected_self_closing = expected.is_self_closing(expected_index)
+    actual_self_closing = actual.is_self_closing(actual_index)
+    if (expected_self_closing != actual_self_closing) and is_self_closing_significant(tag):
+        expected_form = html_tag(tag, expected_self_closing)
+        actual_form = html_tag(actual_tag, actual_self_closing)
+        yield Difference(
+            type=DifferenceType.SELF_CLOSING_MISMATCH,
+            path=DifferencePath(element_path),
+            expected=expected_form,
+            actual=actual_form,
+            message=f"self-closing syntax differs: expected {expected_form}, got {actual_form}",
+        )
+
+    yield from compare_attributes(
+        expected.attributes(expected_index),
+        actual.attributes(actual_index),
+        element_path,
+    )
+    _push_children(stack, expected, actual, expected_index, actual_index, element_path, tag)
+
+
+def _push_children(
+    stack: list,
+    expected: FlatDocument,
+    actual: FlatDocument,
+    expected_parent: int,
+    actual_parent: int,
+    path: Optional[tuple],
+    parent_tag: Optional[str],
+) -> None:
+    expected_children = list(expected.children(expected_parent))
+    actual_children = list(actual.children(actual_parent))
+    expected_siblings = SiblingPositions(_FlatSiblings(expected, expected_children))
+    actual_siblings = SiblingPositions(_FlatSiblings(actual, actual_children))
+    # pushed in reverse so the children are compared in document order
+    for i in reversed(range(max(len(expected_children), len(actual_children)))):
+        if i >= len(expected_children):
+            child_path = (path, CHILD, i, actual_siblings)
+            stack.append((NO_NODE, actual_children[i], child_path, parent_tag))
+        elif i >= len(actual_children):
+            child_path = (path, CHILD, i, expected_siblings)
+            stack.append((expected_children[i], NO_NODE, child_path, parent_tag))
+        else:
+            child_path = (path, CHILD, i, expected_siblings)
+            stack.append((expected_children[i], actual_children[i], child_path, parent_tag))
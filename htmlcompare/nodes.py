@@ -1,5 +1,6 @@
 # SPDX-License-Identifier: MIT
 
+import sys
 from collections.abc import Sequence
 from dataclasses import dataclass, field
 from typing import Optional, Union
@@ -7,11 +8,39 @@ from typing import Optional, Union
 
 __all__ = ['Node', 'Element', 'TextNode', 'Comment', 'ConditionalComment', 'Document', 'Doctype']
 
+# Parsed documents are often kept in memory (e.g. in a DocumentCache) so the
+# node classes use __slots__ (requires Python 3.10+).
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
 
-@dataclass
+
+class _ImmutableList(list):
+    def _immutable(self, *args, **kwargs):
+        raise TypeError(f'{type(self).__name__} can not be modified')
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _immutable
+    append = extend = insert = pop = remove = clear = sort = reverse = _immutable
+
+
+class _ImmutableDict(dict):
+    def _immutable(self, *args, **kwargs):
+        raise TypeError(f'{type(self).__name__} can not be modified')
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+
+# Shared instances for elements without attributes/children. They compare
+# equal to [] and {} but can not be modified.
+EMPTY_CHILDREN = _ImmutableList()
+EMPTY_ATTRIBUTES = _ImmutableDict()
+
+
+@dataclass(**_SLOTS)
 class TextNode:
     """Represents text content in HTML."""
     content: str
+    digest: Optional[bytes] = field(default=None, repr=False, compare=False)
+    """Structural digest (set during normalization, see ``htmlcompare.digest``)."""
 
     def __eq__(self, other):
         if not isinstance(other, TextNode):
@@ -19,10 +48,12 @@ class TextNode:
         return self.content == other.content
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class Comment:
     """Represents an HTML comment."""
     content: str
+    digest: Optional[bytes] = field(default=None, repr=False, compare=False)
+    """Structural digest (set during normalization, see ``htmlcompare.digest``)."""
 
     def __eq__(self, other):
         if not isinstance(other, Comment):
@@ -52,7 +83,7 @@ class Doctype:
         )
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, **_SLOTS)
 class ConditionalComment:
     """
     Represents an IE conditional comment.
@@ -61,30 +92,29 @@ class ConditionalComment:
     """
     condition: str  # e.g., "IE", "lt IE 9", "gte IE 8"
     children: list['Node'] = field(default_factory=list)
+    digest: Optional[bytes] = field(default=None, repr=False, compare=False)
+    """Structural digest (set during normalization, see ``htmlcompare.digest``)."""
 
     def __eq__(self, other):
         if not isinstance(other, ConditionalComment):
             return NotImplemented
-        return self.condition == other.condition and self.children == other.children
+        return _trees_equal(self, other)
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class Element:
     """Represents an HTML element with tag, attributes, and children."""
     tag: str
     attributes: dict[str, str] = field(default_factory=dict)
     children: Sequence['Node'] = field(default_factory=list)
     is_self_closing: bool = False
+    digest: Optional[bytes] = field(default=None, repr=False, compare=False)
+    """Structural digest (set during normalization, see ``htmlcompare.digest``)."""
 
     def __eq__(self, other):
         if not isinstance(other, Element):
             return NotImplemented
-        return (
-            self.tag == other.tag
-            and self.attributes == other.attributes
-            and self.children == other.children
-            and self.is_self_closing == other.is_self_closing
-        )
+        return _trees_equal(self, other)
 
 
 @dataclass
@@ -96,8 +126,75 @@ class Document:
     def __eq__(self, other):
         if not isinstance(other, Document):
             return NotImplemented
-        return self.children == other.children and self.doctype == other.doctype
+        return (self.doctype == other.doctype) and _node_lists_equal(self.children, other.children)
 
 
 # Type alias for any node type
 Node = Union[Element, TextNode, Comment, ConditionalComment]
+
+
+def _trees_equal(node, other) -> bool:
+    return _node_lists_equal((node,), (other,))
+
+
+def _node_lists_equal(nodes: Sequence, others: Sequence) -> bool:
+    # Comparing the children lists directly would recurse for every level of
+    # nesting (and fail with a RecursionError for deeply nested trees).
+    pending = [(nodes, others)]
+    while pending:
+        nodes, others = pending.pop()
+        if len(nodes) != len(others):
+            return False
+        for node, other in zip(nodes, others):
+            if isinstance(node, Element):
+                if not (
+                    isinstance(other, Element)
+                    and node.tag == other.tag
+                    and node.attributes == other.attributes
+                    and node.is_self_closing == other.is_self_closing
+                ):
+                    return False
+            elif isinstance(node, ConditionalComment):
+                if not isinstance(other, ConditionalComment):
+                    return False
+                if node.condition != other.condition:
+                    return False
+            elif node != other:
+                return False
+            else:
+                continue
+            pending.append((node.children, other.children))
+    return True
+
+
+def copy_nodes(nodes: Sequence['Node']) -> list['Node']:
+    """
+    Return a deep copy of ``nodes`` (digests are kept).
+
+    Used for memoized parse results which must not be shared because trees
+    can be normalized in place.
+    """
+    copies = []
+    pending = [(nodes, copies)]
+    while pending:
+        nodes, target = pending.pop()
+        for node in nodes:
+            if isinstance(node, Element):
+                copy = Element(
+                    tag=node.tag,
+                    attributes=dict(node.attributes) if node.attributes else EMPTY_ATTRIBUTES,
+                    children=[] if node.children else EMPTY_CHILDREN,
+                    is_self_closing=node.is_self_closing,
+                    digest=node.digest,
+                )
+            elif isinstance(node, ConditionalComment):
+                copy = ConditionalComment(node.condition, children=[], digest=node.digest)
+            else:
+                # text nodes and comments only contain immutable values
+                copy = type(node)(node.content, digest=node.digest)
+                target.append(copy)
+                continue
+            target.append(copy)
+            if node.children:
+                pending.append((node.children, copy.children))
+    return copies
@@ -1,10 +1,25 @@
 # SPDX-License-Identifier: MIT
 
 import re
+from collections.abc import Iterable
 from typing import Optional
 
+from htmlcompare.digest import (
+    comment_digest,
+    conditional_comment_digest,
+    element_digest,
+    text_digest,
+)
 from htmlcompare.elements import is_block_element
-from htmlcompare.nodes import Comment, ConditionalComment, Document, Element, Node, TextNode
+from htmlcompare.nodes import (
+    EMPTY_CHILDREN,
+    Comment,
+    ConditionalComment,
+    Document,
+    Element,
+    Node,
+    TextNode,
+)
 from htmlcompare.options import CompareOptions
 
 
@@ -14,86 +29,155 @@ _WHITESPACE_RE = re.compile(r'\s+')
 _DEFAULT_OPTIONS = CompareOptions()
 
 
-def normalize_tree(doc: Document, options: Optional[CompareOptions] = None) -> Document:
+def normalize_tree(
+    doc: Document,
+    options: Optional[CompareOptions] = None,
+    *,
+    in_place: bool = False,
+    container: Optional[str] = None,
+) -> Document:
     """
     Normalize a document tree for comparison.
 
     This removes insignificant whitespace between block elements while
-    preserving significant whitespace in inline contexts.
+    preserving significant whitespace in inline contexts. Every node in the
+    normalized tree has a structural digest (see ``htmlcompare.digest``).
+
+    By default a normalized copy is returned. With ``in_place=True`` the nodes
+    of ``doc`` are reused (and modified) which avoids building a second tree.
+    This must only be used for trees which are not shared (e.g. a document
+    which was just parsed).
+
+    For fragments (see ``parse_fragment()``) ``container`` is the tag of the
+    element which contains the top-level nodes.
     """
     if options is None:
         options = _DEFAULT_OPTIONS
-    normalized_children = _normalize_children(doc.children, in_block_context=True, options=options)
+    if container is None:
+        in_block_context = True
+    else:
+        in_block_context = is_block_element(container) and not is_inline_context(doc.children)
+    normalized_children = _normalize_children(
+        doc.children,
+        in_block_context=in_block_context,
+        options=options,
+        parent_tag=container,
+        in_place=in_place,
+    )
+    if in_place:
+        doc.children = normalized_children
+        return doc
     return Document(children=normalized_children, doctype=doc.doctype)
 
 
-def _has_inline_elements(children: list[Node], options: CompareOptions) -> bool:
+def is_inline_context(children: Iterable[Node]) -> bool:
     """
-    Check if children list contains inline elements.
+    Check if whitespace between the children is significant.
 
-    This determines whether whitespace between text nodes and inline elements
-    is significant. If there are inline elements, spaces around them matter.
-
-    Note: This checks what will remain AFTER normalization (comments removed).
+    Whitespace is significant only when there are inline elements AND
+    non-whitespace text (text adjacent to inline elements). Comments do not
+    count as they are either removed or do not affect the rendering.
     """
+    has_inline_elements = False
+    has_significant_text = False
     for child in children:
-        # skip comments that will be removed
-        if isinstance(child, Comment) and options.ignore_comments:
-            continue
-        if isinstance(child, ConditionalComment) and options.ignore_conditional_comments:
-            continue
         if isinstance(child, Element):
-            if not is_block_element(child.tag):
-                return True
+            if has_inline_elements or is_block_element(child.tag):
+                continue
+            has_inline_elements = True
+        elif isinstance(child, TextNode):
+            if has_significant_text or not child.content.strip():
+                continue
+            has_significant_text = True
+        else:
+            continue
+        if has_inline_elements and has_significant_text:
+            return True
     return False
 
 
-def _has_significant_text(children: list[Node], options: CompareOptions) -> bool:
-    """
-    Check if children list contains non-whitespace text content.
-
-    This helps determine if whitespace is significant: if there's text
-    mixed with inline elements, whitespace between them matters.
-    """
-    for child in children:
-        if isinstance(child, TextNode):
-            if child.content.strip():
-                return True
-    return False
+# actions of the work items in _normalize_children()
+_VISIT = 0
+_BUILD = 1
 
 
 def _normalize_children(
     children: list[Node],
     in_block_context: bool,
     options: CompareOptions,
+    parent_tag: Optional[str] = None,
+    in_place: bool = False,
 ) -> list[Node]:
+    """
+    Normalize a list of nodes (including all descendants).
+
+    The tree is traversed with an explicit stack instead of recursion so the
+    nesting depth is only limited by the available memory. Elements and
+    conditional comments are visited twice: first to schedule their children
+    and then (once all children are normalized) to build the normalized node.
+    Each child list is scanned once to determine the block/inline context
+    before its children are normalized.
+    """
     result: list[Node] = []
-    for child in children:
-        normalized = _normalize_node(child, in_block_context, options)
-        if normalized is not None:
-            result.append(normalized)
+    # work items: (action, node, in_block_context/normalized children, parent_tag, target list)
+    stack: list[tuple] = [
+        (_VISIT, child, in_block_context, parent_tag, result) for child in reversed(children)
+    ]
+    while stack:
+        action, node, context, parent_tag, target = stack.pop()
+        if action == _BUILD:
+            if isinstance(node, Element):
+                target.append(_normalized_element(node, context, in_place))
+            else:
+                target.append(_normalized_conditional_comment(node, context))
+        elif isinstance(node, TextNode):
+            normalized = _normalize_text_node(node, context, parent_tag, in_place)
+            if normalized is not None:
+                target.append(normalized)
+        elif isinstance(node, Element):
+            normalized_children: list[Node] = []
+            stack.append((_BUILD, node, normalized_children, None, target))
+            # Whitespace is significant (inline context) if the element is
+            # inline or if text is adjacent to inline elements. A block element
+            # with only inline elements (no text) or only text (no inline
+            # elements) can have leading/trailing whitespace stripped.
+            children_in_block_context = (
+                is_block_element(node.tag) and not is_inline_context(node.children)
+            )
+            stack.extend(
+                (_VISIT, child, children_in_block_context, node.tag, normalized_children)
+                for child in reversed(node.children)
+            )
+        elif isinstance(node, Comment):
+            if options.ignore_comments:
+                continue
+            digest = comment_digest(node.content)
+            if in_place:
+                node.digest = digest
+                target.append(node)
+            else:
+                target.append(Comment(content=node.content, digest=digest))
+        elif isinstance(node, ConditionalComment):
+            # Conditional comments are compared by default, unlike regular comments.
+            # They are only removed when ignore_conditional_comments is True.
+            if not options.ignore_conditional_comments:
+                normalized_children = []
+                stack.append((_BUILD, node, normalized_children, None, target))
+                stack.extend(
+                    (_VISIT, child, True, None, normalized_children)
+                    for child in reversed(node.children)
+                )
+        else:
+            target.append(node)
     return result
 
 
-def _normalize_node(node: Node, in_block_context: bool, options: CompareOptions) -> Optional[Node]:
-    """
-    Normalize a single node.
-
-    Returns None if the node should be removed (whitespace-only text in block context,
-    or comments when ignore_comments is True).
-    """
-    if isinstance(node, TextNode):
-        return _normalize_text_node(node, in_block_context)
-    elif isinstance(node, Element):
-        return _normalize_element(node, options)
-    elif isinstance(node, Comment):
-        return None if options.ignore_comments else node
-    elif isinstance(node, ConditionalComment):
-        return _normalize_conditional_comment(node, options)
-    return node
-
-
-def _normalize_text_node(node: TextNode, in_block_context: bool) -> Optional[TextNode]:
+def _normalize_text_node(
+    node: TextNode,
+    in_block_context: bool,
+    parent_tag: Optional[str] = None,
+    in_place: bool = False,
+) -> Optional[TextNode]:
     """
     Normalize a text node.
 
@@ -104,71 +188,67 @@ def _normalize_text_node(node: TextNode, in_block_context: bool) -> Optional[Tex
     whitespace is collapsed to a single space, preserving significant
     whitespace for rendering.
     """
+    normalized = normalize_text(node.content, in_block_context)
+    if normalized is None:
+        return None
+    digest = text_digest(normalized, parent_tag)
+    if in_place:
+        node.content = normalized
+        node.digest = digest
+        return node
+    return TextNode(content=normalized, digest=digest)
+
+
+def normalize_text(content: str, in_block_context: bool) -> Optional[str]:
+    """Return the normalized text (None if the text node should be removed)."""
     if in_block_context:
         # remove whitespace-only text nodes between block elements
-        if node.content.strip() == '':
+        if content.strip() == '':
             return None
         # normalize leading/trailing whitespace in block context
         # also collapse internal whitespace
-        normalized = _WHITESPACE_RE.sub(' ', node.content).strip()
-        return TextNode(content=normalized)
-    else:
-        # In inline context: collapse consecutive whitespace to single space
-        # but preserve leading/trailing spaces (they're significant)
-        normalized = _WHITESPACE_RE.sub(' ', node.content)
-        if normalized == '':
-            return None
-        return TextNode(content=normalized)
-
-
-def _normalize_element(element: Element, options: CompareOptions) -> Element:
-    """Normalize an element and its children."""
-    # Determine if children are in block context or inline context.
-    # Whitespace is significant (inline context) if:
-    # 1. The element is inline (not a block element)
-    # 2. OR the element contains inline elements AND significant text as children
-    #
-    # If a block element contains only inline elements (no text), or only text
-    # (no inline elements), we can strip leading/trailing whitespace.
-    # Whitespace only matters when text is ADJACENT to inline elements.
-    has_inline_children = _has_inline_elements(element.children, options)
-    has_text_content = _has_significant_text(element.children, options)
-    # Whitespace is significant only when there's both inline elements AND text
-    inline_context = has_inline_children and has_text_content
-    children_in_block_context = is_block_element(element.tag) and not inline_context
-
-    normalized_children = _normalize_children(
-        element.children,
-        in_block_context=children_in_block_context,
-        options=options,
+        return _WHITESPACE_RE.sub(' ', content).strip()
+    # In inline context: collapse consecutive whitespace to single space
+    # but preserve leading/trailing spaces (they're significant)
+    normalized = _WHITESPACE_RE.sub(' ', content)
+    if normalized == '':
+        return None
+    return normalized
+
+
+def _normalized_element(
+    element: Element,
+    normalized_children: list[Node],
+    in_place: bool = False,
+) -> Element:
+    digest = element_digest(
+        element.tag,
+        element.attributes,
+        element.is_self_closing,
+        [child.digest for child in normalized_children],
     )
-
+    if in_place:
+        element.children = normalized_children or EMPTY_CHILDREN
+        element.digest = digest
+        return element
     return Element(
         tag=element.tag,
         attributes=element.attributes,
-        children=normalized_children,
+        children=normalized_children or EMPTY_CHILDREN,
         is_self_closing=element.is_self_closing,
+        digest=digest,
     )
 
 
-def _normalize_conditional_comment(
+def _normalized_conditional_comment(
     node: ConditionalComment,
-    options: CompareOptions,
-) -> Optional[ConditionalComment]:
-    """
-    Normalize a conditional comment.
-
-    Conditional comments are compared by default, unlike regular comments.
-    They are only removed when ignore_conditional_comments is True.
-    """
-    if options.ignore_conditional_comments:
-        return None
-    normalized_children = _normalize_children(
-        node.children,
-        in_block_context=True,
-        options=options,
-    )
+    normalized_children: list[Node],
+) -> ConditionalComment:
     return ConditionalComment(
         condition=node.condition,
         children=normalized_children,
+        digest=conditional_comment_digest(
+            node.condition,
+            [child.digest for child in normalized_children],
+        ),
     )
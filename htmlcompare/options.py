@@ -12,3 +12,6 @@ class CompareOptions:
 
     ignore_conditional_comments: bool = False
     """Whether IE conditional comments should be ignored when comparing for equality."""
+
+    parser: str = 'html5lib'
+    """Name of the parser backend used to parse both documents (see ``available_parsers()``)."""
@@ -1,148 +1,230 @@
 # SPDX-License-Identifier: MIT
 
 import re
-import xml.etree.ElementTree as ET
-from collections.abc import Sequence
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import lru_cache, partial
 from typing import Optional, Union
 
 import html5lib
+import webencodings
+from html5lib._inputstream import HTMLBinaryInputStream
 
-from htmlcompare.nodes import Comment, ConditionalComment, Doctype, Document, Element, TextNode
+from htmlcompare.nodes import Comment, ConditionalComment, Document, Element, Node, copy_nodes
+from htmlcompare.stdlib_parser import UnsupportedMarkup, build_document, build_fragment
+from htmlcompare.treebuilder import NodeTreeBuilder
 
 
-__all__ = ['parse_html']
+__all__ = [
+    'DEFAULT_PARSER',
+    'Html5libParser',
+    'ParserBackend',
+    'StdlibParser',
+    'available_parsers',
+    'clear_fragment_cache',
+    'fragment_cache_info',
+    'get_parser',
+    'parse_fragment',
+    'parse_html',
+    'register_parser',
+]
 
 
 _CONDITIONAL_START_RE = re.compile(r'^\[if\s+([^\]]+)\]>')
 _CONDITIONAL_END_RE = re.compile(r'<!\[endif\]$')
 
-# Marker attribute to track self-closing tags through html5lib parsing
-_SELF_CLOSING_MARKER = 'data-htmlcompare-self-closing'
+DEFAULT_PARSER = 'html5lib'
 
-# pattern to detect self-closing tags: <tag ... /> (but not <!-- or <!)
-# captures: (1) tag name, (2) attributes section
-_SELF_CLOSING_TAG_PATTERN = rb'<([a-zA-Z][a-zA-Z0-9:_-]*)(\s[^>]*)?\s*/>'
+# Email templates often repeat the same conditional comments (e.g. Outlook
+# specific tables) so the parsed content of each comment is memoized.
+FRAGMENT_CACHE_SIZE = 512
 
 
-def _mark_self_closing_tags(html_string: Union[str, bytes]) -> Union[str, bytes]:
+class ParserBackend(ABC):
     """
-    Pre-process HTML to mark self-closing tags with a marker attribute.
+    Base class for parser backends.
 
-    This is needed because html5lib normalizes self-closing syntax away.
-    We inject a marker attribute that survives parsing.
+    A backend turns an HTML string (str or bytes) into a Document tree.
+    Backends are registered by name with ``register_parser()`` and can be
+    selected with ``parse_html(..., parser=<name>)`` or
+    ``CompareOptions(parser=<name>)``.
     """
-    if not isinstance(html_string, (str, bytes)):
-        raise TypeError("html_string must be str or bytes")
-    elif isinstance(html_string, bytes):
-        def _inject_bytes_marker_attribute(match) -> bytes:
-            tag = match.group(1)
-            attrs = match.group(2) or b''
-            _marker = f' {_SELF_CLOSING_MARKER}="true" '.encode('utf-8')
-            return b'<' + tag + attrs + _marker + b'/>'
-        _regex = re.compile(_SELF_CLOSING_TAG_PATTERN, re.DOTALL)
-        return _regex.sub(_inject_bytes_marker_attribute, html_string)
-    else:
-        def _inject_str_marker_attribute(match) -> str:
-            tag = match.group(1)
-            attrs = match.group(2) or ''
-            return f'<{tag}{attrs} {_SELF_CLOSING_MARKER}="true" />'
-        pattern = _SELF_CLOSING_TAG_PATTERN.decode('utf-8')
-        _SELF_CLOSING_TAG_RE = re.compile(pattern, re.DOTALL)
-        return _SELF_CLOSING_TAG_RE.sub(_inject_str_marker_attribute, html_string)
-
-
-def parse_html(html_string: Union[str, bytes]) -> Document:
+    @abstractmethod
+    def parse(self, html_string: Union[str, bytes]) -> Document:
+        """Parse a complete HTML document."""
+
+    def parse_fragment(
+        self,
+        html_string: Union[str, bytes],
+        container: str = 'body',
+    ) -> list[Node]:
+        """
+        Parse ``html_string`` as content of a ``container`` element.
+
+        The default implementation parses a complete document and returns the
+        children of ``<body>`` (so ``<style>`` and ``<meta>`` are lost). Other
+        containers are not supported.
+        """
+        if container != 'body':
+            raise ValueError(f'{type(self).__name__} only supports <body> as fragment container')
+        return _extract_body_children(self.parse(html_string))
+
+    def _comment_node(self, content: str) -> Union[Comment, ConditionalComment]:
+        conditional = _parse_conditional_comment(content, self)
+        if conditional is not None:
+            return conditional
+        return Comment(content=content)
+
+
+class Html5libParser(ParserBackend):
+    """Reference backend: HTML5-compliant parsing with html5lib."""
+
+    def __init__(self):
+        # html5lib parsers must not be shared between threads. Also parse() is
+        # re-entered for conditional comments so each thread keeps a small pool
+        # of idle parser instances.
+        self._local = threading.local()
+
+    def parse(self, html_string: Union[str, bytes]) -> Document:
+        if not isinstance(html_string, (str, bytes)):
+            raise TypeError("html_string must be str or bytes")
+        with self._pooled_parser() as parser:
+            return parser.parse(html_string)
+
+    def parse_fragment(
+        self,
+        html_string: Union[str, bytes],
+        container: str = 'body',
+    ) -> list[Node]:
+        if not isinstance(html_string, (str, bytes)):
+            raise TypeError("html_string must be str or bytes")
+        with self._pooled_parser() as parser:
+            return parser.parseFragment(html_string, container=container)
+
+    @contextmanager
+    def _pooled_parser(self):
+        idle_parsers = self._idle_parsers()
+        parser = idle_parsers.pop() if idle_parsers else self._create_parser()
+        try:
+            yield parser
+        finally:
+            # idle parsers should not keep the last document alive
+            parser.tree.reset()
+            idle_parsers.append(parser)
+
+    def _idle_parsers(self) -> list:
+        idle_parsers = getattr(self._local, 'idle_parsers', None)
+        if idle_parsers is None:
+            idle_parsers = self._local.idle_parsers = []
+        return idle_parsers
+
+    def _create_parser(self) -> html5lib.HTMLParser:
+        tree_builder = partial(NodeTreeBuilder, comment_factory=self._comment_node)
+        return html5lib.HTMLParser(tree=tree_builder, namespaceHTMLElements=False)
+
+
+class StdlibParser(ParserBackend):
+    """
+    Faster backend based on the tokenizer in Python's ``html.parser`` module
+    (1.2x - 1.5x faster than html5lib, see ``benchmarks/parser_speed.py``).
+
+    The tree construction only covers the common parts of the HTML5 parsing
+    algorithm. Markup which needs more than that (or which ``html.parser``
+    tokenizes differently, e.g. character references in attribute values) is
+    parsed with html5lib instead. The
+    conformance tests check that both backends return the same tree for a
+    corpus of typical and tricky markup.
+    """
+    def __init__(self, fallback: Optional[ParserBackend] = None):
+        self.fallback = fallback if (fallback is not None) else Html5libParser()
+
+    def parse(self, html_string: Union[str, bytes]) -> Document:
+        if not isinstance(html_string, (str, bytes)):
+            raise TypeError("html_string must be str or bytes")
+        text = _decode_html(html_string) if isinstance(html_string, bytes) else html_string
+        try:
+            return build_document(text, self._comment_node)
+        except UnsupportedMarkup:
+            return self.fallback.parse(html_string)
+
+    def parse_fragment(
+        self,
+        html_string: Union[str, bytes],
+        container: str = 'body',
+    ) -> list[Node]:
+        if not isinstance(html_string, (str, bytes)):
+            raise TypeError("html_string must be str or bytes")
+        if container != 'body':
+            # the tree construction only knows the <body> context
+            return self.fallback.parse_fragment(html_string, container)
+        text = _decode_html(html_string) if isinstance(html_string, bytes) else html_string
+        try:
+            return build_fragment(text, self._comment_node)
+        except UnsupportedMarkup:
+            return self.fallback.parse_fragment(html_string, container)
+
+
+def _decode_html(html_bytes: bytes) -> str:
+    # use the same encoding detection as html5lib (BOM, <meta charset>, ...)
+    stream = HTMLBinaryInputStream(html_bytes)
+    encoding = stream.charEncoding[0]
+    text, _encoding = webencodings.decode(html_bytes, encoding)
+    return text
+
+
+_PARSERS: dict[str, ParserBackend] = {}
+
+
+def register_parser(name: str, backend: ParserBackend) -> None:
+    """Register a parser backend so it can be selected by name."""
+    _PARSERS[name] = backend
+
+
+def get_parser(name: Optional[str] = None) -> ParserBackend:
+    """Return the parser backend registered as ``name`` (default: html5lib)."""
+    if name is None:
+        name = DEFAULT_PARSER
+    try:
+        return _PARSERS[name]
+    except KeyError:
+        raise ValueError(f'unknown parser backend {name!r}') from None
+
+
+def available_parsers() -> list[str]:
+    return sorted(_PARSERS)
+
+
+def parse_html(html_string: Union[str, bytes], parser: Optional[str] = None) -> Document:
     """
     Parse an HTML string into a Document tree of Node objects.
 
-    Uses html5lib for HTML5-compliant parsing, then converts the
-    resulting tree into our internal node representation.
+    ``parser`` selects the backend by name (see ``available_parsers()``). The
+    default backend uses html5lib for HTML5-compliant parsing.
+    """
+    return get_parser(parser).parse(html_string)
+
+
+def parse_fragment(
+    html_string: Union[str, bytes],
+    container: str = 'body',
+    parser: Optional[str] = None,
+) -> Document:
     """
-    TreeBuilder = html5lib.getTreeBuilder('etree')
-    parser = html5lib.HTMLParser(tree=TreeBuilder, namespaceHTMLElements=False)
-    marked_html = _mark_self_closing_tags(html_string)
-    parser.parse(marked_html)
-
-    doctype = _extract_doctype(parser.tree.document)
-    html_element = parser.tree.getDocument()
-    html_node = _element_to_node(html_element)
-    return Document(children=[html_node], doctype=doctype)
-
-
-def _extract_doctype(document) -> Optional[Doctype]:
-    for child in document.childNodes:
-        element = getattr(child, '_element', None)
-        if element is None:
-            continue
-        is_document_type_node = (getattr(element, 'tag', None) == '<!DOCTYPE>')
-        if is_document_type_node:
-            name = element.text or ''
-            public_id = element.attrib.get('publicId', '')
-            system_id = element.attrib.get('systemId', '')
-            return Doctype(name=name, public_id=public_id, system_id=system_id)
-    return None
-
-
-def _element_to_node(element) -> Element:
-    # Extract tag name (removes any namespace prefix)
-    tag = element.tag
-    if '}' in tag:
-        tag = tag.split('}', 1)[1]
-
-    is_self_closing = False
-    attributes = {}
-    for key, value in element.attrib.items():
-        if isinstance(key, tuple):
-            _namespace, attr_name = key
-        else:
-            attr_name = key
-
-        if attr_name == _SELF_CLOSING_MARKER:
-            is_self_closing = True
-            # don't include marker in final attributes
-            continue
-
-        attributes[attr_name] = value
-
-    children = _convert_children(element)
-    return Element(
-        tag=tag,
-        attributes=attributes,
-        children=children,
-        is_self_closing=is_self_closing,
-    )
-
-
-def _convert_children(element) -> Sequence[Union[Element, TextNode, Comment, ConditionalComment]]:
-    children: list[Union[Element, TextNode, Comment, ConditionalComment]] = []
-    if element.text:
-        # leading text before any child elements
-        children.append(TextNode(content=element.text))
-    for child in element:
-        if _is_comment(child):
-            comment_content = child.text or ''
-            conditional = _parse_conditional_comment(comment_content)
-            if conditional is not None:
-                children.append(conditional)
-            else:
-                children.append(Comment(content=comment_content))
-        else:
-            # regular element
-            node = _element_to_node(child)
-            children.append(node)
-        # tail text after this child element
-        if child.tail:
-            children.append(TextNode(content=child.tail))
-    return children
-
-
-def _is_comment(element) -> bool:
-    # html5lib represents comments with a special function tag
-    return callable(element.tag) or element.tag == ET.Comment
-
-
-
-def _parse_conditional_comment(content: str) -> Optional[ConditionalComment]:
+    Parse an HTML fragment (e.g. a rendered widget) without wrapping it in
+    ``<html>``/``<head>``/``<body>``.
+
+    The fragment is parsed as content of a ``container`` element (e.g.
+    ``'td'`` for table cells). The returned Document contains the top-level
+    nodes of the fragment.
+    """
+    return Document(children=get_parser(parser).parse_fragment(html_string, container))
+
+
+def _parse_conditional_comment(
+    content: str,
+    backend: ParserBackend,
+) -> Optional[ConditionalComment]:
     """
     Parse an IE conditional comment if the content matches the pattern.
 
@@ -157,12 +239,25 @@ def _parse_conditional_comment(content: str) -> Optional[ConditionalComment]:
     condition = start_match.group(1).strip()
     # extract the HTML content between the condition and the endif
     inner_html = content[start_match.end():end_match.start()]
-    inner_doc = parse_html(inner_html)
-    # The inner HTML gets wrapped in html/head/body, extract the body children
-    inner_children = _extract_body_children(inner_doc)
+    # the cached nodes must not end up in (mutable) documents
+    inner_children = copy_nodes(_parse_fragment_cached(backend, inner_html))
     return ConditionalComment(condition=condition, children=inner_children)
 
 
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _parse_fragment_cached(backend: ParserBackend, html_string: str) -> tuple:
+    return tuple(backend.parse_fragment(html_string))
+
+
+def fragment_cache_info():
+    """Return statistics of the memoized conditional comment parsing (``functools`` cache info)."""
+    return _parse_fragment_cached.cache_info()
+
+
+def clear_fragment_cache():
+    _parse_fragment_cached.cache_clear()
+
+
 def _extract_body_children(doc: Document) -> list:
     if not doc.children:
         return []
@@ -173,3 +268,7 @@ def _extract_body_children(doc: Document) -> list:
         if isinstance(child, Element) and child.tag == 'body':
             return list(child.children)
     return []
+
+
+register_parser('html5lib', Html5libParser())
+register_parser('stdlib', StdlibParser(fallback=get_parser('html5lib')))
@@ -0,0 +1,165 @@
+# SPDX-License-Identifier: MIT
+"""
+Location of a difference within the compared documents.
+
+While comparing, paths are kept as parent-linked tuples which are cheap to
+create. Only when a difference is found the path is resolved into a
+``DifferencePath`` which contains just the values needed to render it (no
+references to the compared trees). Besides the default format
+(``[0] > html[1] > body[1] > p[0]``) paths can be rendered as XPath or as
+CSS selector.
+"""
+
+from collections.abc import Sequence
+from typing import Optional
+
+from htmlcompare.nodes import Element, TextNode
+
+
+__all__ = ['DifferencePath', 'SiblingPositions']
+
+
+# step kinds, a step is a tuple: (parent, kind, value[, siblings])
+CHILD = 0            # value: index in "siblings" (SiblingPositions)
+ELEMENT = 1          # value: tag name
+CONDITIONAL = 2      # value: condition
+ATTRIBUTE = 3        # value: attribute name
+DOCTYPE = 4          # value: None
+
+DOCTYPE_PATH = (None, DOCTYPE, None)
+
+
+class SiblingPositions:
+    """
+    Positions of nodes among their siblings (as needed for XPath and CSS).
+
+    One instance is shared by all steps for the same child list. The
+    positions are only computed if a difference is found in the list.
+    """
+    __slots__ = ('_siblings', '_positions')
+
+    def __init__(self, siblings: Sequence):
+        self._siblings: Optional[Sequence] = siblings
+        self._positions: Optional[list[tuple]] = None
+
+    def __getitem__(self, index: int) -> tuple:
+        """Return (node test, XPath position, CSS position) of child ``index``."""
+        if self._positions is None:
+            self._positions = _sibling_positions(self._siblings)
+            self._siblings = None
+        return self._positions[index]
+
+
+def _sibling_positions(siblings: Sequence) -> list[tuple]:
+    node_tests = [_xpath_node_test(node) for node in siblings]
+    element_count = sum(1 for node in siblings if isinstance(node, Element))
+    counts: dict[str, int] = {}
+    element_position = 0
+    positions = []
+    for node, node_test in zip(siblings, node_tests):
+        counts[node_test] = counts.get(node_test, 0) + 1
+        css_position = None
+        if isinstance(node, Element):
+            element_position += 1
+            # ":nth-child()" is only needed if there are other sibling elements
+            css_position = element_position if (element_count > 1) else 0
+        positions.append((node_test, counts[node_test], css_position))
+    return positions
+
+
+class DifferencePath:
+    """Structured path to a node or attribute (see ``Difference.location``)."""
+    __slots__ = ('_steps',)
+
+    def __init__(self, steps: Optional[tuple]):
+        # resolved steps from the document root: (kind, value[, node test,
+        # XPath position, CSS position])
+        resolved = []
+        step = steps
+        while step is not None:
+            parent, kind, value, *siblings = step
+            if kind == CHILD:
+                resolved.append((kind, value, *siblings[0][value]))
+            else:
+                resolved.append((kind, value))
+            step = parent
+        resolved.reverse()
+        self._steps = tuple(resolved)
+
+    def __str__(self) -> str:
+        parts = []
+        for kind, value, *_positions in self._steps:
+            if kind == CHILD:
+                parts.append(f'[{value}]')
+            elif kind == ELEMENT:
+                parts.append(f' > {value}' if parts else value)
+            elif kind == CONDITIONAL:
+                parts.append(f' > <!--[if {value}]>' if parts else f'<!--[if {value}]>')
+            elif kind == ATTRIBUTE:
+                parts.append(f'@{value}')
+            elif kind == DOCTYPE:
+                return 'DOCTYPE'
+        return ''.join(parts)
+
+    def __repr__(self) -> str:
+        return f'DifferencePath({str(self)!r})'
+
+    def __eq__(self, other):
+        if isinstance(other, DifferencePath):
+            return str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __getstate__(self):
+        return self._steps
+
+    def __setstate__(self, state):
+        self._steps = state
+
+    @property
+    def xpath(self) -> str:
+        """XPath expression, e.g. ``/html[1]/body[1]/div[2]/text()[1]``."""
+        parts = []
+        for kind, value, *positions in self._steps:
+            if kind == CHILD:
+                node_test, xpath_position, _css_position = positions
+                parts.append(f'/{node_test}[{xpath_position}]')
+            elif kind == ATTRIBUTE:
+                parts.append(f'/@{value}')
+            elif kind == DOCTYPE:
+                return 'DOCTYPE'
+        return ''.join(parts)
+
+    @property
+    def css(self) -> str:
+        """
+        CSS selector, e.g. ``html > body > div:nth-child(2)``.
+
+        CSS can only select elements so for text nodes and comments this is the
+        selector of the closest element.
+        """
+        selectors = []
+        for kind, value, *positions in self._steps:
+            if kind == CHILD:
+                node_test, _xpath_position, css_position = positions
+                if css_position is None:
+                    continue
+                selector = node_test.replace(':', '\\:')
+                if css_position:
+                    selector += f':nth-child({css_position})'
+                selectors.append(selector)
+            elif (kind == ATTRIBUTE) and selectors:
+                selectors[-1] += f'[{value}]'
+            elif kind == DOCTYPE:
+                return ''
+        return ' > '.join(selectors)
+
+
+def _xpath_node_test(node) -> str:
+    if isinstance(node, Element):
+        return node.tag
+    elif isinstance(node, TextNode):
+        return 'text()'
+    return 'comment()'
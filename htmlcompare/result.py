@@ -1,8 +1,11 @@
 # SPDX-License-Identifier: MIT
 
-from dataclasses import dataclass
+from collections.abc import Iterable
+from dataclasses import dataclass, field
 from enum import Enum, auto
-from typing import Any
+from typing import Any, Optional, Union
+
+from htmlcompare.path import DifferencePath
 
 
 __all__ = ['ComparisonResult', 'Difference', 'DifferenceType']
@@ -35,10 +38,40 @@ class DifferenceType(Enum):
 class Difference:
     """Represents a single difference between two HTML trees."""
     type: DifferenceType
-    path: str  # e.g., "html > body > div[0] > p[1]"
+    path: Union[DifferencePath, str]  # e.g., "[0] > html[1] > body[1] > p[0]"
     expected: Any
     actual: Any
     message: str = ""
+    location: Optional[DifferencePath] = field(init=False, repr=False, compare=False)
+    """Structured path (only if ``path`` was passed as ``DifferencePath``)."""
+
+    def __post_init__(self):
+        # "path" is always text, the structured form is kept for XPath/CSS
+        if isinstance(self.path, DifferencePath):
+            self.location = self.path
+            self.path = str(self.path)
+        else:
+            self.location = None
+
+    @property
+    def xpath(self) -> Optional[str]:
+        """XPath expression of the location (see ``DifferencePath.xpath``)."""
+        return self.location.xpath if (self.location is not None) else None
+
+    @property
+    def css(self) -> Optional[str]:
+        """CSS selector of the location (see ``DifferencePath.css``)."""
+        return self.location.css if (self.location is not None) else None
+
+    def to_dict(self) -> dict:
+        """Return the difference as JSON-serializable dict (e.g. for reports)."""
+        return {
+            'type': self.type.name,
+            'path': self.path,
+            'expected': self.expected,
+            'actual': self.actual,
+            'message': self.message,
+        }
 
     def __str__(self) -> str:
         if self.message:
@@ -51,6 +84,19 @@ class ComparisonResult:
     is_equal: bool
     differences: list[Difference]
 
+    @classmethod
+    def from_differences(cls, differences: Iterable[Difference]) -> 'ComparisonResult':
+        """
+        Create a result from an iterable of differences (e.g. the generator
+        from ``iter_differences()``).
+
+        All differences are computed immediately so the result is a plain
+        value (which can be pickled) and does not keep the compared documents
+        in memory. Use ``iter_differences()`` to consume them lazily.
+        """
+        differences = list(differences)
+        return cls(is_equal=not differences, differences=differences)
+
     def __bool__(self) -> bool:
         return self.is_equal
 
@@ -0,0 +1,238 @@
+# SPDX-License-Identifier: MIT
+"""
+Long-running comparison server (``htmlcompare serve``).
+
+Tools which are not written in Python would have to start a new interpreter
+(and import html5lib/tinycss2) for every comparison. The server reads
+newline-delimited JSON requests from stdin (or a Unix socket) and writes one
+JSON response per request as soon as it is ready::
+
+    {"id": 1, "expected": "<p>a</p>", "actual": "<p>b</p>", "options": {"parser": "stdlib"}}
+    {"id": 1, "equal": false, "differences": [{"type": "TEXT_MISMATCH", ...}]}
+
+Optional request keys: ``options`` (``CompareOptions`` fields),
+``max_differences`` and ``container`` (compare as fragments, see
+``compare_fragments()``). Invalid requests get a response with ``error``
+(and their ``id`` unless the line is not a JSON object).
+
+Comparisons run in a pool of worker processes which live as long as the
+server so parser instances and the document cache stay warm.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+from collections.abc import Iterable
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Callable, Optional
+
+from htmlcompare.cache import DocumentCache
+from htmlcompare.compare import Comparer
+from htmlcompare.options import CompareOptions
+
+
+__all__ = ['ComparisonServer', 'serve_socket', 'serve_stdio']
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class ComparisonServer:
+    """
+    Process NDJSON comparison requests with a pool of worker processes.
+
+    One server can handle several streams (e.g. socket connections) at the
+    same time. Each worker process keeps a ``DocumentCache`` limited to
+    ``cache_bytes`` (source HTML size) so documents which are compared
+    repeatedly (e.g. golden files) are only parsed once per worker.
+    """
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        cache_bytes: Optional[int] = DEFAULT_CACHE_BYTES,
+        mp_context=None,
+    ):
+        self.workers = workers if (workers is not None) else (os.cpu_count() or 1)
+        if self.workers < 1:
+            raise ValueError(f'workers must be at least 1 (got {self.workers})')
+        self.cache_bytes = cache_bytes
+        self.mp_context = mp_context
+        # limits the number of requests which were read but not answered yet
+        self._slots = threading.BoundedSemaphore(4 * self.workers)
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def handle_stream(self, lines: Iterable[str], write: Callable[[str], None]) -> None:
+        """
+        Answer all requests in ``lines`` (NDJSON) by calling ``write()`` with
+        one JSON line per response (in the order of completion).
+
+        Returns once all requests were answered.
+        """
+        write_lock = threading.Lock()
+
+        def respond(response: dict) -> None:
+            line = json.dumps(response) + '\n'
+            with write_lock:
+                write(line)
+
+        # one future per request which is done once the response was written
+        answered = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                request = _parse_request(line)
+            except _InvalidRequest as exc:
+                respond({'id': exc.request_id, 'error': str(exc)})
+                continue
+            self._slots.acquire()
+            try:
+                executor, future = self._submit(request)
+            except Exception as exc:
+                # e.g. the executor was shut down, answer this request and go on
+                self._slots.release()
+                respond({'id': request['id'], 'error': f'{type(exc).__name__}: {exc}'})
+                continue
+            response_written = Future()
+            callback = partial(self._on_done, request['id'], respond, executor, response_written)
+            future.add_done_callback(callback)
+            answered.append(response_written)
+            if len(answered) > 1024:
+                answered = [item for item in answered if not item.done()]
+        wait(answered)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._executor.shutdown(wait=True)
+
+    def _on_done(self, request_id, respond, executor, response_written, future) -> None:
+        try:
+            response = future.result()
+        except BrokenProcessPool:
+            self._replace_broken_executor(executor)
+            response = {'error': 'worker process crashed'}
+        except Exception as exc:
+            response = {'error': f'{type(exc).__name__}: {exc}'}
+        finally:
+            self._slots.release()
+        try:
+            respond({'id': request_id, **response})
+        finally:
+            response_written.set_result(None)
+
+    def _submit(self, request: dict) -> tuple:
+        executor = self._current_executor()
+        try:
+            future = executor.submit(_handle_request, request, self.cache_bytes)
+        except BrokenProcessPool:
+            # a worker crashed and the pool was not replaced yet
+            self._replace_broken_executor(executor)
+            executor = self._current_executor()
+            future = executor.submit(_handle_request, request, self.cache_bytes)
+        return executor, future
+
+    def _current_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            return self._executor
+
+    def _replace_broken_executor(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            # all pending requests of a broken pool fail, start a new pool only once
+            if self._executor is executor:
+                self._executor = self._new_executor()
+        executor.shutdown(wait=False)
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=self.mp_context)
+
+
+def serve_stdio(server: ComparisonServer, stdin, stdout) -> None:
+    """Answer requests from ``stdin`` until the end of input."""
+    def write(line: str) -> None:
+        stdout.write(line)
+        stdout.flush()
+    server.handle_stream(stdin, write)
+
+
+def serve_socket(server: ComparisonServer, path: str) -> None:
+    """Accept connections on the Unix socket ``path`` (until interrupted)."""
+    socket_server = _create_socket_server(server, path)
+    try:
+        socket_server.serve_forever()
+    finally:
+        socket_server.server_close()
+        os.unlink(path)
+
+
+def _create_socket_server(server: ComparisonServer, path: str) -> socketserver.BaseServer:
+    if not hasattr(socket, 'AF_UNIX'):
+        raise OSError('Unix sockets are not supported on this platform')
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            lines = (line.decode('utf8') for line in self.rfile)
+            server.handle_stream(lines, self._write)
+
+        def _write(self, line: str) -> None:
+            self.wfile.write(line.encode('utf8'))
+            self.wfile.flush()
+
+    socket_server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    socket_server.daemon_threads = True
+    return socket_server
+
+
+class _InvalidRequest(ValueError):
+    """A request line could not be parsed (``request_id`` if it is known)."""
+    def __init__(self, message: str, request_id=None):
+        super().__init__(message)
+        self.request_id = request_id
+
+
+def _parse_request(line: str) -> dict:
+    try:
+        request = json.loads(line)
+    except ValueError as exc:
+        raise _InvalidRequest(f'invalid JSON: {exc}') from None
+    if not isinstance(request, dict):
+        raise _InvalidRequest('request must be a JSON object')
+    missing = [key for key in ('id', 'expected', 'actual') if key not in request]
+    if missing:
+        message = f'missing keys in request: {", ".join(missing)}'
+        raise _InvalidRequest(message, request_id=request.get('id'))
+    return request
+
+
+# per worker process: Comparer for each set of options (sharing one cache,
+# the cache keys contain the options)
+_comparers: dict = {}
+_cache: Optional[DocumentCache] = None
+
+
+def _handle_request(request: dict, cache_bytes: Optional[int]) -> dict:
+    # runs in the worker process
+    global _cache
+    try:
+        options = CompareOptions(**request.get('options', {}))
+        comparer = _comparers.get(options)
+        if comparer is None:
+            if _cache is None:
+                _cache = DocumentCache(max_bytes=cache_bytes)
+            comparer = _comparers[options] = Comparer(options, _cache)
+        expected, actual = request['expected'], request['actual']
+        max_differences = request.get('max_differences')
+        container = request.get('container')
+        if container is None:
+            result = comparer.compare(expected, actual, max_differences)
+        else:
+            result = comparer.compare_fragments(expected, actual, max_differences, container)
+        return {
+            'equal': result.is_equal,
+            'differences': [difference.to_dict() for difference in result.differences],
+        }
+    except Exception as exc:
+        return {'error': f'{type(exc).__name__}: {exc}'}
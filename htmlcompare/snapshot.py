@@ -0,0 +1,247 @@
+# SPDX-License-Identifier: MIT
+"""
+On-disk store for normalized documents ("snapshots" of golden files).
+
+Test suites often compare against thousands of golden HTML files. A
+``SnapshotStore`` keeps the normalized trees (including their digests) in a
+directory so later test runs can skip parsing and normalizing::
+
+    comparer = Comparer(cache=SnapshotStore('.htmlcompare-snapshots'))
+
+The store implements the same ``get()``/``put()`` interface as
+``DocumentCache`` and uses the same keys (content digest, options and
+library version). Each document is written to its own file. A temporary
+file is renamed into place, so concurrent processes (e.g. ``pytest-xdist``
+workers) never see partial files.
+
+File format (all integers little-endian): magic ``HCSNAP``, format version
+(uint16), the counts of nodes/attributes/names (uint32), flags (uint8), the
+size of the source HTML in bytes (uint64, for the ``DocumentCache`` limit),
+followed by the zlib compressed body: the doctype and the names
+(length-prefixed UTF-8), the arrays of the ``FlatDocument``, the digests
+and finally the UTF-8 encoded text buffer.
+"""
+
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+import threading
+import zlib
+from array import array
+from dataclasses import dataclass
+from typing import Optional
+
+from htmlcompare.cache import DocumentCache
+from htmlcompare.digest import DIGEST_SIZE
+from htmlcompare.flat import FlatDocument
+from htmlcompare.nodes import Doctype, Document
+
+
+__all__ = ['SnapshotStats', 'SnapshotStore']
+
+MAGIC = b'HCSNAP'
+FORMAT_VERSION = 2
+
+_HEADER = struct.Struct('<6sHIIIBQ')
+_LENGTH = struct.Struct('<I')
+_HAS_DOCTYPE = 1
+_HAS_DIGESTS = 2
+
+# per node/per attribute arrays in file order
+_NODE_ARRAYS = (
+    'kinds', 'name_ids', 'flags', 'parents', 'first_children', 'next_siblings',
+    'text_starts', 'text_ends',
+)
+_ATTRIBUTE_ARRAYS = ('attribute_names', 'value_starts', 'value_ends')
+
+
+class SnapshotFormatError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class SnapshotStats:
+    hits: int
+    misses: int
+    writes: int
+
+
+class SnapshotStore:
+    """
+    Directory of serialized normalized documents (see module docstring).
+
+    Loaded documents are kept in ``cache`` (a ``DocumentCache``, optional) so
+    a golden file which is compared repeatedly is only read once.
+    Unreadable or outdated snapshot files count as misses and are replaced.
+    """
+    def __init__(self, directory: str, cache: Optional[DocumentCache] = None):
+        self.directory = directory
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key) -> Optional[Document]:
+        if self.cache is not None:
+            doc = self.cache.get(key)
+            if doc is not None:
+                return doc
+        try:
+            with open(self._path(key), 'rb') as snapshot_fp:
+                data = snapshot_fp.read()
+            doc, size_bytes = _load(data)
+        except (OSError, SnapshotFormatError):
+            doc = None
+        with self._lock:
+            if doc is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        if self.cache is not None:
+            # same size as for documents which were parsed (not the file size)
+            self.cache.put(key, doc, size_bytes=size_bytes)
+        return doc
+
+    def put(self, key, document: Document, size_bytes: int) -> None:
+        if self.cache is not None:
+            self.cache.put(key, document, size_bytes)
+        data = dumps(document, size_bytes)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix='.snap')
+        try:
+            with os.fdopen(fd, 'wb') as snapshot_fp:
+                snapshot_fp.write(data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        with self._lock:
+            self._writes += 1
+
+    @property
+    def stats(self) -> SnapshotStats:
+        with self._lock:
+            return SnapshotStats(hits=self._hits, misses=self._misses, writes=self._writes)
+
+    def _path(self, key) -> str:
+        name = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=20).hexdigest()
+        return os.path.join(self.directory, name + '.snap')
+
+
+def dumps(doc: Document, size_bytes: int = 0) -> bytes:
+    """
+    Serialize a (normalized) document to the snapshot format.
+
+    ``size_bytes`` is the size of the source HTML (see ``DocumentCache.put()``).
+    """
+    flat = FlatDocument.from_document(doc)
+    flags = 0
+    if flat.doctype is not None:
+        flags |= _HAS_DOCTYPE
+    if flat.digests is not None:
+        flags |= _HAS_DIGESTS
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(flat), len(flat.attribute_names), len(flat.names), flags,
+        size_bytes,
+    )
+    parts = []
+    if flat.doctype is not None:
+        doctype = flat.doctype
+        parts.extend(_pack_strings([doctype.name, doctype.public_id, doctype.system_id]))
+    parts.extend(_pack_strings(flat.names))
+    for name in _NODE_ARRAYS + ('attribute_offsets',) + _ATTRIBUTE_ARRAYS:
+        parts.append(_array_bytes(getattr(flat, name)))
+    if flat.digests is not None:
+        parts.append(flat.digests)
+    parts.append(flat.text.encode('utf-8', 'surrogatepass'))
+    # fast compression: the arrays contain many small integers
+    return header + zlib.compress(b''.join(parts), 1)
+
+
+def loads(data: bytes) -> Document:
+    """Load a document which was serialized with ``dumps()``."""
+    doc, _size_bytes = _load(data)
+    return doc
+
+
+def _load(data: bytes) -> tuple[Document, int]:
+    # returns the document and the size of its source HTML
+    try:
+        flat, size_bytes = _load_flat(data)
+        return flat.to_document(), size_bytes
+    except (struct.error, zlib.error, UnicodeDecodeError, IndexError) as exc:
+        raise SnapshotFormatError(f'invalid snapshot: {exc}') from None
+
+
+def _load_flat(data: bytes) -> tuple[FlatDocument, int]:
+    magic, version, node_count, attribute_count, name_count, flags, size_bytes = (
+        _HEADER.unpack_from(data)
+    )
+    if magic != MAGIC:
+        raise SnapshotFormatError('not a snapshot file')
+    if version != FORMAT_VERSION:
+        raise SnapshotFormatError(f'unsupported snapshot format version {version}')
+    data = memoryview(zlib.decompress(memoryview(data)[_HEADER.size:]))
+    offset = 0
+    doctype = None
+    if flags & _HAS_DOCTYPE:
+        (name, public_id, system_id), offset = _unpack_strings(data, offset, 3)
+        doctype = Doctype(name=name, public_id=public_id, system_id=system_id)
+    flat = FlatDocument(doctype)
+    flat.names, offset = _unpack_strings(data, offset, name_count)
+    for name in _NODE_ARRAYS:
+        offset = _read_array(data, offset, getattr(flat, name), node_count)
+    flat.attribute_offsets = array('i')
+    offset = _read_array(data, offset, flat.attribute_offsets, node_count + 1)
+    for name in _ATTRIBUTE_ARRAYS:
+        offset = _read_array(data, offset, getattr(flat, name), attribute_count)
+    if flags & _HAS_DIGESTS:
+        end = offset + node_count * DIGEST_SIZE
+        if end > len(data):
+            raise SnapshotFormatError('truncated snapshot')
+        flat.digests = bytes(data[offset:end])
+        offset = end
+    flat.text = str(data[offset:], 'utf-8', 'surrogatepass')
+    return flat, size_bytes
+
+
+def _pack_strings(strings: list[str]) -> list[bytes]:
+    parts = []
+    for string in strings:
+        encoded = string.encode('utf-8', 'surrogatepass')
+        parts.append(_LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+    return parts
+
+
+def _unpack_strings(data: memoryview, offset: int, count: int) -> tuple[list[str], int]:
+    strings = []
+    for _ in range(count):
+        length, = _LENGTH.unpack_from(data, offset)
+        offset += _LENGTH.size
+        end = offset + length
+        if end > len(data):
+            raise SnapshotFormatError('truncated snapshot')
+        strings.append(str(data[offset:end], 'utf-8', 'surrogatepass'))
+        offset = end
+    return strings, offset
+
+
+def _array_bytes(values: array) -> bytes:
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _read_array(data: memoryview, offset: int, values: array, count: int) -> int:
+    end = offset + count * values.itemsize
+    if end > len(data):
+        raise SnapshotFormatError('truncated snapshot')
+    values.frombytes(data[offset:end])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return end
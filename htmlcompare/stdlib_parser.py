@@ -0,0 +1,835 @@
+# SPDX-License-Identifier: MIT
+"""
+HTML5 tree construction on top of the stdlib ``html.parser`` tokenizer.
+
+``html.parser`` tokenizes with compiled regular expressions which is much
+faster than html5lib's character-by-character tokenizer. However it does not
+implement the HTML5 tree construction rules (implied html/head/body, void
+elements, implicitly closed paragraphs, ...). This module implements the
+subset of these rules which is needed for the markup we typically compare.
+
+Markup which would require the more involved parts of the HTML5 algorithm
+(foster parenting, the adoption agency algorithm, reconstruction of active
+formatting elements, foreign content, framesets, ...) raises
+``UnsupportedMarkup`` so the caller can fall back to html5lib.
+"""
+
+import re
+from collections import Counter
+from html import unescape
+from html.parser import HTMLParser
+from sys import intern
+from typing import Callable, Optional
+
+from html5lib.constants import (
+    formattingElements,
+    namespaces,
+    scopingElements,
+    spaceCharacters,
+    specialElements,
+)
+
+from htmlcompare.nodes import (
+    EMPTY_ATTRIBUTES,
+    EMPTY_CHILDREN,
+    Doctype,
+    Document,
+    Element,
+    TextNode,
+)
+
+
+__all__ = ['UnsupportedMarkup', 'build_document', 'build_fragment']
+
+
+class UnsupportedMarkup(Exception):
+    """Raised when the markup needs tree construction rules not implemented here."""
+
+
+def _html_names(elements) -> frozenset:
+    return frozenset(name for (ns, name) in elements if ns == namespaces['html'])
+
+
+_WHITESPACE = ''.join(spaceCharacters)
+_FORMATTING = _html_names(formattingElements)
+_SPECIAL = _html_names(specialElements)
+_SCOPE_BOUNDARIES = _html_names(scopingElements)
+_BUTTON_SCOPE_BOUNDARIES = _SCOPE_BOUNDARIES | {'button'}
+_LIST_SCOPE_BOUNDARIES = _SCOPE_BOUNDARIES | {'ol', 'ul'}
+_TABLE_SCOPE_BOUNDARIES = frozenset({'html', 'table'})
+# elements which act as markers in the list of active formatting elements
+_MARKERS = frozenset({'applet', 'marquee', 'object', 'td', 'th', 'caption'})
+
+_HEADINGS = frozenset({'h1', 'h2', 'h3', 'h4', 'h5', 'h6'})
+_IMPLIED_END_TAGS = frozenset({
+    'dd', 'dt', 'li', 'optgroup', 'option', 'p', 'rb', 'rp', 'rt', 'rtc',
+})
+_VOID = frozenset({
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'hr',
+    'img', 'input', 'keygen', 'link', 'meta', 'param', 'source', 'track', 'wbr',
+})
+_HEAD_ELEMENTS = frozenset({
+    'base', 'basefont', 'bgsound', 'command', 'link', 'meta', 'noframes',
+    'script', 'style', 'title',
+})
+_CLOSES_P = frozenset({
+    'address', 'article', 'aside', 'blockquote', 'center', 'details', 'dir',
+    'div', 'dl', 'fieldset', 'figcaption', 'figure', 'footer', 'header',
+    'hgroup', 'main', 'menu', 'nav', 'ol', 'p', 'section', 'summary', 'ul',
+})
+_BLOCK_END_TAGS = frozenset({
+    'address', 'article', 'aside', 'blockquote', 'button', 'center', 'details',
+    'dialog', 'dir', 'div', 'dl', 'fieldset', 'figcaption', 'figure', 'footer',
+    'header', 'hgroup', 'listing', 'main', 'menu', 'nav', 'ol', 'pre',
+    'section', 'summary', 'ul', 'applet', 'marquee', 'object',
+})
+_MISPLACED_IN_BODY = frozenset({
+    'caption', 'col', 'colgroup', 'frame', 'head', 'tbody', 'td', 'tfoot',
+    'th', 'thead', 'tr',
+})
+_UNSUPPORTED_START_TAGS = frozenset({
+    'caption', 'col', 'colgroup', 'form', 'frame', 'frameset', 'image',
+    'isindex', 'math', 'nobr', 'optgroup', 'option', 'plaintext', 'rp', 'rt',
+    'select', 'svg',
+})
+_TABLE_SECTIONS = frozenset({'tbody', 'thead', 'tfoot'})
+_TABLE_ELEMENTS = frozenset({'table', 'tbody', 'thead', 'tfoot', 'tr', 'td', 'th'})
+_DROPS_LEADING_NEWLINE = frozenset({'pre', 'listing', 'textarea'})
+
+# content of these elements is not parsed as markup
+_RAWTEXT_ELEMENTS = frozenset({'script', 'style', 'xmp', 'iframe', 'noembed', 'noframes'})
+# like RAWTEXT but character references are decoded
+_RCDATA_ELEMENTS = frozenset({'title', 'textarea'})
+# newer Python versions handle RCDATA elements in html.parser itself
+_HAS_RCDATA_SUPPORT = hasattr(HTMLParser, 'RCDATA_CONTENT_ELEMENTS')
+# Syntax which html.parser tokenizes differently than HTML5: "</" without a
+# tag name starts a bogus comment and "<!-->"/"<!--->" are (empty) comments.
+# The whole input is checked, so this also matches in <script> content
+# (just a fallback which is not needed there).
+_TOKENIZED_DIFFERENTLY_RE = re.compile(r'</(?![a-zA-Z])|<!---?>|--!>')
+
+_DOCTYPE_RE = re.compile(
+    r'''^doctype\s+([^\s"']+)\s*'''
+    r'''(?:public\s*(?:"([^"]*)"|'([^']*)')\s*(?:"([^"]*)"|'([^']*)')?'''
+    r'''|system\s*(?:"([^"]*)"|'([^']*)'))?\s*$''',
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def build_document(html_string: str, comment_factory: Callable[[str], object]) -> Document:
+    """
+    Build a Document tree from ``html_string``.
+
+    ``comment_factory`` converts the content of a comment into a node (so the
+    caller can detect conditional comments).
+    Raises ``UnsupportedMarkup`` if the markup can not be handled reliably.
+    """
+    builder = _TreeBuilder(comment_factory)
+    _feed(builder, html_string)
+    return builder.finish()
+
+
+def build_fragment(html_string: str, comment_factory: Callable[[str], object]) -> list:
+    """
+    Build the nodes of an HTML fragment parsed as content of a ``<body>``.
+
+    Raises ``UnsupportedMarkup`` if the markup can not be handled reliably.
+    """
+    builder = _TreeBuilder(comment_factory, fragment=True)
+    builder._insert_html({})
+    builder._insert_head({})
+    builder._pop_head()
+    builder._insert_body({})
+    _feed(builder, html_string)
+    return list(builder.finish().children[0].children[1].children)
+
+
+def _feed(builder: '_TreeBuilder', html_string: str) -> None:
+    html_string = html_string.replace('\r\n', '\n').replace('\r', '\n')
+    match = _TOKENIZED_DIFFERENTLY_RE.search(html_string)
+    if match is not None:
+        raise UnsupportedMarkup(f'{match.group()!r} is tokenized differently by html.parser')
+    builder.feed(html_string)
+    leftover = builder.rawdata
+    if builder.cdata_elem is not None:
+        if leftover:
+            raise UnsupportedMarkup(f'unterminated <{builder.cdata_elem}>')
+    elif leftover.startswith('<') and (len(leftover) > 1):
+        # html.parser returns incomplete tags as text, html5lib drops them
+        raise UnsupportedMarkup('incomplete markup at end of input')
+    builder.close()
+
+
+def _check_name(name: str) -> None:
+    if not name.isascii():
+        # HTML5 only lowercases ASCII letters (html.parser uses str.lower())
+        raise UnsupportedMarkup(f'non-ASCII name {name!r}')
+
+
+def _append_child(parent: Element, node) -> None:
+    # elements start with the shared (immutable) EMPTY_CHILDREN list
+    if parent.children is EMPTY_CHILDREN:
+        parent.children = [node]
+    else:
+        parent.children.append(node)
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self, comment_factory, fragment: bool = False):
+        super().__init__(convert_charrefs=True)
+        self._comment_factory = comment_factory
+        # fragments are parsed in the context of a <body> element
+        self._fragment = fragment
+        self._doctype: Optional[Doctype] = None
+        self._html: Optional[Element] = None
+        self._head: Optional[Element] = None
+        self._body: Optional[Element] = None
+        self._stack: list[Element] = []
+        # number of open elements per tag, most scope checks can be answered
+        # without walking the (possibly very deep) stack
+        self._open_tags: Counter = Counter()
+        self._mode = 'initial'
+        # only the first token (except comments and whitespace) can be a DOCTYPE
+        self._doctype_allowed = True
+        self._table_depth = 0
+        self._drop_newline_in: Optional[Element] = None
+        self._unescape_cdata = False
+
+    # --- html.parser callbacks ----------------------------------------------
+
+    def handle_decl(self, decl):
+        if (self._mode != 'initial') or not self._doctype_allowed:
+            # a DOCTYPE anywhere else is ignored by the HTML5 parser
+            return
+        self._doctype_allowed = False
+        match = _DOCTYPE_RE.match(decl)
+        if not match:
+            raise UnsupportedMarkup(f'DOCTYPE {decl!r}')
+        name, pub_dq, pub_sq, sys_dq, sys_sq, sys2_dq, sys2_sq = match.groups()
+        public_id = pub_dq or pub_sq or ''
+        system_id = sys_dq or sys_sq or sys2_dq or sys2_sq or ''
+        self._doctype = Doctype(name=name.lower(), public_id=public_id, system_id=system_id)
+
+    def unknown_decl(self, data):
+        raise UnsupportedMarkup(f'<![{data}]>')
+
+    def handle_pi(self, data):
+        # the HTML5 parser treats processing instructions as bogus comments
+        self.handle_comment('?' + data)
+
+    def handle_comment(self, data):
+        self._insert_comment(self._comment_factory(data))
+
+    def handle_data(self, data):
+        if (self.cdata_elem in _RAWTEXT_ELEMENTS) and ('<!--' in data):
+            # "<!--" switches the HTML5 tokenizer to the script data escape
+            # state where "<script>" changes how "</script>" is handled
+            raise UnsupportedMarkup(f'<!-- in <{self.cdata_elem}>')
+        if self._unescape_cdata:
+            data = unescape(data)
+        data = data.replace('\x00', '')
+        if data:
+            self._process_text(data)
+
+    def handle_starttag(self, tag, attrs):
+        self._check_fragment_tag(tag)
+        self._check_raw_attributes(tag, attrs)
+        self._process_start_tag(tag, attrs, is_self_closing=False)
+        self._enter_cdata_mode(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._check_fragment_tag(tag)
+        self._check_raw_attributes(tag, attrs)
+        self._process_start_tag(tag, attrs, is_self_closing=True)
+        # "<script />" opens a script element in HTML5 so the following markup
+        # is script content
+        self._enter_cdata_mode(tag)
+
+    def handle_endtag(self, tag):
+        self._unescape_cdata = False
+        self._doctype_allowed = False
+        _check_name(tag)
+        self._check_fragment_tag(tag)
+        self._process_end_tag(tag)
+
+    # --- result ---------------------------------------------------------------
+
+    def finish(self) -> Document:
+        if self._html is None:
+            self._insert_html({})
+        if self._head is None:
+            self._insert_head({})
+        if self._body is None:
+            self._insert_body({})
+        return Document(children=[self._html], doctype=self._doctype)
+
+    # --- helpers -------------------------------------------------------------
+
+    def _check_fragment_tag(self, tag):
+        # <html>/<body> tags are ignored in fragments (instead of modifying the
+        # context element) which is not implemented here
+        if self._fragment and (tag in ('html', 'body')):
+            raise UnsupportedMarkup(f'<{tag}> in fragment')
+
+    def _check_raw_attributes(self, tag, attrs):
+        _check_name(tag)
+        for name, _value in attrs:
+            _check_name(name)
+        # html.parser decodes attribute values with html.unescape() which also
+        # decodes legacy character references without ";" (e.g. "&copy=x").
+        # HTML5 keeps these in attribute values and replaces NUL characters.
+        raw_tag = self.get_starttag_text()
+        if ('&' in raw_tag) or ('\x00' in raw_tag):
+            raise UnsupportedMarkup('character reference or NUL in attribute')
+
+    def _enter_cdata_mode(self, tag):
+        if tag in _RAWTEXT_ELEMENTS:
+            self.set_cdata_mode(tag)
+        elif tag in _RCDATA_ELEMENTS:
+            if _HAS_RCDATA_SUPPORT:
+                self.set_cdata_mode(tag, escapable=True)
+            else:
+                self.set_cdata_mode(tag)
+                self._unescape_cdata = True
+
+    @property
+    def _current(self) -> Element:
+        return self._stack[-1]
+
+    def _insert_html(self, attributes):
+        self._html = Element(tag='html', attributes=attributes, children=EMPTY_CHILDREN)
+        self._push(self._html)
+        self._mode = 'before_head'
+
+    def _insert_head(self, attributes, is_self_closing=False):
+        self._head = Element(
+            tag='head',
+            attributes=attributes,
+            children=EMPTY_CHILDREN,
+            is_self_closing=is_self_closing,
+        )
+        _append_child(self._html, self._head)
+        self._push(self._head)
+        self._mode = 'in_head'
+
+    def _pop_head(self):
+        node = self._stack.pop()
+        self._open_tags[node.tag] -= 1
+        assert node is self._head
+        self._mode = 'after_head'
+
+    def _insert_body(self, attributes, is_self_closing=False):
+        self._body = Element(
+            tag='body',
+            attributes=attributes,
+            children=EMPTY_CHILDREN,
+            is_self_closing=is_self_closing,
+        )
+        _append_child(self._html, self._body)
+        self._push(self._body)
+        self._mode = 'in_body'
+
+    def _insert_element(self, tag, attributes, is_self_closing, parent=None) -> Element:
+        element = Element(
+            tag=tag,
+            attributes=attributes,
+            children=EMPTY_CHILDREN,
+            is_self_closing=is_self_closing,
+        )
+        if parent is None:
+            parent = self._current
+        _append_child(parent, element)
+        if tag in _VOID:
+            return element
+        self._push(element)
+        if tag in _TABLE_ELEMENTS:
+            self._table_depth += 1
+        if tag in _DROPS_LEADING_NEWLINE:
+            self._drop_newline_in = element
+        return element
+
+    def _insert_text(self, text, parent=None):
+        if parent is None:
+            parent = self._current
+        drop_newline_in = self._drop_newline_in
+        if drop_newline_in is not None:
+            self._drop_newline_in = None
+            if (parent is drop_newline_in) and (not parent.children) and text.startswith('\n'):
+                text = text[1:]
+                if not text:
+                    return
+        children = parent.children
+        if children and isinstance(children[-1], TextNode):
+            children[-1].content += text
+        else:
+            _append_child(parent, TextNode(content=text))
+
+    def _insert_comment(self, node):
+        mode = self._mode
+        if mode in ('initial', 'after_after_body'):
+            # these comments are attached to the document node and are not
+            # part of the html element tree
+            return
+        if mode == 'after_body':
+            _append_child(self._html, node)
+            return
+        _append_child(self._current, node)
+
+    def _merge_attributes(self, element: Element, attributes):
+        if element.attributes is EMPTY_ATTRIBUTES:
+            element.attributes = {}
+        for key, value in attributes.items():
+            if key not in element.attributes:
+                element.attributes[key] = value
+
+    # --- stack of open elements ------------------------------------------------
+
+    def _push(self, element: Element):
+        self._stack.append(element)
+        self._open_tags[element.tag] += 1
+
+    def _in_scope(self, tags, boundaries=_SCOPE_BOUNDARIES) -> bool:
+        open_tags = self._open_tags
+        if not any(open_tags[tag] for tag in tags):
+            return False
+        for node in reversed(self._stack):
+            if node.tag in tags:
+                return True
+            if node.tag in boundaries:
+                return False
+        return False
+
+    def _pop_until(self, tags):
+        """Pop elements until (and including) an element with one of ``tags``."""
+        index = len(self._stack) - 1
+        while self._stack[index].tag not in tags:
+            index -= 1
+            assert index >= 0
+        popped = self._stack[index:]
+        # Implicitly closed formatting elements are reopened by the HTML5
+        # parser ("reconstruct the active formatting elements") unless there
+        # is a marker element (e.g. a table cell) between them.
+        protected = (popped[0].tag in _MARKERS)
+        for node in popped[1:]:
+            if node.tag in _MARKERS:
+                protected = True
+            elif (node.tag in _FORMATTING) and not protected:
+                raise UnsupportedMarkup(f'implicitly closed <{node.tag}>')
+        for node in popped:
+            self._open_tags[node.tag] -= 1
+            if node.tag in _TABLE_ELEMENTS:
+                self._table_depth -= 1
+        del self._stack[index:]
+
+    def _pop_current(self):
+        self._pop_until((self._current.tag,))
+
+    def _generate_implied_end_tags(self, exclude=None):
+        while (self._current.tag in _IMPLIED_END_TAGS) and (self._current.tag != exclude):
+            self._pop_current()
+
+    def _close_p_element(self):
+        self._generate_implied_end_tags(exclude='p')
+        self._pop_until(('p',))
+
+    def _close_p_if_in_button_scope(self):
+        if self._in_scope(('p',), _BUTTON_SCOPE_BOUNDARIES):
+            self._close_p_element()
+
+    def _table_mode(self) -> Optional[str]:
+        """Return the table insertion mode for the current stack (or None)."""
+        if not self._table_depth:
+            return None
+        for node in reversed(self._stack):
+            tag = node.tag
+            if tag in ('td', 'th'):
+                return 'in_cell'
+            elif tag == 'tr':
+                return 'in_row'
+            elif tag in _TABLE_SECTIONS:
+                return 'in_table_body'
+            elif tag == 'table':
+                return 'in_table'
+        return None
+
+    def _is_quirks_mode(self) -> bool:
+        if self._fragment:
+            # html5lib parses fragments in "no quirks" mode
+            return False
+        doctype = self._doctype
+        if doctype is None:
+            return True
+        if doctype.name != 'html':
+            return True
+        if doctype.public_id or doctype.system_id:
+            # legacy DOCTYPEs need the full quirks mode detection from html5lib
+            raise UnsupportedMarkup('legacy DOCTYPE')
+        return False
+
+    # --- text --------------------------------------------------------------------
+
+    def _process_text(self, data):
+        if self.cdata_elem is not None:
+            # content of <script>, <style>, <title>, ...
+            self._insert_text(data)
+            return
+        mode = self._mode
+        if mode in ('initial', 'before_head', 'in_head', 'after_head'):
+            stripped = data.lstrip(_WHITESPACE)
+            leading_whitespace = data[:len(data) - len(stripped)]
+            if mode in ('initial', 'before_head'):
+                # whitespace is ignored before the <head>
+                if not stripped:
+                    return
+                leading_whitespace = ''
+            if mode == 'initial':
+                self._insert_html({})
+                mode = 'before_head'
+            if mode == 'before_head':
+                self._insert_head({})
+                mode = 'in_head'
+            if mode == 'in_head':
+                if leading_whitespace:
+                    self._insert_text(leading_whitespace)
+                if not stripped:
+                    return
+                self._pop_head()
+                leading_whitespace = ''
+            # after_head
+            if leading_whitespace:
+                self._insert_text(leading_whitespace)
+            if not stripped:
+                return
+            self._insert_body({})
+            data = stripped
+        elif mode in ('after_body', 'after_after_body'):
+            if data.strip(_WHITESPACE):
+                self._mode = 'in_body'
+
+        table_mode = self._table_mode()
+        if (table_mode is not None) and (table_mode != 'in_cell'):
+            if self._current.tag in _TABLE_ELEMENTS:
+                if data.strip(_WHITESPACE):
+                    # text in tables is moved in front of the table ("foster parenting")
+                    raise UnsupportedMarkup('text in table')
+        if mode == 'after_body':
+            # html5lib does not drop the newline after <pre> here (but it
+            # still drops a later one)
+            drop_newline_in = self._drop_newline_in
+            self._drop_newline_in = None
+            self._insert_text(data)
+            self._drop_newline_in = drop_newline_in
+            return
+        self._insert_text(data)
+
+    # --- start tags ----------------------------------------------------------------
+
+    def _process_start_tag(self, tag, attrs, is_self_closing):
+        tag = intern(tag)
+        attributes = {}
+        for key, value in attrs:
+            # first attribute wins in case of duplicates
+            if key not in attributes:
+                attributes[intern(key)] = value if (value is not None) else ''
+        if not attributes:
+            attributes = EMPTY_ATTRIBUTES
+        mode = self._mode
+
+        if mode == 'initial':
+            if tag == 'html':
+                self._insert_html(attributes)
+                return
+            self._insert_html({})
+            mode = self._mode
+        if tag == 'html':
+            self._merge_attributes(self._html, attributes)
+            return
+
+        if mode == 'before_head':
+            if tag == 'head':
+                self._insert_head(attributes, is_self_closing)
+                return
+            self._insert_head({})
+            mode = self._mode
+        if mode == 'in_head':
+            if tag == 'head':
+                return
+            elif tag in _HEAD_ELEMENTS:
+                self._insert_element(tag, attributes, is_self_closing)
+                return
+            elif tag == 'noscript':
+                raise UnsupportedMarkup('<noscript> in <head>')
+            self._pop_head()
+            mode = self._mode
+        if mode == 'after_head':
+            if tag == 'head':
+                return
+            elif tag in _HEAD_ELEMENTS:
+                self._insert_element(tag, attributes, is_self_closing, parent=self._head)
+                return
+            elif tag == 'frameset':
+                raise UnsupportedMarkup('<frameset>')
+            elif tag == 'body':
+                self._insert_body(attributes, is_self_closing)
+                return
+            self._insert_body({})
+        elif mode in ('after_body', 'after_after_body'):
+            self._mode = 'in_body'
+
+        table_mode = self._table_mode()
+        if table_mode is not None:
+            if self._process_start_tag_in_table(table_mode, tag, attributes, is_self_closing):
+                return
+        self._process_start_tag_in_body(tag, attributes, is_self_closing)
+
+    def _process_start_tag_in_table(self, table_mode, tag, attributes, is_self_closing) -> bool:
+        """Handle start tag in a table context, return False if "in body" rules apply."""
+        if table_mode == 'in_cell':
+            if tag in ('td', 'th', 'tr') or tag in _TABLE_SECTIONS:
+                self._close_cell()
+                return self._process_start_tag_in_table(
+                    self._table_mode(), tag, attributes, is_self_closing
+                )
+            elif tag in ('caption', 'col', 'colgroup'):
+                raise UnsupportedMarkup(f'<{tag}>')
+            return False
+
+        if self._current.tag not in _TABLE_ELEMENTS:
+            # e.g. a <script> in a table
+            return False
+        if table_mode == 'in_row':
+            if tag in ('td', 'th'):
+                self._insert_element(tag, attributes, is_self_closing)
+                return True
+            elif tag == 'tr' or tag in _TABLE_SECTIONS:
+                self._pop_until(('tr',))
+                return self._process_start_tag_in_table(
+                    self._table_mode(), tag, attributes, is_self_closing
+                )
+        elif table_mode == 'in_table_body':
+            if tag == 'tr':
+                self._insert_element(tag, attributes, is_self_closing)
+                return True
+            elif tag in ('td', 'th'):
+                self._insert_element('tr', {}, False)
+                self._insert_element(tag, attributes, is_self_closing)
+                return True
+            elif tag in _TABLE_SECTIONS:
+                self._pop_current()
+                self._insert_element(tag, attributes, is_self_closing)
+                return True
+        else:
+            # in_table
+            if tag in _TABLE_SECTIONS:
+                self._insert_element(tag, attributes, is_self_closing)
+                return True
+            elif tag == 'tr':
+                self._insert_element('tbody', {}, False)
+                self._insert_element(tag, attributes, is_self_closing)
+                return True
+            elif tag in ('td', 'th'):
+                self._insert_element('tbody', {}, False)
+                self._insert_element('tr', {}, False)
+                self._insert_element(tag, attributes, is_self_closing)
+                return True
+        if tag in ('style', 'script'):
+            self._insert_element(tag, attributes, is_self_closing)
+            return True
+        # everything else is moved in front of the table ("foster parenting")
+        raise UnsupportedMarkup(f'<{tag}> in table')
+
+    def _close_cell(self):
+        self._generate_implied_end_tags()
+        self._pop_until(('td', 'th'))
+
+    def _process_start_tag_in_body(self, tag, attributes, is_self_closing):
+        if tag in _UNSUPPORTED_START_TAGS:
+            raise UnsupportedMarkup(f'<{tag}>')
+        elif tag in _MISPLACED_IN_BODY:
+            # ignored by the HTML5 parser
+            return
+        elif tag == 'body':
+            if (len(self._stack) > 1) and (self._stack[1] is self._body):
+                self._merge_attributes(self._body, attributes)
+            return
+        elif tag in _CLOSES_P:
+            self._close_p_if_in_button_scope()
+        elif tag in _HEADINGS:
+            self._close_p_if_in_button_scope()
+            if self._current.tag in _HEADINGS:
+                self._pop_current()
+        elif tag in ('pre', 'listing', 'xmp', 'hr'):
+            self._close_p_if_in_button_scope()
+        elif tag in ('li', 'dd', 'dt'):
+            self._close_list_item(tag)
+        elif tag == 'a':
+            for node in reversed(self._stack):
+                if node.tag in _MARKERS:
+                    break
+                elif node.tag == 'a':
+                    raise UnsupportedMarkup('nested <a>')
+        elif tag == 'button':
+            if self._in_scope(('button',)):
+                raise UnsupportedMarkup('nested <button>')
+        elif tag == 'table':
+            if self._in_scope(('p',), _BUTTON_SCOPE_BOUNDARIES) and not self._is_quirks_mode():
+                self._close_p_element()
+        self._insert_element(tag, attributes, is_self_closing)
+
+    def _close_list_item(self, tag):
+        stop_tags = ('li',) if (tag == 'li') else ('dd', 'dt')
+        for node in reversed(self._stack):
+            if node.tag in stop_tags:
+                self._generate_implied_end_tags(exclude=node.tag)
+                self._pop_until((node.tag,))
+                break
+            if (node.tag in _SPECIAL) and (node.tag not in ('address', 'div', 'p')):
+                break
+        self._close_p_if_in_button_scope()
+
+    # --- end tags ----------------------------------------------------------------------
+
+    def _process_end_tag(self, tag):
+        mode = self._mode
+        if mode == 'initial':
+            if tag not in ('head', 'body', 'html', 'br'):
+                return
+            self._insert_html({})
+            mode = self._mode
+        if mode == 'before_head':
+            if tag not in ('head', 'body', 'html', 'br'):
+                return
+            self._insert_head({})
+            mode = self._mode
+        if mode == 'in_head':
+            if tag == 'head':
+                self._pop_head()
+                return
+            elif self._current is not self._head:
+                # end tag for <script>, <style>, <title>, ...
+                if self._current.tag == tag:
+                    self._pop_current()
+                return
+            elif tag not in ('body', 'html', 'br'):
+                return
+            self._pop_head()
+            mode = self._mode
+        if mode == 'after_head':
+            if self._current is not self._html:
+                # element from head inserted after </head>
+                if self._current.tag == tag:
+                    self._pop_current()
+                return
+            if tag not in ('body', 'html', 'br'):
+                return
+            self._insert_body({})
+        elif mode == 'after_body':
+            if tag == 'html':
+                self._mode = 'after_after_body'
+                return
+            self._mode = 'in_body'
+        elif mode == 'after_after_body':
+            self._mode = 'in_body'
+
+        table_mode = self._table_mode()
+        if table_mode is not None:
+            if self._process_end_tag_in_table(table_mode, tag):
+                return
+        self._process_end_tag_in_body(tag)
+
+    def _process_end_tag_in_table(self, table_mode, tag) -> bool:
+        """Handle end tag in a table context, return False if "in body" rules apply."""
+        if tag in ('body', 'caption', 'col', 'colgroup', 'html'):
+            return True
+        if table_mode == 'in_cell':
+            if tag in ('td', 'th'):
+                if self._in_scope((tag,), _TABLE_SCOPE_BOUNDARIES):
+                    self._generate_implied_end_tags()
+                    self._pop_until((tag,))
+                return True
+            elif tag in ('table', 'tr') or tag in _TABLE_SECTIONS:
+                if self._in_scope((tag,), _TABLE_SCOPE_BOUNDARIES):
+                    self._close_cell()
+                    return self._process_end_tag_in_table(self._table_mode(), tag)
+                return True
+            return False
+
+        if tag in ('td', 'th'):
+            return True
+        if self._current.tag not in _TABLE_ELEMENTS:
+            # e.g. </script> in a table
+            return False
+        if tag == 'table':
+            if self._in_scope(('table',), _TABLE_SCOPE_BOUNDARIES):
+                self._pop_until(('table',))
+            return True
+        elif tag == 'tr':
+            if self._in_scope(('tr',), _TABLE_SCOPE_BOUNDARIES):
+                self._pop_until(('tr',))
+            return True
+        elif tag in _TABLE_SECTIONS:
+            if self._in_scope((tag,), _TABLE_SCOPE_BOUNDARIES):
+                self._pop_until((tag,))
+            return True
+        elif tag in ('p', 'br'):
+            raise UnsupportedMarkup(f'</{tag}> in table')
+        return False
+
+    def _process_end_tag_in_body(self, tag):
+        if tag in ('body', 'html'):
+            if self._in_scope(('body',)):
+                self._mode = 'after_after_body' if (tag == 'html') else 'after_body'
+        elif tag in _BLOCK_END_TAGS:
+            if self._in_scope((tag,)):
+                self._generate_implied_end_tags()
+                self._pop_until((tag,))
+        elif tag == 'form':
+            raise UnsupportedMarkup('</form>')
+        elif tag == 'p':
+            if not self._in_scope(('p',), _BUTTON_SCOPE_BOUNDARIES):
+                self._insert_element('p', {}, False)
+            self._close_p_element()
+        elif tag in ('li', 'dd', 'dt'):
+            boundaries = _LIST_SCOPE_BOUNDARIES if (tag == 'li') else _SCOPE_BOUNDARIES
+            if self._in_scope((tag,), boundaries):
+                self._generate_implied_end_tags(exclude=tag)
+                self._pop_until((tag,))
+        elif tag in _HEADINGS:
+            if self._in_scope(_HEADINGS):
+                self._generate_implied_end_tags()
+                self._pop_until(_HEADINGS)
+        elif tag in _FORMATTING:
+            self._process_formatting_end_tag(tag)
+        elif tag == 'br':
+            self._insert_element('br', {}, False)
+        else:
+            self._process_any_other_end_tag(tag)
+
+    def _process_formatting_end_tag(self, tag):
+        index = None
+        for i in range(len(self._stack) - 1, -1, -1):
+            node_tag = self._stack[i].tag
+            if node_tag == tag:
+                index = i
+                break
+            elif node_tag in _MARKERS:
+                break
+        if index is None:
+            self._process_any_other_end_tag(tag)
+            return
+        if not self._in_scope((tag,)):
+            return
+        for node in self._stack[index + 1:]:
+            if node.tag in _SPECIAL:
+                # misnested tags need the adoption agency algorithm
+                raise UnsupportedMarkup(f'misnested </{tag}>')
+        self._pop_until((tag,))
+
+    def _process_any_other_end_tag(self, tag):
+        for node in reversed(self._stack):
+            if node.tag == tag:
+                self._generate_implied_end_tags(exclude=tag)
+                self._pop_until((tag,))
+                return
+            elif node.tag in _SPECIAL:
+                return
@@ -0,0 +1,102 @@
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from htmlcompare.async_api import AsyncComparer, compare_html_async
+from htmlcompare.cache import DocumentCache
+from htmlcompare.compare import FastPathStats, fast_path_stats, reset_fast_path_stats
+from htmlcompare.result import DifferenceType
+
+
+def test_can_compare_html_in_coroutines():
+    result = asyncio.run(compare_html_async('<p>a</p>', '<p>b</p>'))
+    assert not result
+    difference, = result.differences
+    assert difference.type == DifferenceType.TEXT_MISMATCH
+    assert asyncio.run(compare_html_async('<div />', '<div></div>'))
+
+
+def test_parses_both_documents_concurrently():
+    # both documents are parsed before either parse call returns
+    barrier = threading.Barrier(2, timeout=5)
+
+    comparer = AsyncComparer(executor=ThreadPoolExecutor(2))
+    parse_normalized = comparer.comparer.parse_normalized
+
+    def parse_and_wait(html):
+        doc = parse_normalized(html)
+        barrier.wait()
+        return doc
+
+    comparer.comparer.parse_normalized = parse_and_wait
+    # (identical input would not be parsed at all)
+    assert asyncio.run(comparer.compare('<p>a</p>', '<p>a</p>\n'))
+
+
+def test_uses_fast_paths():
+    reset_fast_path_stats()
+    comparer = AsyncComparer()
+    assert asyncio.run(comparer.compare('<p>a</p>', '<p>a</p>'))
+    assert asyncio.run(comparer.compare('<p>a</p>', '<p>a</p>\n'))
+    assert not asyncio.run(comparer.compare('<p>a</p>', '<p>b</p>'))
+    assert fast_path_stats() == FastPathStats(identical_input=1, equal_digest=1, full=1)
+    with pytest.raises(ValueError):
+        asyncio.run(comparer.compare('<p>a</p>', '<p>b</p>', max_differences=0))
+
+
+def test_limits_concurrent_comparisons():
+    comparer = AsyncComparer(cache=DocumentCache(), max_concurrency=2)
+    running = 0
+    max_running = 0
+    compare = comparer._compare
+
+    async def tracked_compare(*args):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        try:
+            await asyncio.sleep(0.01)
+            return await compare(*args)
+        finally:
+            running -= 1
+
+    comparer._compare = tracked_compare
+
+    async def main():
+        pairs = [(f'<p>{i}</p>', f'<p>{i}</p>') for i in range(6)]
+        return await asyncio.gather(*(comparer.compare(*pair) for pair in pairs))
+
+    results = asyncio.run(main())
+    assert all(results)
+    assert max_running == 2
+
+
+def test_releases_slot_when_cancelled():
+    comparer = AsyncComparer(max_concurrency=1)
+
+    async def main():
+        task = asyncio.create_task(comparer.compare('<p>a</p>' * 2000, '<p>b</p>' * 2000))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await asyncio.wait_for(comparer.compare('<p>a</p>', '<p>b</p>'), timeout=10)
+
+    assert not asyncio.run(main())
+
+
+def test_can_compare_in_worker_processes():
+    with ProcessPoolExecutor(1) as executor:
+        comparer = AsyncComparer(executor=executor)
+        result = asyncio.run(comparer.compare('<p>a</p>', '<p>b</p>'))
+    difference, = result.differences
+    assert difference.path == '[0] > html[1] > body[0] > p[0]'
+
+
+def test_rejects_invalid_concurrency():
+    with pytest.raises(ValueError):
+        AsyncComparer(max_concurrency=0)
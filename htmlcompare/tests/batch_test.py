@@ -0,0 +1,78 @@
+# SPDX-License-Identifier: MIT
+
+import multiprocessing
+import os
+
+import pytest
+
+from htmlcompare import parser
+from htmlcompare.batch import CRASHED_WORKER, compare_many
+from htmlcompare.options import CompareOptions
+from htmlcompare.parser import Html5libParser
+from htmlcompare.result import DifferenceType
+
+
+PAIRS = [
+    ('<p>a</p>', '<p>a</p>'),
+    ('<p>a</p>', '<p>b</p>'),
+    ('<div />', '<div></div>'),
+    ('<br>', '<hr>'),
+    ('<p class="a b">x</p>', '<p class="b a">x</p>'),
+]
+
+
+def test_can_compare_many_pairs():
+    results = list(compare_many(PAIRS, workers=2, chunksize=2))
+    assert [result.index for result in results] == [0, 1, 2, 3, 4]
+    assert [bool(result) for result in results] == [True, False, True, False, True]
+    difference, = results[1].result.differences
+    assert difference.type == DifferenceType.TEXT_MISMATCH
+    # compact results only contain the textual path
+    assert difference.path == '[0] > html[1] > body[0] > p[0]'
+
+
+def test_can_yield_results_as_completed():
+    results = list(compare_many(iter(PAIRS), workers=2, chunksize=1, ordered=False))
+    assert sorted(result.index for result in results) == [0, 1, 2, 3, 4]
+
+
+def test_reports_errors_per_pair():
+    pairs = [('<p>a</p>', '<p>a</p>'), ('<p>a</p>', None)]
+    ok, failed = compare_many(pairs, workers=1)
+    assert ok.result.is_equal
+    assert failed.result is None
+    assert failed.error.startswith('TypeError')
+
+
+def test_rejects_invalid_arguments():
+    with pytest.raises(ValueError):
+        list(compare_many(PAIRS, chunksize=0))
+    with pytest.raises(ValueError):
+        list(compare_many(PAIRS, workers=0))
+
+
+class _CrashingParser(Html5libParser):
+    def parse(self, html_string):
+        if 'CRASH' in html_string:
+            os._exit(1)
+        return super().parse(html_string)
+
+
+@pytest.mark.skipif(
+    'fork' not in multiprocessing.get_all_start_methods(),
+    reason='needs the "fork" start method to pass the test parser to worker processes',
+)
+def test_recovers_from_crashed_workers(monkeypatch):
+    monkeypatch.setitem(parser._PARSERS, 'test-crashing', _CrashingParser())
+    same = ('<p>a</p>', '<p>a</p>')
+    pairs = [same] * 3 + [('<p>a</p>', 'CRASH')] + [same] * 3
+    results = list(compare_many(
+        pairs,
+        CompareOptions(parser='test-crashing'),
+        workers=2,
+        chunksize=2,
+        mp_context=multiprocessing.get_context('fork'),
+    ))
+    assert [result.index for result in results] == list(range(7))
+    assert [result.error for result in results] == [None] * 3 + [CRASHED_WORKER] + [None] * 3
+    assert all(result for index, result in enumerate(results) if index != 3)
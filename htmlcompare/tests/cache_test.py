@@ -0,0 +1,74 @@
+# SPDX-License-Identifier: MIT
+
+from htmlcompare.cache import DocumentCache, document_cache_key
+from htmlcompare.compare import Comparer
+from htmlcompare.nodes import Document, Element
+from htmlcompare.options import CompareOptions
+
+
+def test_comparer_reuses_cached_documents():
+    cache = DocumentCache()
+    comparer = Comparer(cache=cache)
+    expected = '<div><p>expected</p></div>'
+    assert comparer.compare(expected, '<div>\n<p>expected</p>\n</div>').is_equal
+    assert not comparer.compare(expected, '<div><p>other</p></div>').is_equal
+
+    stats = cache.stats
+    assert stats.hits == 1
+    assert stats.misses == 3
+    assert stats.entries == 3
+    assert stats.evictions == 0
+
+
+def test_cache_key_depends_on_options():
+    html = '<div><!-- x --></div>'
+    key = document_cache_key(html, CompareOptions())
+    assert key == document_cache_key(html, CompareOptions())
+    assert key != document_cache_key(html, CompareOptions(ignore_comments=False))
+    assert key != document_cache_key(html.encode('utf-8'), CompareOptions())
+
+
+def test_cached_documents_respect_options():
+    cache = DocumentCache()
+    html = '<div><!-- x --></div>'
+    Comparer(cache=cache).compare(html, '<div></div>')
+    comparer = Comparer(CompareOptions(ignore_comments=False), cache=cache)
+    assert not comparer.compare(html, '<div></div>').is_equal
+
+
+def test_counts_size_of_text_in_bytes():
+    cache = DocumentCache()
+    comparer = Comparer(cache=cache)
+    comparer.parse_normalized('<p>\u20ac</p>')
+    comparer.parse_normalized('<p>a</p>'.encode('utf-8'))
+    assert cache.stats.size_bytes == len('<p>\u20ac</p>'.encode('utf-8')) + len('<p>a</p>')
+
+
+def test_evicts_least_recently_used_documents():
+    cache = DocumentCache(max_bytes=10)
+    cache.put('a', _doc('a'), size_bytes=4)
+    cache.put('b', _doc('b'), size_bytes=4)
+    assert cache.get('a') is not None
+    cache.put('c', _doc('c'), size_bytes=4)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == _doc('a')
+    assert cache.get('c') == _doc('c')
+    assert cache.stats.evictions == 1
+    assert cache.stats.size_bytes == 8
+
+
+def test_can_limit_number_of_nodes():
+    cache = DocumentCache(max_bytes=None, max_nodes=3)
+    cache.put('a', _doc('a'), size_bytes=100)
+    cache.put('b', _doc('b'), size_bytes=100)
+    assert len(cache) == 1
+    assert cache.stats.size_nodes == 2
+    # a single document which exceeds the limit is not cached at all
+    cache.put('big', Document(children=[_doc('x').children[0]] * 4), size_bytes=1)
+    assert cache.get('big') is None
+    assert cache.get('b') is not None
+
+
+def _doc(tag):
+    return Document(children=[Element(tag, children=[Element('span')])])
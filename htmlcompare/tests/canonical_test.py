@@ -0,0 +1,119 @@
+# SPDX-License-Identifier: MIT
+
+import pytest
+
+from htmlcompare import CompareOptions, compare_html
+from htmlcompare.canonical import MAX_INDENT_DEPTH, canonicalize, canonicalize_html
+from htmlcompare.nodes import Document, Element
+
+
+EQUIVALENT_PAIRS = [
+    ('<p class="b a b">x</p>', '<p class="a  b">x</p>'),
+    ('<div style="margin:0px;color:red"></div>', '<div style="color: red; margin: 0"></div>'),
+    ('<div>\n  <p>a</p>\n  <p>b</p>\n</div>', '<div><p>a</p><p>b</p></div>'),
+    ('<img src=a.png alt="" class="">', '<img alt="" src="a.png" />'),
+    ('<style>p{color:red;margin:0}</style>', '<style>p { margin: 0px; color: red; }</style>'),
+    ('<p>a  <b>b</b></p>', '<p>a <b>b</b></p>'),
+    ('<p>x<!-- comment --></p>', '<p>x</p>'),
+]
+
+
+@pytest.mark.parametrize('parser', ['html5lib', 'stdlib'])
+@pytest.mark.parametrize('html, other_html', EQUIVALENT_PAIRS)
+def test_equivalent_html_has_same_canonical_form(html, other_html, parser):
+    options = CompareOptions(parser=parser)
+    assert compare_html(html, other_html, options)
+    assert canonicalize_html(html, options) == canonicalize_html(other_html, options)
+
+
+@pytest.mark.parametrize('html, other_html', [
+    ('<p>a <b>b</b></p>', '<p>a<b>b</b></p>'),
+    ('<p class="a">x</p>', '<p class="a b">x</p>'),
+    ('<div style="color: red"></div>', '<div style="color: blue"></div>'),
+    ('<script></script>', '<script />'),
+    ('<p>a&lt;b</p>', '<p>a<b>b</b></p>'),
+])
+def test_different_html_has_different_canonical_form(html, other_html):
+    assert not compare_html(html, other_html)
+    assert canonicalize_html(html) != canonicalize_html(other_html)
+
+
+def test_writes_block_content_on_separate_lines():
+    html = (
+        '<!DOCTYPE html><html><head><title>T</title></head><body>'
+        '<div id="x" class="b a"><p>Hello <b>World</b></p><br></div>'
+        '<!--[if mso]><table><tr><td>x</td></tr></table><![endif]-->'
+        '</body></html>'
+    )
+    assert canonicalize_html(html) == '\n'.join([
+        '<!DOCTYPE html>',
+        '<html>',
+        '  <head>',
+        '    <title>T</title>',
+        '  </head>',
+        '  <body>',
+        '    <div class="a b" id="x">',
+        '      <p>Hello <b>World</b></p>',
+        '      <br>',
+        '    </div>',
+        '    <!--[if mso]>',
+        '      <table>',
+        '        <tbody>',
+        '          <tr>',
+        '            <td>x</td>',
+        '          </tr>',
+        '        </tbody>',
+        '      </table>',
+        '    <![endif]-->',
+        '  </body>',
+        '</html>',
+        '',
+    ])
+
+
+def test_escapes_text_and_attributes_but_not_raw_text():
+    html = '<p title="a&quot;b">1 &lt; 2 &amp; 3</p><script>if (a < b) {}</script>'
+    canonical = canonicalize_html(html, container='body')
+    assert canonical == (
+        '<p title="a&quot;b">1 &lt; 2 &amp; 3</p>\n'
+        '<script>if (a < b) {}</script>\n'
+    )
+
+
+def test_writes_normalized_css():
+    html = (
+        '<style>a:hover , p{font-family:Arial,sans-serif;color:RED!important}'
+        '@media screen{.x{margin:0px}}</style>'
+        '<p style="width:calc(100% - 2px);background:url(a.png)">x</p>'
+    )
+    assert canonicalize_html(html, container='body') == (
+        '<style>'
+        'a:hover, p { color: RED !important; font-family: Arial, sans-serif }'
+        ' @media screen { .x { margin: 0 } }'
+        '</style>\n'
+        '<p style="background: url(a.png); width: calc(100% - 2px)">x</p>\n'
+    )
+
+
+def test_canonical_form_is_stable():
+    html = (
+        '<html><body><div class="b a"><ul><li>a <i>b</i></li><li>c</li></ul>'
+        '<pre>  x</pre><style>p{margin:0}</style></div></body></html>'
+    )
+    canonical = canonicalize_html(html)
+    assert canonicalize_html(canonical) == canonical
+
+
+def test_can_include_comments():
+    options = CompareOptions(ignore_comments=False)
+    assert canonicalize_html('<p>x<!--y--></p>', options, container='body') == '<p>x<!--y--></p>\n'
+
+
+def test_output_size_is_linear_in_nesting_depth():
+    depth = 10_000
+    node = Element(tag='div', children=[Element(tag='p')])
+    for _ in range(depth):
+        node = Element(tag='div', children=[node])
+    lines = canonicalize(Document(children=[node])).splitlines()
+    assert len(lines) == 2 * depth + 3
+    assert max(len(line) for line in lines) == 2 * MAX_INDENT_DEPTH + len('<p></p>')
@@ -0,0 +1,110 @@
+# SPDX-License-Identifier: MIT
+
+import json
+
+import pytest
+
+from htmlcompare.cli import EXIT_DIFFERENT, EXIT_ERROR, EXIT_SAME, main
+
+
+def test_compares_two_files(tmp_path, capsys):
+    expected = _write(tmp_path / 'expected.html', '<div />')
+    same = _write(tmp_path / 'same.html', '<div></div>')
+    different = _write(tmp_path / 'different.html', '<p></p>')
+    assert main([expected, same]) == EXIT_SAME
+    assert 'the same' in capsys.readouterr().out
+
+    assert main([expected, different]) == EXIT_DIFFERENT
+    output = capsys.readouterr().out
+    assert 'different different.html' in output
+    assert 'TAG_MISMATCH' in output
+
+    assert main([expected, str(tmp_path / 'missing.html')]) == EXIT_ERROR
+
+
+def test_compares_files_named_like_subcommands(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    _write(tmp_path / 'serve', '<p>a</p>')
+    _write(tmp_path / 'canonicalize', '<p>a</p>')
+    assert main(['--', 'serve', 'canonicalize']) == EXIT_SAME
+    assert 'the same' in capsys.readouterr().out
+
+
+def test_help_lists_subcommands(capsys):
+    with pytest.raises(SystemExit):
+        main(['--help'])
+    # argparse wraps the text
+    output = ' '.join(capsys.readouterr().out.split())
+    assert 'htmlcompare serve' in output
+    assert 'htmlcompare canonicalize' in output
+    assert 'htmlcompare -- EXPECTED ACTUAL' in output
+
+
+def test_compares_directory_trees(tmp_path, capsys):
+    expected_dir = tmp_path / 'expected'
+    actual_dir = tmp_path / 'actual'
+    _write(expected_dir / 'index.html', '<p>a</p>')
+    _write(actual_dir / 'index.html', '<p>a</p>\n')
+    _write(expected_dir / 'sub' / 'page.html', '<p>a</p>')
+    _write(actual_dir / 'sub' / 'page.html', '<p>b</p>')
+    _write(expected_dir / 'gone.html', '<p>a</p>')
+    _write(actual_dir / 'new.htm', '<p>a</p>')
+    _write(actual_dir / 'notes.txt', 'not compared')
+    report_path = tmp_path / 'report.json'
+
+    args = ['--recursive', '--workers', '1', '--json', str(report_path)]
+    exit_code = main(args + [str(expected_dir), str(actual_dir)])
+    assert exit_code == EXIT_DIFFERENT
+    output = capsys.readouterr().out
+    assert 'missing   gone.html' in output
+    assert 'extra     new.htm' in output
+    assert '4 files: 1 same, 1 different, 1 missing, 1 extra, 0 error' in output
+
+    report = json.loads(report_path.read_text())
+    assert report['summary'] == {'same': 1, 'different': 1, 'missing': 1, 'extra': 1, 'error': 0}
+    statuses = {entry['path']: entry['status'] for entry in report['files']}
+    assert statuses == {
+        'gone.html': 'missing',
+        'new.htm': 'extra',
+        'index.html': 'same',
+        'sub/page.html': 'different',
+    }
+    different, = [entry for entry in report['files'] if entry['status'] == 'different']
+    difference, = different['differences']
+    assert difference['type'] == 'TEXT_MISMATCH'
+    assert (difference['expected'], difference['actual']) == ('a', 'b')
+
+
+def test_reports_unreadable_files_as_errors(tmp_path, capsys):
+    expected_dir = tmp_path / 'expected'
+    actual_dir = tmp_path / 'actual'
+    _write(expected_dir / 'ok.html', '<p>a</p>')
+    _write(actual_dir / 'ok.html', '<p>a</p>')
+    (expected_dir / 'latin1.html').write_bytes(b'<p>\xe9</p>')
+    (actual_dir / 'latin1.html').write_bytes(b'<p>\xe9</p>')
+
+    args = ['-r', '-j', '1', '--json', '-', str(expected_dir), str(actual_dir)]
+    assert main(args) == EXIT_ERROR
+    captured = capsys.readouterr()
+    report = json.loads(captured.out)
+    assert report['summary']['error'] == 1
+    assert 'UnicodeDecodeError' in captured.err
+
+
+def _write(path, html: str) -> str:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(html)
+    return str(path)
+
+
+def test_writes_canonical_form(tmp_path, capsys):
+    html_path = _write(tmp_path / 'page.html', '<p class="b a" style="color:red;margin:0px">x</p>')
+    assert main(['canonicalize', '--container', 'body', html_path]) == EXIT_SAME
+    assert capsys.readouterr().out == '<p class="a b" style="color: red; margin: 0">x</p>\n'
+
+    output_path = tmp_path / 'canonical.html'
+    assert main(['canonicalize', html_path, '-o', str(output_path)]) == EXIT_SAME
+    assert '<p class="a b"' in output_path.read_text()
+
+    assert main(['canonicalize', str(tmp_path / 'missing.html')]) == EXIT_ERROR
+    assert 'missing.html' in capsys.readouterr().err
@@ -0,0 +1,63 @@
+# SPDX-License-Identifier: MIT
+
+import pytest
+
+from htmlcompare.compare_css import (
+    InvalidCSSError,
+    canonical_css,
+    clear_css_cache,
+    compare_css,
+    compare_stylesheet,
+    css_cache_info,
+    normalize_css,
+    normalize_stylesheet,
+)
+
+
+def test_memoizes_normalized_css():
+    clear_css_cache()
+    assert compare_css('color: red; margin: 0px', 'margin:0;color:red')
+    assert compare_css('color: red; margin: 0px', 'margin: 0; color: red;')
+    info = css_cache_info()['css']
+    assert info.hits == 1
+    assert info.misses == 3
+    assert canonical_css('margin:0;color:red') == canonical_css('color: red; margin: 0px')
+
+
+def test_identical_css_strings_are_not_parsed():
+    clear_css_cache()
+    assert compare_css('color: red', 'color: red')
+    assert compare_stylesheet('p { color: red }', 'p { color: red }')
+    info = css_cache_info()
+    assert info['css'].misses == 0
+    assert info['stylesheet'].misses == 0
+
+
+def test_can_clear_css_cache():
+    compare_stylesheet('p { color: red }', 'p{color:red}')
+    assert css_cache_info()['stylesheet'].currsize > 0
+    clear_css_cache()
+    assert css_cache_info()['stylesheet'].currsize == 0
+
+
+def test_normalized_css_is_hashable():
+    normalized = normalize_css('margin: 0px auto; color: red !important')
+    assert normalized == (
+        ('color', True, (('ident', 'red'),)),
+        ('margin', False, (('number', '0'), ('ident', 'auto'))),
+    )
+    assert hash(normalized) == hash(normalize_css('color:red!important;margin:0 auto'))
+
+
+def test_normalized_stylesheet_is_hashable():
+    normalized = normalize_stylesheet('@media screen { p { margin: 0px; color: red } }')
+    assert normalized == normalize_stylesheet('@media screen{p{color:red;margin:0}}')
+    assert hash(normalized) == hash(normalize_stylesheet('@media screen{p{color:red;margin:0}}'))
+    assert normalized != normalize_stylesheet('@media print{p{color:red;margin:0}}')
+
+
+def test_rejects_invalid_declaration_list():
+    with pytest.raises(InvalidCSSError):
+        normalize_css('color')
+    with pytest.raises(ValueError):
+        compare_css('color: red', 'color')
@@ -1,9 +1,13 @@
 # SPDX-License-Identifier: MIT
 
 
+import dataclasses
+import pickle
+
 import pytest
 
-from htmlcompare.compare import compare_html
+from htmlcompare.compare import compare_html, iter_differences
+from htmlcompare.nodes import Document, Element, TextNode
 from htmlcompare.options import CompareOptions
 from htmlcompare.result import DifferenceType
 
@@ -354,6 +358,12 @@ def test_style_mismatch_detected():
     assert len(style_diffs) == 1
 
 
+def test_invalid_style_only_equal_if_identical():
+    assert compare_html('<div style="color"></div>', '<div style="color"></div>').is_equal
+    result = compare_html('<div style="color"></div>', '<div style="color: red"></div>')
+    assert [d.type for d in result.differences] == [DifferenceType.STYLE_MISMATCH]
+
+
 def test_style_missing_declaration_detected():
     result = compare_html(
         '<div style="color: red; font-size: 12px;"></div>',
@@ -647,6 +657,71 @@ def test_conditional_comment_ignores_whitespace_inside_nested_block_elements():
     assert result.is_equal
 
 
+def test_can_stop_after_first_difference():
+    expected = '<!DOCTYPE html><div class="a" title="x"><p>1</p><p>2</p></div>'
+    actual = '<div class="b" title="y"><p>one</p><p>two</p></div>'
+    assert len(compare_html(expected, actual).differences) > 3
+
+    result = compare_html(expected, actual, max_differences=1)
+    assert not result.is_equal
+    difference, = result.differences
+    assert difference.type == DifferenceType.DOCTYPE_MISSING
+
+    result = compare_html(expected, actual, max_differences=3)
+    assert len(result.differences) == 3
+    assert compare_html(expected, expected, max_differences=1).is_equal
+
+
+def test_can_iterate_over_differences():
+    expected = ''.join(f'<p>{i}</p>' for i in range(5))
+    actual = ''.join(f'<p>x{i}</p>' for i in range(5))
+    differences = iter_differences(expected, actual)
+    first, second = next(differences), next(differences)
+    assert first.type == DifferenceType.TEXT_MISMATCH
+    assert (first.expected, second.expected) == ('0', '1')
+    assert len(list(differences)) == 3
+    assert list(iter_differences(expected, expected)) == []
+
+
+def test_result_is_a_plain_value():
+    expected = ''.join(f'<p>{i}</p>' for i in range(5))
+    actual = ''.join(f'<p>x{i}</p>' for i in range(5))
+    result = compare_html(expected, actual)
+    assert not result.is_equal
+    assert isinstance(result.differences, list)
+    assert [d.expected for d in result.differences] == ['0', '1', '2', '3', '4']
+    assert pickle.loads(pickle.dumps(result)) == result
+    assert len(dataclasses.asdict(result)['differences']) == 5
+
+
+def test_rejects_invalid_max_differences():
+    with pytest.raises(ValueError):
+        compare_html('<p>a</p>', '<p>b</p>', max_differences=0)
+
+
+@pytest.mark.parametrize('parser', ['html5lib', 'stdlib'])
+def test_can_compare_deeply_nested_documents(parser):
+    depth = 2000
+    expected = '<div>' * depth + 'x' + '</div>' * depth
+    options = CompareOptions(parser=parser)
+    assert compare_html(expected, expected, options).is_equal
+
+    result = compare_html(expected, expected.replace('x', 'y'), options)
+    difference, = result.differences
+    assert difference.type == DifferenceType.TEXT_MISMATCH
+    assert difference.path.count('div[0]') == depth
+
+
+def test_can_compare_deeply_nested_trees_for_equality():
+    def nested(text):
+        node = Element(tag='div', children=[TextNode(text)])
+        for _ in range(10_000):
+            node = Element(tag='div', children=[node])
+        return Document(children=[node])
+
+    assert nested('x') == nested('x')
+    assert nested('x') != nested('y')
+
 
 class TestSelfClosingTagDetection:
     def test_detects_vml_rect_self_closing_vs_opening_tag(self):
@@ -0,0 +1,132 @@
+# SPDX-License-Identifier: MIT
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from htmlcompare.cache import DocumentCache
+from htmlcompare.compare import (
+    Comparer,
+    FastPathStats,
+    compare_html,
+    fast_path_stats,
+    reset_fast_path_stats,
+)
+from htmlcompare.nodes import ConditionalComment, Document
+from htmlcompare.normalize import normalize_tree
+from htmlcompare.options import CompareOptions
+
+
+def test_comparer_can_be_reused():
+    comparer = Comparer()
+    assert comparer.compare('<div> <p>x</p> </div>', '<div><p>x</p></div>').is_equal
+    assert not comparer.compare('<p>x</p>', '<p>y</p>').is_equal
+    assert comparer.compare('<p>x</p>', '<p>x</p>').is_equal
+
+
+def test_comparer_uses_options():
+    html = '<div><!-- foo --></div>'
+    assert Comparer().compare(html, '<div></div>').is_equal
+    comparer = Comparer(CompareOptions(ignore_comments=False))
+    assert not comparer.compare(html, '<div></div>').is_equal
+
+
+def test_comparer_can_parse_and_normalize():
+    comparer = Comparer(CompareOptions(parser='stdlib'))
+    doc = comparer.parse('<div>\n  <p>x</p>\n</div>')
+    assert isinstance(doc, Document)
+    normalized = comparer.normalize(doc)
+    assert normalized == comparer.normalize(comparer.parse('<div><p>x</p></div>'))
+
+
+def test_can_normalize_tree_in_place():
+    comparer = Comparer(CompareOptions(ignore_comments=False))
+    html = '<div>\n  <p>x  <b>y</b></p><!-- c -->\n</div>'
+    doc = comparer.parse(html)
+    body = doc.children[0].children[1]
+    div, = body.children
+    copy = normalize_tree(doc, comparer.options)
+    # normalizing a copy does not modify the original tree
+    assert len(div.children) == 4
+    assert copy.children[0] is not doc.children[0]
+
+    normalized = normalize_tree(doc, comparer.options, in_place=True)
+    assert normalized is doc
+    assert normalized == copy
+    assert doc.children[0].children[1].children[0] is div
+    assert len(div.children) == 2
+    assert div.digest == copy.children[0].children[1].children[0].digest
+    assert comparer.parse_normalized(html) == copy
+
+
+def test_comparer_parses_nested_conditional_comments():
+    comparer = Comparer()
+    doc = comparer.parse('<div><!--[if mso]><p>a</p><![endif]--><p>b</p></div>')
+    html, = doc.children
+    head, body = html.children
+    div, = body.children
+    conditional, p = div.children
+    assert isinstance(conditional, ConditionalComment)
+    assert p.tag == 'p'
+
+
+def test_comparer_can_be_shared_between_threads():
+    comparer = Comparer()
+    pairs = [
+        (f'<div><p>{i}</p><!--[if mso]><b>{i}</b><![endif]--></div>',
+         f'<div>\n<p>{i}</p><!--[if mso]><b>{i}</b><![endif]--></div>')
+        for i in range(200)
+    ]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda pair: comparer.compare(*pair), pairs))
+    assert all(result.is_equal for result in results)
+
+
+def test_can_parse_documents_in_parallel():
+    parsed_in = {}
+
+    class RecordingComparer(Comparer):
+        def parse(self, html):
+            parsed_in[html] = threading.current_thread()
+            return super().parse(html)
+
+    comparer = RecordingComparer(parallel=True)
+    result = comparer.compare('<p>a</p>', '<p>b</p>')
+    assert [difference.path for difference in result.differences] == [
+        '[0] > html[1] > body[0] > p[0]',
+    ]
+    assert parsed_in['<p>a</p>'] is not threading.current_thread()
+    assert parsed_in['<p>b</p>'] is threading.current_thread()
+    assert compare_html('<div />', '<div></div>', parallel=True)
+
+
+def test_parallel_comparer_can_be_shared_between_threads():
+    comparer = Comparer(cache=DocumentCache(), parallel=True)
+    expected = '<div><p>x</p><!--[if mso]><b>x</b><![endif]--></div>'
+    pairs = [(expected, f'<div>\n<p>{i % 2 and "x"}</p></div>') for i in range(100)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda pair: comparer.compare(*pair), pairs))
+    assert not any(results)
+    stats = comparer.cache.stats
+    assert stats.hits + stats.misses == 200
+
+
+def test_counts_fast_path_comparisons():
+    comparer = Comparer()
+    reset_fast_path_stats()
+    assert comparer.compare('<p>x</p>', '<p>x</p>').differences == []
+    assert comparer.compare('<p>x</p>', '<body>\n<p>x</p>\n</body>')
+    result = comparer.compare('<p>x</p>', '<p>y</p>')
+    assert not result
+    assert len(result.differences) == 1
+    assert fast_path_stats() == FastPathStats(identical_input=1, equal_digest=1, full=1)
+
+    reset_fast_path_stats()
+    assert fast_path_stats() == FastPathStats(identical_input=0, equal_digest=0, full=0)
+
+
+def test_validates_max_differences_for_identical_input():
+    with pytest.raises(ValueError):
+        Comparer().compare('<p>x</p>', '<p>x</p>', max_differences=0)
+
@@ -0,0 +1,83 @@
+# SPDX-License-Identifier: MIT
+
+import pytest
+
+from htmlcompare.compare import Comparer, _compare_trees, compare_html
+from htmlcompare.digest import document_digest
+from htmlcompare.nodes import Document, Element, TextNode
+from htmlcompare.result import DifferenceType
+
+
+@pytest.mark.parametrize('expected, actual', [
+    ('<div class="a b"></div>', '<div class="b  a a"></div>'),
+    ('<div style="color: red; margin: 0px"></div>', '<div style="margin:0;color:red;"></div>'),
+    ('<div class="" style=""></div>', '<div></div>'),
+    ('<div id="x" title="y"></div>', '<div title="y" id="x"></div>'),
+    ('<br/>', '<br>'),
+    ('<style>p { color: red; }</style>', '<style>p{color:red}</style>'),
+    ('<div>\n  <p>x</p>\n</div>', '<div><p>x</p></div>'),
+])
+def test_equivalent_nodes_have_same_digest(expected, actual):
+    assert compare_html(expected, actual).is_equal
+    assert _html_digest(expected) == _html_digest(actual)
+
+
+@pytest.mark.parametrize('expected, actual', [
+    ('<div class="a"></div>', '<div class="b"></div>'),
+    ('<div style="color: red"></div>', '<div style="color: blue"></div>'),
+    ('<div>x</div>', '<div>y</div>'),
+    ('<div>x</div>', '<span>x</span>'),
+    ('<v:rect />', '<v:rect></v:rect>'),
+    ('<p>x<b>y</b></p>', '<p><b>x</b>y</p>'),
+    ('<div><!--[if mso]>x<![endif]--></div>', '<div><!--[if IE]>x<![endif]--></div>'),
+])
+def test_different_nodes_have_different_digests(expected, actual):
+    assert not compare_html(expected, actual).is_equal
+    assert _html_digest(expected) != _html_digest(actual)
+
+
+def test_text_in_style_tags_uses_css_equivalence():
+    doc = _normalize('<style>p { color: red; }</style><p>p { color: red; }</p>')
+    html, = doc.children
+    head, body = html.children
+    style, = head.children
+    p, = body.children
+    assert style.children[0].digest != p.children[0].digest
+
+
+def test_skips_identical_subtrees():
+    rows = ''.join(f'<tr><td>{i}</td></tr>' for i in range(50))
+    expected = f'<table>{rows}</table><p>old</p>'
+    actual = f'<table>{rows}</table><p>new</p>'
+    result = compare_html(expected, actual)
+    difference, = result.differences
+    assert difference.type == DifferenceType.TEXT_MISMATCH
+    assert difference.path == '[0] > html[1] > body[1] > p[0]'
+
+
+def test_compares_nodes_without_digest():
+    # nodes created outside of normalize_tree() are compared as usual
+    expected = Document(children=[Element('p', children=[TextNode('x')])])
+    actual = Document(children=[Element('p', children=[TextNode('y')])])
+    assert expected.children[0].digest is None
+    assert not _compare_trees(expected, actual).is_equal
+    assert _compare_trees(expected, expected).is_equal
+
+
+def test_document_digest_includes_doctype():
+    html = '<html><body><p>x</p></body></html>'
+    doc = _normalize(html)
+    with_doctype = _normalize('<!DOCTYPE html>' + html)
+    child_digests = [child.digest for child in doc.children]
+    digest = document_digest(None, child_digests)
+    assert document_digest(doc.doctype, child_digests) == digest
+    assert document_digest(with_doctype.doctype, child_digests) != digest
+
+
+def _normalize(html):
+    return Comparer().parse_normalized(html)
+
+
+def _html_digest(html):
+    html_element, = _normalize(html).children
+    return html_element.digest
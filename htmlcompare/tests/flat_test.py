@@ -0,0 +1,111 @@
+# SPDX-License-Identifier: MIT
+
+import pytest
+
+from htmlcompare.compare import compare_html
+from htmlcompare.flat import (
+    FlatDocument,
+    compare_flat,
+    normalize_flat,
+    parse_flat,
+)
+from htmlcompare.nodes import ConditionalComment, Document, Element, TextNode
+from htmlcompare.normalize import normalize_tree
+from htmlcompare.options import CompareOptions
+from htmlcompare.parser import parse_html
+from htmlcompare.result import DifferenceType
+
+
+HTML = '''<!DOCTYPE html>
+<html><head><style>p { color: red }</style></head>
+<body class="x">
+  <p>Hello <b>World</b>!</p>
+  <!-- comment -->
+  <!--[if mso]><table><tr><td>x</td></tr></table><![endif]-->
+  <br/><img src="a.png" alt="">
+</body></html>'''
+
+
+@pytest.mark.parametrize('options', [
+    CompareOptions(),
+    CompareOptions(ignore_comments=False, ignore_conditional_comments=True),
+])
+def test_round_trips_documents(options):
+    doc = parse_html(HTML)
+    flat = FlatDocument.from_document(doc)
+    assert flat.to_document() == doc
+
+    normalized = normalize_flat(flat, options)
+    assert normalized.to_document() == normalize_tree(doc, options)
+    assert FlatDocument.from_document(normalize_tree(doc, options)).digests == normalized.digests
+
+
+def test_can_access_nodes():
+    flat = parse_flat('<p class="a">x<br></p>')
+    html, = flat.children(-1)
+    assert flat.tag(html) == 'html'
+    head, body = flat.children(html)
+    p, = flat.children(body)
+    text, br = flat.children(p)
+    assert flat.attributes(p) == {'class': 'a'}
+    assert flat.content(text) == 'x'
+    assert flat.node(br) == Element(tag='br')
+    assert flat.digest(br) is None
+    assert len(flat) == 6
+
+
+def test_compares_flat_documents_like_trees():
+    expected = '<div><p>a</p><p id="x">b</p></div>'
+    actual = '<div>\n<p>a</p>\n<p id="y">c</p><hr></div>'
+    result = compare_flat(_normalized(expected), _normalized(actual))
+    tree_result = compare_html(expected, actual)
+    assert result.differences == list(tree_result.differences)
+    assert [d.type for d in result.differences] == [
+        DifferenceType.ATTRIBUTE_MISMATCH,
+        DifferenceType.TEXT_MISMATCH,
+        DifferenceType.CHILD_EXTRA,
+    ]
+    assert [d.path for d in result.differences] == [
+        '[0] > html[1] > body[0] > div[1] > p@id',
+        '[0] > html[1] > body[0] > div[1] > p[0]',
+        '[0] > html[1] > body[0] > div[2]',
+    ]
+    assert compare_flat(_normalized(expected), _normalized(expected)).is_equal
+
+
+def test_can_limit_flat_differences():
+    result = compare_flat(_normalized('<p>a</p><p>b</p>'), _normalized('<p>x</p><p>y</p>'), 1)
+    assert len(result.differences) == 1
+
+
+def test_handles_deeply_nested_documents():
+    depth = 10_000
+    expected = _nested_document(depth, 'a')
+    actual = _nested_document(depth, 'b')
+    result = compare_flat(
+        normalize_flat(FlatDocument.from_document(expected)),
+        normalize_flat(FlatDocument.from_document(actual)),
+    )
+    difference, = result.differences
+    assert difference.type == DifferenceType.TEXT_MISMATCH
+    assert difference.path.endswith(' > span[0]')
+
+
+def test_compares_conditional_comments():
+    expected = '<div><!--[if mso]><b>x</b><![endif]--></div>'
+    actual = '<div><!--[if IE]><b>x</b><![endif]--></div>'
+    difference, = compare_flat(_normalized(expected), _normalized(actual)).differences
+    assert difference.type == DifferenceType.CONDITIONAL_COMMENT_CONDITION_MISMATCH
+    flat = _normalized(expected)
+    assert any(isinstance(flat.node(index), ConditionalComment) for index in range(len(flat)))
+
+
+def _normalized(html: str) -> FlatDocument:
+    return normalize_flat(parse_flat(html))
+
+
+def _nested_document(depth: int, text: str) -> Document:
+    node = Element(tag='span', children=[TextNode(text)])
+    for _ in range(depth):
+        node = Element(tag='span', children=[node])
+    return Document(children=[node])
@@ -0,0 +1,64 @@
+# SPDX-License-Identifier: MIT
+
+import pytest
+
+from htmlcompare import Comparer, DocumentCache, assert_same_fragment, compare_fragments
+from htmlcompare.nodes import Element, TextNode
+from htmlcompare.options import CompareOptions
+from htmlcompare.parser import parse_fragment
+from htmlcompare.result import DifferenceType
+
+
+@pytest.mark.parametrize('parser', ['html5lib', 'stdlib'])
+def test_parses_fragment_without_document_scaffolding(parser):
+    doc = parse_fragment('<p>a</p>text<style>p { }</style>', parser=parser)
+    p, text, style = doc.children
+    assert p == Element(tag='p', children=[TextNode('a')])
+    assert text == TextNode('text')
+    assert style.tag == 'style'
+
+
+@pytest.mark.parametrize('parser', ['html5lib', 'stdlib'])
+def test_can_parse_fragment_in_container(parser):
+    doc = parse_fragment('<td>a</td><td>b</td>', container='tr', parser=parser)
+    assert [node.tag for node in doc.children] == ['td', 'td']
+    # without a table context the cells are dropped
+    assert parse_fragment('<td>a</td>', parser=parser).children == [TextNode('a')]
+
+
+@pytest.mark.parametrize('parser', ['html5lib', 'stdlib'])
+def test_reports_paths_relative_to_fragment_root(parser):
+    options = CompareOptions(parser=parser)
+    result = compare_fragments('<div><p id="a">x</p></div>', '<div><p id="b">x</p></div>', options)
+    difference, = result.differences
+    assert difference.type == DifferenceType.ATTRIBUTE_MISMATCH
+    assert difference.path == '[0] > div[0] > p@id'
+
+    result = compare_fragments('<td>a</td><td>b</td>', '<td>a</td><td>c</td>', container='tr')
+    difference, = result.differences
+    assert difference.type == DifferenceType.TEXT_MISMATCH
+    assert difference.path == '[1] > td[0]'
+
+
+def test_ignores_whitespace_around_fragment():
+    assert compare_fragments('<p>x</p>', '\n  <p>x</p>\n')
+    assert compare_fragments('<style>p{color:red}</style>', '<style>p { color: red; }</style>')
+    assert not compare_fragments('a <b>b</b>', 'a<b>b</b>')
+
+
+def test_can_assert_same_fragment():
+    assert_same_fragment('<li>a</li>', '<li>a</li>\n', container='ul')
+    with pytest.raises(AssertionError):
+        assert_same_fragment('<li>a</li>', '<li>b</li>', verbose=False, container='ul')
+
+
+def test_caches_fragments_separately_from_documents():
+    cache = DocumentCache()
+    comparer = Comparer(cache=cache)
+    html = '<p>x</p>'
+    document = comparer.parse_normalized(html)
+    fragment = comparer.parse_normalized(html, container='body')
+    assert document.children[0].tag == 'html'
+    assert fragment.children[0].tag == 'p'
+    assert comparer.parse_normalized(html, container='body') is fragment
+    assert cache.stats.hits == 1
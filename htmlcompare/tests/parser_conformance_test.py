@@ -0,0 +1,137 @@
+# SPDX-License-Identifier: MIT
+
+import random
+
+import pytest
+
+from htmlcompare.compare import compare_html
+from htmlcompare.options import CompareOptions
+from htmlcompare.parser import available_parsers, parse_html
+
+
+CORPUS = (
+    '',
+    '<div></div>',
+    '<p>Hello <b>world</b>!</p>',
+    '<div class="foo bar" id="x" style="color: red"></div>',
+    '<img src=x alt><input disabled><div id="a" id="b"></div>',
+    '<br><br/><br />',
+    '<div />',
+    '<v:rect /><v:fill ></v:fill><v:stroke />',
+    '<script src="app.js" />',
+    '<img alt="a>b" /><a href=x/>link</a>',
+    '<title><x/></title><script>a<b/>c</script><textarea><br/></textarea>',
+    '<textarea name="comment" />',
+    '<p>one<p>two<div>three</div>',
+    '<ul><li>a<li>b</ul><dl><dt>x<dd>y<dt>z</dl>',
+    '<ul><li><ul><li>nested</li></ul></li></ul>',
+    '<h1>a<h2>b</h2>',
+    '<div><span>x</div>',
+    '<div>a<p>b</div>c',
+    '<p>a</br>b</p>',
+    '</p>',
+    '<p>a &amp b &lt c</p>',
+    '<pre>\nline</pre><textarea>\nx &lt; y</textarea>',
+    '<table><tr><td>a<td>b<tr><td>c</table>',
+    '<table>\n  <tr>\n    <td>cell</td>\n  </tr>\n</table>',
+    '<table><thead><tr><th>h</th></tr></thead><tbody><tr><td>d</td></tr></tbody></table>',
+    '<table><tr><td><table><tr><td>inner</td></tr></table></td></tr></table>',
+    '<table><tbody><tr><td><b>x</td></tr></tbody></table>',
+    '<p><table><tr><td>x</td></tr></table>',
+    '<!DOCTYPE html><p><table><tr><td>x</td></tr></table>',
+    '<!DOCTYPE html><html><body></body></html>',
+    '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" '
+    '"http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd"><html></html>',
+    '<html><head><title>T &amp; x</title><meta charset="utf-8">'
+    '<style>p { color: red; }</style></head>\n<body class="x">\n'
+    '  <h1>Hi</h1>\n  <p>text &copy; <br> more</p>\n</body>\n</html>',
+    '  <!-- lead --> <html> <!-- c1 --> <head> </head> <!-- c2 --> <body> x </body>'
+    ' <!-- c3 --> </html> <!-- c4 -->',
+    '<title>a</title>text',
+    '<head><script>var a = "<b>";</script></head><body><p>x</p></body>',
+    '<html><head></head><link rel="x"><body></body></html>',
+    '<p>x</p></body></html> <p>after</p>',
+    '<body><div>x</div><body class="late"></body>',
+    '<?xml version="1.0"?><html><body>x</body></html>',
+    '<div><!--[if mso]><table><tr><td><![endif]--><p>x</p>'
+    '<!--[if mso]></td></tr></table><![endif]--></div>',
+    '<!--[if !mso]><!--><div>visible</div><!--<![endif]-->',
+    '<head><!--[if mso]><style>td { padding: 0 }</style><meta name="x"><![endif]--></head>',
+    '<div><!--[if IE]><td>cell</td> <title>t</title><![endif]--></div>',
+    '<div><v:roundrect style="height:40px" arcsize="10%"><w:anchorlock/>'
+    '<center>Button</center></v:roundrect></div>',
+    # markup which needs the fallback to html5lib
+    '<p><b>bold<div>block</div></p>',
+    '<b><i>x</b></i>',
+    '<a href="x">one<a href="y">two</a>',
+    '<table>text</table>',
+    '<table><caption>c</caption><tr><td>x</td></tr></table>',
+    '<select><option>1</option></select>',
+    '<div><!--[if IE]><body class="x"><p>a<![endif]--></div>',
+    '<svg><circle r="1"/></svg>',
+    '<p>x<form><input></form>',
+    '<style>unterminated',
+    b'<meta charset="utf-8"><p>\xc3\xa9</p>',
+    b'\xef\xbb\xbf<p>bom</p>',
+    '<p>a\r\nb\rc</p>',
+    '<a href="/p?lang=de&region=eu&currency=eur">x</a>',
+    '<a href="?a=1&amp;b=2">x</a>',
+    '<a href="?x&copy=1">x</a>',
+    '<a href="?x&notit=1">x</a>',
+    '<a href="?x&ampx">x</a>',
+    '<a href="?x&lt=1">x</a>',
+    '<a title="&notin">x</a><a title="&noti">y</a>',
+    '<img alt="a\x00b">',
+    '<script><!--<script></script>--></script><p>x</p>',
+    '<style><!-- p { color: red } --></style>',
+    ' \n text',
+    '</h1><!DOCTYPE html><p>x</p>',
+    '<!DOCTYPE html><!DOCTYPE foo><p>x</p>',
+    '<pre></body>\ntext</pre>',
+    '<a href=x/>link</a>',
+    '<p title=\'a "b"\' data-x=1 hidden>x</p>',
+    '<?xml version="1.0"?><p>x</p>',
+    '<head/><body/>',
+    '<head></head><body class="x"/>',
+    '<p></ p>',
+    '<!--><p>x</p><!--->',
+    '<text<\u00c9>x',
+)
+
+# pieces for random documents (including syntax and structural elements which
+# are easy to get wrong)
+FUZZ_PIECES = (
+    '<div>', '</div>', '<p>', '</p>', '<b>', '</b>', '<br>', '<br/>', '<img src=x>', 'text',
+    ' ', '\n', '&amp;', '&copy', '<', '>', '<!-- c -->', '<!-->', '<script>', '</script>',
+    '<title>', '</title>', '<pre>', '\n</pre>', '<ul>', '<li>', '</li>', '<table>', '<tr>',
+    '<td>', '</table>', '<!DOCTYPE html>', '<?pi?>', '<DIV ID=a>', '<a href=x/>', '</a>',
+    '</ p>', '<html>', '<head>', '</head>', '<body>', '</body>', '</html>', '<html/>',
+    '<head/>', '<body/>', '<head />', '<p/>', '<li/>', '<td/>', '<v:rect/>', '\u00e9',
+)
+
+
+@pytest.mark.parametrize('html', CORPUS)
+def test_stdlib_parser_builds_same_tree_as_html5lib(html):
+    assert parse_html(html, parser='stdlib') == parse_html(html, parser='html5lib')
+
+
+def test_stdlib_parser_builds_same_tree_for_random_markup():
+    rng = random.Random(42)
+    for _ in range(500):
+        html = ''.join(rng.choice(FUZZ_PIECES) for _ in range(rng.randint(1, 12)))
+        assert parse_html(html, parser='stdlib') == parse_html(html, parser='html5lib'), html
+
+
+def test_lists_builtin_parsers():
+    assert {'html5lib', 'stdlib'}.issubset(available_parsers())
+
+
+def test_rejects_unknown_parser():
+    with pytest.raises(ValueError):
+        parse_html('<div></div>', parser='invalid')
+
+
+def test_can_select_parser_via_options():
+    options = CompareOptions(parser='stdlib')
+    assert compare_html('<p>a<p>b', '<p>a</p><p>b</p>', options).is_equal
+    assert not compare_html('<p>a</p>', '<p>b</p>', options).is_equal
@@ -1,9 +1,20 @@
 # SPDX-License-Identifier: MIT
 
+import sys
 from typing import Optional
 
-from htmlcompare.nodes import Comment, ConditionalComment, Document, Element, TextNode
-from htmlcompare.parser import parse_html
+import pytest
+
+from htmlcompare.nodes import (
+    EMPTY_ATTRIBUTES,
+    EMPTY_CHILDREN,
+    Comment,
+    ConditionalComment,
+    Document,
+    Element,
+    TextNode,
+)
+from htmlcompare.parser import clear_fragment_cache, fragment_cache_info, parse_html
 
 
 def test_parse_empty_document():
@@ -66,6 +77,18 @@ def test_parse_self_closing_element():
     assert br.tag == 'br'
 
 
+@pytest.mark.parametrize('parser', ['html5lib', 'stdlib'])
+def test_detects_self_closing_syntax_in_tags_only(parser):
+    doc = parse_html('<img alt="a>b" /><textarea><br/></textarea>', parser=parser)
+    html, = doc.children
+    body = _find_first_child_with_tag(html, 'body')
+    img, textarea = body.children
+    assert img.is_self_closing
+    assert img.attributes == {'alt': 'a>b'}
+    # markup in RCDATA/RAWTEXT elements is just text
+    assert textarea.children == [TextNode('<br/>')]
+
+
 def test_parse_multiple_children():
     doc = parse_html('<div><p>a</p><p>b</p></div>')
     html, = doc.children
@@ -230,6 +253,35 @@ def test_parses_conditional_comment_gte():
     assert cc.condition == 'gte IE 8'
 
 
+@pytest.mark.parametrize('parser', ['html5lib', 'stdlib'])
+def test_keeps_head_content_in_conditional_comment(parser):
+    html = '<head><!--[if mso]><style>td { padding: 0 }</style><![endif]--></head>'
+    doc = parse_html(html, parser)
+    html, = doc.children
+    head = _find_first_child_with_tag(html, 'head')
+    cc, = head.children
+    style, = cc.children
+    assert style.tag == 'style'
+    assert style.children == [TextNode('td { padding: 0 }')]
+
+
+def test_memoizes_conditional_comments():
+    clear_fragment_cache()
+    html = '<div><!--[if mso]><table><tr><td>x</td></tr></table><![endif]--></div>'
+    first = parse_html(html)
+    second = parse_html(html)
+    assert fragment_cache_info().hits == 1
+    assert first == second
+
+    first_cc = first.children[0].children[1].children[0].children[0]
+    second_cc = second.children[0].children[1].children[0].children[0]
+    first_table, = first_cc.children
+    second_table, = second_cc.children
+    assert first_table is not second_table
+    first_table.children.clear()
+    assert len(second_table.children) == 1
+
+
 def test_regular_comment_not_parsed_as_conditional():
     doc = parse_html('<div><!-- just a regular comment --></div>')
     html = doc.children[0]
@@ -277,8 +329,63 @@ def test_parse_html_strict_doctype():
     assert doc.doctype.system_id == system_id
 
 
+def test_parse_misnested_formatting_elements():
+    doc = parse_html('<b>1<p>2</b>3</p>')
+    html, = doc.children
+    body = _find_first_child_with_tag(html, 'body')
+    b, p = body.children
+    assert b == Element('b', children=[TextNode('1')])
+    assert p == Element('p', children=[Element('b', children=[TextNode('2')]), TextNode('3')])
+
+
+def test_parse_text_foster_parented_before_table():
+    doc = parse_html('<div>a<table>b<tr><td>c</td></tr></table></div>')
+    html, = doc.children
+    body = _find_first_child_with_tag(html, 'body')
+    div = _find_first_child_with_tag(body, 'div')
+    text, table = div.children
+    # "b" is moved in front of the table and merged with the existing text
+    assert text == TextNode('ab')
+    assert table.tag == 'table'
+
+
+def test_parse_namespaced_attribute():
+    doc = parse_html('<svg><use xlink:href="#icon"/></svg>')
+    html, = doc.children
+    body = _find_first_child_with_tag(html, 'body')
+    svg = _find_first_child_with_tag(body, 'svg')
+    use = _find_first_child_with_tag(svg, 'use')
+    assert use.attributes == {'{http://www.w3.org/1999/xlink}href': '#icon'}
+    assert use.is_self_closing
+
+
 def _find_first_child_with_tag(element: Element, tag: str) -> Optional[Element]:
     for child in element.children:
         if isinstance(child, Element) and child.tag == tag:
             return child
     return None
+
+
+@pytest.mark.parametrize('parser', ['html5lib', 'stdlib'])
+def test_parsed_nodes_share_empty_containers(parser):
+    doc = parse_html('<div><br><p class="x">a</p></div>', parser=parser)
+    html, = doc.children
+    body = _find_first_child_with_tag(html, 'body')
+    div = _find_first_child_with_tag(body, 'div')
+    br, p = div.children
+    assert br.children is EMPTY_CHILDREN
+    assert div.attributes is EMPTY_ATTRIBUTES
+    assert (br.children == []) and (div.attributes == {})
+    # tag and attribute names are interned
+    assert p.tag is sys.intern('p')
+    class_key, = p.attributes
+    assert class_key is sys.intern('class')
+    if sys.version_info >= (3, 10):
+        assert not hasattr(p, '__dict__')
+
+
+def test_shared_empty_containers_are_immutable():
+    with pytest.raises(TypeError):
+        EMPTY_CHILDREN.append(TextNode('x'))
+    with pytest.raises(TypeError):
+        EMPTY_ATTRIBUTES['class'] = 'x'
@@ -0,0 +1,85 @@
+# SPDX-License-Identifier: MIT
+
+import pickle
+
+from htmlcompare.compare import compare_html
+from htmlcompare.options import CompareOptions
+from htmlcompare.path import DifferencePath
+from htmlcompare.result import Difference, DifferenceType
+
+
+def test_renders_text_path():
+    difference = _single_difference(
+        '<div><p>a</p><p>b</p></div>',
+        '<div><p>a</p><p>c</p></div>',
+    )
+    assert isinstance(difference.location, DifferencePath)
+    assert difference.path == '[0] > html[1] > body[0] > div[1] > p[0]'
+    assert difference.location.xpath == '/html[1]/body[1]/div[1]/p[2]/text()[1]'
+    assert difference.location.css == 'html > body:nth-child(2) > div > p:nth-child(2)'
+    assert difference.xpath == difference.location.xpath
+    assert difference.css == difference.location.css
+
+
+def test_renders_attribute_path():
+    difference = _single_difference(
+        '<div><span>x</span><img src="a.png"></div>',
+        '<div><span>x</span><img src="b.png"></div>',
+    )
+    assert difference.type == DifferenceType.ATTRIBUTE_MISMATCH
+    assert difference.path == '[0] > html[1] > body[0] > div[1] > img@src'
+    assert difference.location.xpath == '/html[1]/body[1]/div[1]/img[1]/@src'
+    assert difference.location.css == 'html > body:nth-child(2) > div > img:nth-child(2)[src]'
+
+
+def test_renders_path_of_extra_node():
+    difference = _single_difference('<p>a</p>', '<p>a</p><p>b</p>')
+    assert difference.type == DifferenceType.CHILD_EXTRA
+    assert difference.path == '[0] > html[1] > body[1]'
+    assert difference.location.xpath == '/html[1]/body[1]/p[2]'
+    assert difference.location.css == 'html > body:nth-child(2) > p:nth-child(2)'
+
+
+def test_renders_path_in_conditional_comment():
+    difference = _single_difference(
+        '<div><!--[if mso]><b>x</b><![endif]--></div>',
+        '<div><!--[if mso]><b>y</b><![endif]--></div>',
+    )
+    assert difference.path == '[0] > html[1] > body[0] > div[0] > <!--[if mso]>[0] > b[0]'
+    assert difference.location.xpath == '/html[1]/body[1]/div[1]/comment()[1]/b[1]/text()[1]'
+
+
+def test_renders_doctype_path():
+    difference = _single_difference('<!DOCTYPE html><p>a</p>', '<p>a</p>')
+    assert difference.path == 'DOCTYPE'
+    assert str(difference).startswith('DOCTYPE_MISSING at DOCTYPE: ')
+
+
+def test_path_does_not_reference_compared_documents():
+    paragraphs = ''.join(f'<p>{i}</p>' for i in range(2000))
+    result = compare_html(paragraphs + '<p>a</p>', paragraphs + '<p>b</p>')
+    data = pickle.dumps(result)
+    assert len(data) < 1000
+    difference, = pickle.loads(data).differences
+    assert difference.path == '[0] > html[1] > body[2000] > p[0]'
+    assert difference.xpath == '/html[1]/body[1]/p[2001]/text()[1]'
+    assert difference.css == 'html > body:nth-child(2) > p:nth-child(2001)'
+
+
+def test_can_create_difference_with_text_path():
+    difference = Difference(
+        type=DifferenceType.TEXT_MISMATCH,
+        path='html > body > p[0]',
+        expected='a',
+        actual='b',
+    )
+    assert difference.path == 'html > body > p[0]'
+    assert difference.location is None
+    assert (difference.xpath, difference.css) == (None, None)
+    assert str(difference) == "TEXT_MISMATCH at html > body > p[0]: expected 'a', got 'b'"
+
+
+def _single_difference(expected, actual, options=None):
+    result = compare_html(expected, actual, options or CompareOptions())
+    difference, = result.differences
+    return difference
@@ -0,0 +1,103 @@
+# SPDX-License-Identifier: MIT
+
+import json
+import socket
+import threading
+
+import pytest
+
+from htmlcompare.server import ComparisonServer, _create_socket_server
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = ComparisonServer(workers=1)
+    yield server
+    server.shutdown()
+
+
+def test_answers_ndjson_requests(server):
+    requests = [
+        {'id': 1, 'expected': '<p>a</p>', 'actual': '<p>b</p>'},
+        {'id': 'x', 'expected': '<div />', 'actual': '<div></div>', 'options': {'parser': 'stdlib'}},  # noqa: E501
+        {'id': 3, 'expected': '<li>a</li>', 'actual': '\n<li>a</li>', 'container': 'ul'},
+    ]
+    responses = _handle(server, [json.dumps(request) for request in requests])
+    assert responses['x'] == {'id': 'x', 'equal': True, 'differences': []}
+    assert responses[3]['equal']
+    difference, = responses[1]['differences']
+    assert difference['type'] == 'TEXT_MISMATCH'
+    assert difference['path'] == '[0] > html[1] > body[0] > p[0]'
+
+
+def test_reports_invalid_requests(server):
+    lines = [
+        'not json',
+        json.dumps({'id': 1, 'expected': '<p>'}),
+        json.dumps({'id': 2, 'expected': '', 'actual': '', 'options': {'unknown': True}}),
+        '',
+    ]
+    responses = _handle(server, lines)
+    assert 'invalid JSON' in responses[None][0]['error']
+    assert responses[1] == {'id': 1, 'error': 'missing keys in request: actual'}
+    assert responses[2]['error'].startswith('TypeError')
+
+
+def test_reports_invalid_request_without_id(server):
+    responses = _handle(server, [json.dumps({'expected': '', 'actual': ''}), '[1]'])
+    assert [response['error'] for response in responses[None]] == [
+        'missing keys in request: id',
+        'request must be a JSON object',
+    ]
+
+
+def test_reports_requests_which_could_not_be_submitted(server, monkeypatch):
+    submit = server._submit
+
+    def failing_submit(request):
+        if request['id'] < 10:
+            raise RuntimeError('cannot schedule new futures after shutdown')
+        return submit(request)
+    monkeypatch.setattr(server, '_submit', failing_submit)
+
+    # more failing requests than slots: each slot must be released again
+    requests = [{'id': id_, 'expected': '<p>a</p>', 'actual': '<p>a</p>'} for id_ in range(11)]
+    responses = _handle(server, [json.dumps(request) for request in requests])
+    assert responses[0] == {
+        'id': 0,
+        'error': 'RuntimeError: cannot schedule new futures after shutdown',
+    }
+    assert all('error' in responses[id_] for id_ in range(10))
+    assert responses[10]['equal']
+
+
+def test_can_serve_unix_socket(server, tmp_path):
+    path = str(tmp_path / 'htmlcompare.sock')
+    socket_server = _create_socket_server(server, path)
+    thread = threading.Thread(target=socket_server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(path)
+            request = {'id': 1, 'expected': '<br>', 'actual': '<hr>'}
+            client.sendall(json.dumps(request).encode('utf8') + b'\n')
+            client.shutdown(socket.SHUT_WR)
+            response = json.loads(client.makefile('rb').readline())
+    finally:
+        socket_server.shutdown()
+        socket_server.server_close()
+    assert response['id'] == 1
+    assert response['equal'] is False
+
+
+def _handle(server, lines) -> dict:
+    output = []
+    server.handle_stream(lines, output.append)
+    responses = {}
+    for line in output:
+        response = json.loads(line)
+        if response['id'] is None:
+            responses.setdefault(None, []).append(response)
+        else:
+            responses[response['id']] = response
+    return responses
@@ -0,0 +1,88 @@
+# SPDX-License-Identifier: MIT
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from htmlcompare.cache import DocumentCache, document_cache_key
+from htmlcompare.compare import Comparer
+from htmlcompare.flat import FlatDocument
+from htmlcompare.options import CompareOptions
+from htmlcompare.snapshot import SnapshotFormatError, SnapshotStore, dumps, loads
+
+
+HTML = '''<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" "x.dtd">
+<html><head><style>p { color: red }</style></head>
+<body class="x y" style="margin: 0">
+  <p>Hello <b>Wörld</b> &amp; more!</p>
+  <!--[if mso]><table><tr><td>x</td></tr></table><![endif]-->
+  <br/><img src="a.png" alt="">
+</body></html>'''
+
+
+def test_round_trips_normalized_documents():
+    doc = Comparer().parse_normalized(HTML)
+    loaded = loads(dumps(doc))
+    assert loaded == doc
+    assert loaded.doctype == doc.doctype
+    # subtree digests are stored as well
+    assert FlatDocument.from_document(loaded).digests == FlatDocument.from_document(doc).digests
+
+
+def test_rejects_invalid_data():
+    data = dumps(Comparer().parse_normalized(HTML))
+    for invalid in (b'', b'<html>', data[:-10], data[:6] + b'\xff\xff' + data[8:]):
+        with pytest.raises(SnapshotFormatError):
+            loads(invalid)
+
+
+def test_comparer_loads_documents_from_snapshots(tmp_path, monkeypatch):
+    store = SnapshotStore(str(tmp_path))
+    equivalent_html = HTML + '\n'
+    assert Comparer(cache=store).compare(HTML, equivalent_html)
+    assert store.stats.writes == 2
+
+    def fail(self, html):
+        raise AssertionError('must not parse again')
+
+    # e.g. the next CI run
+    monkeypatch.setattr(Comparer, 'parse', fail)
+    next_store = SnapshotStore(str(tmp_path), cache=DocumentCache())
+    comparer = Comparer(cache=next_store)
+    assert comparer.compare(HTML, equivalent_html)
+    assert comparer.compare(HTML, equivalent_html)
+    assert next_store.stats.hits == 2
+    assert next_store.cache.stats.hits == 2
+    assert [name for name in os.listdir(tmp_path) if not name.endswith('.snap')] == []
+
+
+def test_cache_size_of_loaded_documents_is_source_size(tmp_path):
+    parsed_cache = DocumentCache()
+    Comparer(cache=SnapshotStore(str(tmp_path), cache=parsed_cache)).parse_normalized(HTML)
+    loaded_cache = DocumentCache()
+    Comparer(cache=SnapshotStore(str(tmp_path), cache=loaded_cache)).parse_normalized(HTML)
+    assert loaded_cache.stats.entries == 1
+    source_size = len(HTML.encode('utf-8'))
+    assert loaded_cache.stats.size_bytes == parsed_cache.stats.size_bytes == source_size
+
+
+def test_replaces_outdated_snapshots(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    key = document_cache_key(HTML, CompareOptions())
+    with open(store._path(key), 'wb') as snapshot_fp:
+        snapshot_fp.write(b'HCSNAP\x00\x00 outdated')
+    assert store.get(key) is None
+    Comparer(cache=store).parse_normalized(HTML)
+    assert store.get(key) is not None
+    assert store.stats.misses == 2
+
+
+def test_can_write_same_snapshot_concurrently(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    doc = Comparer().parse_normalized(HTML)
+    key = document_cache_key(HTML, CompareOptions())
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: store.put(key, doc, len(HTML)), range(32)))
+    assert os.listdir(tmp_path) == [os.path.basename(store._path(key))]
+    assert store.get(key) == doc
@@ -2,12 +2,12 @@
 
 from typing import Optional
 
-from htmlcompare.compare import compare_html
+from htmlcompare.compare import compare_fragments, compare_html
 from htmlcompare.options import CompareOptions
 from htmlcompare.result import ComparisonResult
 
 
-__all__ = ['assert_different_html', 'assert_same_html']
+__all__ = ['assert_different_html', 'assert_same_fragment', 'assert_same_html']
 
 
 def assert_same_html(
@@ -18,7 +18,31 @@ def assert_same_html(
         options: Optional[CompareOptions] = None,
     ) -> None:
     """Assert that two HTML strings are semantically equal."""
-    result = compare_html(expected_html, actual_html, options)
+    # only the first difference is reported
+    result = compare_html(expected_html, actual_html, options, max_differences=1)
+    _raise_for_difference(result, verbose, message)
+
+
+def assert_same_fragment(
+        expected_html: str,
+        actual_html: str,
+        verbose: bool = True,
+        message: Optional[str] = None,
+        options: Optional[CompareOptions] = None,
+        container: str = 'body',
+    ) -> None:
+    """Assert that two HTML fragments are semantically equal (see ``compare_fragments()``)."""
+    result = compare_fragments(
+        expected_html, actual_html, options, container=container, max_differences=1,
+    )
+    _raise_for_difference(result, verbose, message)
+
+
+def _raise_for_difference(
+    result: ComparisonResult,
+    verbose: bool,
+    message: Optional[str],
+) -> None:
     if result:
         return
 
@@ -0,0 +1,201 @@
+# SPDX-License-Identifier: MIT
+"""
+html5lib tree builder which creates htmlcompare nodes directly.
+
+html5lib drives the tree construction through a small DOM-like API
+(``appendChild``, ``insertText``, ``insertBefore``, ...). The classes in this
+module implement that API on top of our ``Element``/``TextNode``/``Comment``
+nodes so no intermediate (ElementTree) tree is built.
+"""
+
+from sys import intern
+from typing import Callable, Optional, Union
+
+from html5lib.constants import namespaces
+from html5lib.treebuilders import base
+
+from htmlcompare.nodes import (
+    EMPTY_ATTRIBUTES,
+    EMPTY_CHILDREN,
+    Comment,
+    ConditionalComment,
+    Doctype,
+    Document,
+    Element,
+    TextNode,
+)
+
+
+__all__ = ['NodeTreeBuilder']
+
+
+class _ElementNode(base.Node):
+    """html5lib node which wraps (and populates) an htmlcompare ``Element``."""
+
+    def __init__(self, name, namespace=None):
+        name = intern(name)
+        self.name = name
+        self.namespace = namespace
+        self.nameTuple = (namespace or namespaces['html'], name)
+        self.parent = None
+        # only element nodes, html5lib uses these to navigate the tree
+        self.childNodes = []
+        self._flags = []
+        self.node = Element(tag=name, attributes=EMPTY_ATTRIBUTES, children=EMPTY_CHILDREN)
+
+    def _get_attributes(self):
+        # html5lib modifies the attributes of <html>/<body> directly
+        if self.node.attributes is EMPTY_ATTRIBUTES:
+            self.node.attributes = {}
+        return self.node.attributes
+
+    def _set_attributes(self, attributes):
+        node_attributes = {}
+        for key, value in attributes.items():
+            if isinstance(key, tuple):
+                # namespaced attribute (e.g. xlink:href in SVG)
+                _prefix, attr_name, namespace = key
+                key = '{%s}%s' % (namespace, attr_name)
+            node_attributes[intern(key)] = value
+        self.node.attributes = node_attributes or EMPTY_ATTRIBUTES
+
+    attributes = property(_get_attributes, _set_attributes)
+
+    def _children(self) -> list:
+        # children list which can be modified
+        children = self.node.children
+        if children is EMPTY_CHILDREN:
+            children = self.node.children = []
+        return children
+
+    def appendChild(self, node):
+        if isinstance(node, _ElementNode):
+            self.childNodes.append(node)
+            node.parent = self
+            self._children().append(node.node)
+        else:
+            # comments are inserted as htmlcompare nodes directly
+            self._children().append(node)
+
+    def insertBefore(self, node, refNode):
+        children = self._children()
+        index = _index_of(children, refNode.node)
+        children.insert(index, node.node)
+        self.childNodes.insert(_index_of(self.childNodes, refNode), node)
+        node.parent = self
+
+    def removeChild(self, node):
+        children = self._children()
+        del children[_index_of(children, node.node)]
+        del self.childNodes[_index_of(self.childNodes, node)]
+        node.parent = None
+
+    def insertText(self, data, insertBefore=None):
+        children = self._children()
+        if insertBefore is None:
+            index = len(children)
+        else:
+            index = _index_of(children, insertBefore.node)
+        if (index > 0) and isinstance(children[index - 1], TextNode):
+            children[index - 1].content += data
+        else:
+            children.insert(index, TextNode(content=data))
+
+    def reparentChildren(self, newParent):
+        for child in self.node.children:
+            if isinstance(child, TextNode):
+                newParent.insertText(child.content)
+            else:
+                newParent._children().append(child)
+        for child_node in self.childNodes:
+            child_node.parent = newParent
+            newParent.childNodes.append(child_node)
+        self.node.children = EMPTY_CHILDREN
+        self.childNodes = []
+
+    def cloneNode(self):
+        element = type(self)(self.name, self.namespace)
+        if self.node.attributes:
+            element.node.attributes = dict(self.node.attributes)
+        element.node.is_self_closing = self.node.is_self_closing
+        return element
+
+    def hasContent(self):
+        return bool(self.node.children)
+
+
+class _DocumentNode(base.Node):
+    def __init__(self):
+        self.name = None
+        self.parent = None
+        self.childNodes = []
+        self._flags = []
+        self.root: Optional[_ElementNode] = None
+        self.doctype: Optional[Doctype] = None
+
+    def appendChild(self, node):
+        if isinstance(node, _ElementNode):
+            self.root = node
+            self.childNodes.append(node)
+            node.parent = self
+        elif isinstance(node, Doctype):
+            self.doctype = node
+        # comments outside of the <html> element are not part of our tree
+
+    def hasContent(self):
+        return bool(self.childNodes)
+
+
+def _create_doctype(name, public_id, system_id) -> Doctype:
+    return Doctype(name=name or '', public_id=public_id or '', system_id=system_id or '')
+
+
+def _index_of(items: list, item) -> int:
+    # list.index() uses __eq__ which compares the complete subtree of nodes
+    for index, candidate in enumerate(items):
+        if candidate is item:
+            return index
+    raise ValueError('node not found')
+
+
+class NodeTreeBuilder(base.TreeBuilder):
+    """
+    html5lib ``TreeBuilder`` which builds htmlcompare nodes.
+
+    ``comment_factory`` converts comment content into a ``Comment`` (or a
+    ``ConditionalComment``).
+    """
+    documentClass = _DocumentNode
+    elementClass = _ElementNode
+    doctypeClass = staticmethod(_create_doctype)
+
+    def __init__(
+        self,
+        namespaceHTMLElements: bool,
+        comment_factory: Callable[[str], Union[Comment, ConditionalComment]],
+    ):
+        self.commentClass = comment_factory
+        super().__init__(namespaceHTMLElements)
+
+    # html5lib's tokenizer reports self-closing syntax (``<br/>``) in the
+    # start tag token but the tree builder API does not pass it on. Elements
+    # are created either in ``createElement()`` or in ``insertElementNormal()``.
+    def createElement(self, token) -> _ElementNode:
+        element = super().createElement(token)
+        element.node.is_self_closing = token.get('selfClosing', False)
+        return element
+
+    def insertElementNormal(self, token) -> _ElementNode:
+        element = super().insertElementNormal(token)
+        element.node.is_self_closing = token.get('selfClosing', False)
+        return element
+
+    def getDocument(self) -> Document:
+        document = self.document
+        if document.root is None:
+            return Document(children=[], doctype=document.doctype)
+        return Document(children=[document.root.node], doctype=document.doctype)
+
+    def getFragment(self) -> list:
+        # html5lib inserts the fragment into an <html> element (not the document)
+        return list(self.openElements[0].node.children)